@@ -0,0 +1,13 @@
+"""离线基准测试。不连接 Discord，也不需要真实的 .env。"""
+import os
+
+# src.config 在导入时会读取这些变量，离线运行时给出占位值
+for _key, _value in {
+    "TARGET_GUILD_ID": "0",
+    "ALLOWED_CHANNELS": "0",
+    "UPDATE_TITLE": "【更新】",
+    "UPDATE_TEXT": "您关注的帖子发布了一个更新:\n{{author}}->{{text}}\n你可以在这里查看: {{url}}",
+    "DM_PANEL_TEXT": "你好，{{user}}！\n\n- 你有 **{{thread_update_number}}** 个订阅的帖子有新动态。\n- 你关注的作者发布了 **{{author_update_number}}** 条新动态。",
+    "TRACK_NEW_THREAD_EMBED_TEXT": "{{author}}，您好。\n你可以直接在这里为{{thread_url}}创建更新推流",
+}.items():
+    os.environ.setdefault(_key, _value)
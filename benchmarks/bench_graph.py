@@ -0,0 +1,179 @@
+"""订阅关系图（src/graph.py）：每百万条边的内存、快照写入与映射的耗时，以及收件人解析的耗时。
+
+    # 离线：只测内存中的关系图
+    python -m benchmarks.bench_graph --edges 1000000
+
+    # 另外写入数据库（会清空其中的表！），比较 /更新推流 中的 count_recipients 与通知任务的 stream_recipients
+    # 在关系图路径与数据库路径（关注者索引 + 订阅者查询）下的耗时，并测量从数据库重建与从快照加载的耗时
+    BENCH_MYSQL_HOST=127.0.0.1 BENCH_MYSQL_PASSWORD=... python -m benchmarks.bench_graph --edges 100000 --sql
+
+收件人解析使用订阅者+关注者最多的帖子；“有覆盖层”一行先随机修改 1% 的边（尚未写快照）再测量。
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.graph import generate_graph
+from src.graph import DIGEST, EDGE_KINDS, FOLLOW, KINDS, RELEASE, TEST, CSRBuilder, SubscriptionGraph, map_snapshot, subscription_graph, unmap_snapshot, write_snapshot
+
+UPDATE_KINDS = {"release": (RELEASE,), "test": (TEST,), "any": (RELEASE, TEST)}
+
+def build_base(graph) -> list[tuple]:
+    edges = {
+        RELEASE: sorted((thread_id, user_id) for user_id, thread_id, release, _, _ in graph.subscriptions if release),
+        TEST: sorted((thread_id, user_id) for user_id, thread_id, _, test, _ in graph.subscriptions if test),
+        FOLLOW: sorted((author_id, follower_id) for follower_id, author_id in graph.follows),
+        DIGEST: [], # 合成数据中没有开启摘要模式的用户
+    }
+    base = []
+    for kind in KINDS:
+        builder = CSRBuilder()
+        for source, user_id in edges[kind]:
+            builder.add(source, user_id)
+        base.append(builder.finish())
+    return base
+
+def dict_of_sets_bytes(base: list[tuple]) -> int:
+    """同样的边保存为 {源: set(user_id)} 时的内存，作为参照"""
+    tracemalloc.start()
+    copies = [{keys[i]: set(targets[offsets[i]:offsets[i + 1]]) for i in range(len(keys))} for keys, offsets, targets in base]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del copies
+    return size
+
+def timed(func, repeat: int) -> float:
+    """中位数耗时（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def resolution_rows(graph: SubscriptionGraph, thread_id: int, author_id: int, repeat: int) -> list[tuple]:
+    rows = []
+    for update_type, kinds in UPDATE_KINDS.items():
+        count = sum(1 for _ in graph.recipients(thread_id, author_id, kinds))
+        count_ms = timed(lambda: sum(1 for _ in graph.recipients(thread_id, author_id, kinds)), repeat)
+        first_ms = timed(lambda: next(graph.recipients(thread_id, author_id, kinds), None), repeat)
+        rows.append((update_type, count, count_ms, first_ms))
+    return rows
+
+def print_resolution(title: str, rows: list[tuple]):
+    print(f"\n{title}")
+    print(f"{'更新类型':<8} | {'收件人':>8} | {'逐个产出全部(ms)':>16} | {'产出第一个(ms)':>14}")
+    for update_type, count, count_ms, first_ms in rows:
+        print(f"{update_type:<8} | {count:>8} | {count_ms:>16.2f} | {first_ms:>14.3f}")
+
+def offline(args, synthetic, directory: str) -> SubscriptionGraph:
+    base = build_base(synthetic)
+    edges = sum(len(targets) for _, _, targets in base)
+    graph = SubscriptionGraph()
+    graph._base = base
+    print(f"关系图: {edges} 条边（发行版 {len(base[RELEASE][2])}，测试版 {len(base[TEST][2])}，关注 {len(base[FOLLOW][2])}）")
+
+    per_million = 10**6 / edges / (1024 * 1024)
+    print(f"CSR 内存: {graph.nbytes / (1024 * 1024):.1f} MB，每百万条边 {graph.nbytes * per_million:.1f} MB")
+    print(f"参照 dict[int, set[int]]: 每百万条边 {dict_of_sets_bytes(base) * per_million:.1f} MB")
+
+    path = os.path.join(directory, "subscription_graph.bin")
+    write_ms = timed(lambda: write_snapshot(path, base, 0, int(time.time())), 3)
+    map_ms = timed(lambda: unmap_snapshot(*map_snapshot(path)[::3]), args.repeat)
+    print(f"快照: {os.path.getsize(path) / (1024 * 1024):.1f} MB，写入 {write_ms:.1f} ms，映射（含关闭） {map_ms:.3f} ms")
+    snapshot = map_snapshot(path)
+    graph._replace_base(snapshot[0], snapshot[3])
+
+    thread_id = synthetic.hottest_thread()
+    author_id = synthetic.threads[thread_id]
+    print_resolution(f"收件人解析（帖子 {thread_id}，映射的快照，无覆盖层）", resolution_rows(graph, thread_id, author_id, args.repeat))
+
+    rng = random.Random(args.seed)
+    thread_ids = list(synthetic.threads)
+    for _ in range(max(1, edges // 100)):
+        kind = rng.choice(EDGE_KINDS)
+        if kind == FOLLOW:
+            source = author_id if rng.random() < 0.1 else rng.choice(synthetic.authors)
+        else:
+            source = thread_id if rng.random() < 0.1 else rng.choice(thread_ids)
+        graph.apply(kind, source, rng.choice(synthetic.users), rng.random() < 0.5)
+    print_resolution(f"收件人解析（有覆盖层：{graph.pending_changes} 条未合并的变化）", resolution_rows(graph, thread_id, author_id, args.repeat))
+    merge_ms = timed(graph._merged, 3)
+    print(f"合并覆盖层（写快照前）: {merge_ms:.1f} ms")
+    return graph
+
+async def with_database(args, synthetic, directory: str):
+    from benchmarks.db import create_bench_pool, truncate_tables
+    from benchmarks.graph import seed_database
+    from src import database
+    from src.fanout import count_recipients, stream_recipients
+    from src.followers import follower_index
+
+    pool = await create_bench_pool(maxsize=4)
+    try:
+        await database.setup_database(pool)
+        await truncate_tables(pool)
+        await seed_database(pool, synthetic)
+        thread_id = synthetic.hottest_thread()
+        author_id = synthetic.threads[thread_id]
+        path = os.path.join(directory, "db_graph.bin")
+
+        start = time.perf_counter()
+        await subscription_graph.load(pool, path, max_age_seconds=3600)
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        await subscription_graph.load(pool, path, max_age_seconds=3600)
+        print(f"\n加载关系图：从数据库重建 {build_s:.2f} s，从快照映射并追上变化 {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        async def count():
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    total = await count_recipients(cursor, thread_id, author_id, args.update_type, "instant")
+                await conn.commit()
+            return total
+
+        async def drain():
+            return sum(1 async for _ in stream_recipients(pool, thread_id, author_id, args.update_type, audience="instant"))
+
+        print(f"\n{'路径':<16} | {'收件人':>8} | {'count_recipients(ms)':>20} | {'stream_recipients 全部读完(ms)':>30}")
+        for name, ready in (("数据库", False), ("关系图", True)):
+            subscription_graph.ready = ready
+            follower_index.clear()
+            total = await count() # 预热：关注者索引加载、连接建立
+            count_samples, drain_samples = [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                await count()
+                count_samples.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                streamed = await drain()
+                drain_samples.append(time.perf_counter() - start)
+            assert streamed == total, f"{name}: 流式读取 {streamed} 人，计数 {total} 人"
+            print(f"{name:<16} | {total:>8} | {statistics.median(count_samples) * 1000:>20.2f} | {statistics.median(drain_samples) * 1000:>30.2f}")
+    finally:
+        pool.close()
+        await pool.wait_closed()
+
+def main(args):
+    synthetic = generate_graph(args.edges, seed=args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        offline(args, synthetic, directory)
+        if args.sql:
+            asyncio.run(with_database(args, synthetic, directory))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--update-type", choices=sorted(UPDATE_KINDS), default="release")
+    parser.add_argument("--sql", action="store_true", help="同时测量数据库路径（需要 BENCH_MYSQL_*）")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    main(parse_args(sys.argv[1:]))
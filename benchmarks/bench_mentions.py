@@ -0,0 +1,106 @@
+"""幽灵提及端到端耗时：固定批次+固定延迟 vs 按限速桶调度+按字符装包，多个任务并发时的公平性，以及摘要模式的收益。
+
+    python -m benchmarks.bench_mentions [人数 ...]
+
+时间为虚拟时钟下的模拟耗时（含每个请求 50ms 的网络延迟），不会真正等待。
+"""
+import asyncio
+import random
+import sys
+import time
+from benchmarks.fake_discord import FakeDiscordHTTP, FakeThread, run_virtual
+from src.fanout import FanoutScheduler, MentionPacer, deliver_mentions
+from src.progress import ProgressReporter
+
+def make_user_ids(count: int, seed: int = 0) -> list[int]:
+    rng = random.Random(seed)
+    return sorted(rng.randrange(10**17, 10**19) for _ in range(count))
+
+async def legacy_fanout(user_ids, batch_size=50, delay_ms=1000):
+    """旧版 update_feed 中的循环：固定 50 人一批，每批都编辑进度，然后固定等待"""
+    http = FakeDiscordHTTP()
+    thread = FakeThread(http, 1)
+    response_message = thread.get_partial_message(0)
+    for i in range(0, len(user_ids), batch_size):
+        batch = user_ids[i:i + batch_size]
+        ghosted_message = await thread.send(" ".join(f"<@{uid}>" for uid in batch))
+        await ghosted_message.delete()
+        await response_message.edit()
+        await asyncio.sleep(delay_ms / 1000.0)
+    return http, thread
+
+def _observed_pacer(http):
+    """按默认配置创建 MentionPacer，并让它读取假 HTTP 层的响应头"""
+    pacer = MentionPacer(1.0)
+    http.observers.append(pacer.observe)
+    return pacer
+
+async def paced_fanout(user_ids):
+    """当前实现：deliver_mentions + MentionPacer，进度由 ProgressReporter 合并后再编辑"""
+    http = FakeDiscordHTTP()
+    thread = FakeThread(http, 1)
+    reporter = ProgressReporter(thread.get_partial_message(0), lambda done, total: None, len(user_ids))
+
+    async def on_batch(batch):
+        await reporter.advance(len(batch))
+
+    await deliver_mentions(thread, user_ids, _observed_pacer(http), on_batch)
+    await reporter.finish()
+    return http, thread
+
+async def concurrent_fanout(big_size, small_size=20, small_delay=10.0, rate=10.0):
+    """一个大帖子通知进行中时，small_delay 秒后再发布一个小帖子，返回小帖子从发布到通知完成的耗时"""
+    http = FakeDiscordHTTP()
+    scheduler = FanoutScheduler(None, rate, max_active_jobs=32)
+    scheduler.start()
+    pacer = _observed_pacer(http)
+    loop = asyncio.get_running_loop()
+
+    async def job(thread_id, user_ids, delay=0.0):
+        await asyncio.sleep(delay)
+        start = loop.time()
+        await deliver_mentions(FakeThread(http, thread_id), user_ids, pacer, acquire_turn=scheduler.acquire_turn)
+        return loop.time() - start
+
+    big = asyncio.create_task(job(1, make_user_ids(big_size)))
+    small_elapsed = await job(2, make_user_ids(small_size, seed=1), small_delay)
+    big_elapsed = await big
+    return big_elapsed, small_elapsed
+
+async def digest_fanout(user_ids, updates=5, digest=False):
+    """一个窗口内发布 updates 次更新：即时模式每次都提及全部订阅者，摘要模式在窗口结束时只提及一次"""
+    http = FakeDiscordHTTP()
+    thread = FakeThread(http, 1)
+    pacer = _observed_pacer(http)
+    for _ in range(1 if digest else updates):
+        await deliver_mentions(thread, user_ids, pacer)
+    return http, thread
+
+def main(sizes):
+    print(f"{'人数':>8} | {'策略':<8} | {'模拟耗时(s)':>11} | {'消息数':>6} | {'REST调用':>8} | {'429':>4} | {'实际耗时(s)':>10}")
+    for size in sizes:
+        user_ids = make_user_ids(size)
+        for name, strategy in (("legacy", legacy_fanout), ("paced", paced_fanout)):
+            wall_start = time.perf_counter()
+            (http, thread), elapsed = run_virtual(strategy(user_ids))
+            wall = time.perf_counter() - wall_start
+            print(f"{size:>8} | {name:<8} | {elapsed:>11.1f} | {len(thread.sent):>6} | {sum(http.calls.values()):>8} | {http.ratelimited:>4} | {wall:>10.2f}")
+
+    print()
+    print("并发发布：大帖子通知进行中，10 秒后发布一个 20 人的小帖子")
+    for size in sizes:
+        (big_elapsed, small_elapsed), _ = run_virtual(concurrent_fanout(size))
+        print(f"{size:>8} 人的大帖子耗时 {big_elapsed:>8.1f}s | 小帖子耗时 {small_elapsed:>5.1f}s")
+
+    print()
+    print("摘要模式：一个窗口内发布 5 次更新")
+    for size in sizes:
+        user_ids = make_user_ids(size)
+        row = []
+        for name, digest in (("即时", False), ("摘要", True)):
+            (http, _), elapsed = run_virtual(digest_fanout(user_ids, digest=digest))
+            row.append(f"{name} {sum(http.calls.values()):>6} 次REST / {elapsed:>7.1f}s")
+        print(f"{size:>8} 人 | " + " | ".join(row))
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
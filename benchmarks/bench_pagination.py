@@ -0,0 +1,119 @@
+"""翻页耗时：键集分页在第 1 页与第 N 页（默认 500）的对比，旧的 LIMIT/OFFSET 查询作为参照。
+
+    # 与 benchmarks.run 相同，需要一个单独的 MySQL（会清空其中的表！）
+    BENCH_MYSQL_HOST=127.0.0.1 BENCH_MYSQL_PASSWORD=... python -m benchmarks.bench_pagination --depth 500
+
+为一个用户写入 depth+1 页的订阅（全部未读），然后直接驱动管理面板与“查看更新”的下一页回调。
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from benchmarks.db import create_bench_pool, truncate_tables
+from benchmarks.fake_discord import FakeDMChannel, FakeInteraction, RecordingHTTP
+from benchmarks.graph import GUILD_ID, generate_graph, seed_database
+from src import database
+from src.bot_app import MyBot
+from src.replicas import ReadRouter
+from src.ui import ManagementPaginatorView, UpdatesPaginatorView
+
+# 旧版实现中的 OFFSET 查询，仅作为参照
+LEGACY_QUERIES = {
+    "管理面板": """
+        SELECT subscription_id, thread_id, subscribe_release, subscribe_test
+        FROM thread_subscriptions
+        WHERE user_id = %s AND (subscribe_release = TRUE OR subscribe_test = TRUE)
+        ORDER BY subscription_id DESC
+        LIMIT %s OFFSET %s
+    """,
+}
+
+def build_graph(depth: int, per_page: int, seed: int):
+    """普通用户的关系图，外加一个订阅了 (depth + 1) 页帖子的用户"""
+    items = (depth + 1) * per_page
+    users = 1000
+    authors = users // 50
+    graph = generate_graph(20_000, users=users, threads_per_author=-(-items // authors), seed=seed)
+    heavy_user = graph.users[-1]
+    graph.subscriptions = [s for s in graph.subscriptions if s[0] != heavy_user]
+    graph.subscriptions += [(heavy_user, thread_id, True, True, True) for thread_id in graph.threads]
+    return graph, heavy_user
+
+async def flip_to(view, page: int):
+    """把视图定位到第 page 页（从 0 开始），只用于准备，不计时"""
+    await view._fetch_page_data("first")
+    view.current_page = 0
+    for _ in range(page):
+        await view._fetch_page_data("next")
+        view.current_page += 1
+    view.update_view() # 同步总页数与按钮状态
+
+async def time_next_page(bot, http, view, user_id: int, page: int, samples: int) -> float:
+    """从第 page 页点击“下一页”的中位耗时（毫秒）"""
+    await flip_to(view, page)
+    keys = (view.pager.first_key, view.pager.last_key)
+    durations = []
+    for _ in range(samples):
+        view.pager.first_key, view.pager.last_key = keys
+        view.current_page = page
+        interaction = FakeInteraction(bot, http, user_id, FakeDMChannel(user_id), guild_id=GUILD_ID, data={"custom_id": "page_next"})
+        start = time.perf_counter()
+        await view.page_callback(interaction)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000
+
+async def time_legacy(pool, sql: str, user_id: int, page: int, per_page: int, samples: int) -> float:
+    durations = []
+    async with pool.acquire() as conn, conn.cursor() as cursor:
+        for _ in range(samples):
+            start = time.perf_counter()
+            await cursor.execute(sql, (user_id, per_page, page * per_page))
+            await cursor.fetchall()
+            durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000
+
+async def main(args) -> int:
+    pool = await create_bench_pool(maxsize=4)
+    try:
+        bot = MyBot()
+        bot.db_pool = pool
+        bot.db_reads = ReadRouter(pool, {}, 0, 0)
+        per_page = bot.UPDATES_PER_PAGE
+        graph, heavy_user = build_graph(args.depth, per_page, args.seed)
+        print(f"合成关系图: {len(graph.users)} 用户, {len(graph.threads)} 帖子；测试用户订阅了 {len(graph.threads)} 个帖子（每页 {per_page} 项）")
+
+        await database.setup_database(pool)
+        await truncate_tables(pool)
+        await seed_database(pool, graph)
+
+        http = RecordingHTTP(0)
+        total = len(graph.threads)
+        pages = (1, args.depth)
+        print(f"{'视图':<10} | " + " | ".join(f"{f'第{p}页(ms)':>12}" for p in pages))
+        management = ManagementPaginatorView(bot, heavy_user, 'thread', total)
+        results = [await time_next_page(bot, http, management, heavy_user, p - 1, args.samples) for p in pages]
+        print(f"{'管理面板':<10} | " + " | ".join(f"{r:>12.2f}" for r in results))
+
+        updates = UpdatesPaginatorView(bot, heavy_user, total, 0)
+        updates.current_view_state = 'threads'
+        results = [await time_next_page(bot, http, updates, heavy_user, p - 1, args.samples) for p in pages]
+        print(f"{'查看更新':<10} | " + " | ".join(f"{r:>12.2f}" for r in results))
+
+        for name, sql in LEGACY_QUERIES.items():
+            results = [await time_legacy(pool, sql, heavy_user, p - 1, per_page, args.samples) for p in pages]
+            print(f"{name + '(OFFSET)':<10} | " + " | ".join(f"{r:>12.2f}" for r in results))
+    finally:
+        pool.close()
+        await pool.wait_closed()
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=500, help="与第 1 页对比的页码")
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
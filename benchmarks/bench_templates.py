@@ -0,0 +1,48 @@
+"""{{宏}} 模板的单次渲染耗时：逐个 str.replace（旧做法） vs 启动时编译的 Template.render。
+
+    python -m benchmarks.bench_templates [每项次数]
+
+模板取自 src.config（离线运行时为 benchmarks/__init__.py 中的占位文本，有 .env 时为真实配置）。
+render 一列包含用户文本（UPDATE_TEXT 的 {{text}}）的转义，这是旧做法没有的开销，单独列出。
+"""
+import sys
+import timeit
+from src import config
+from src.templates import escape_user_text
+
+def legacy_render(source: str, values: dict) -> str:
+    text = source
+    for field, value in values.items():
+        text = text.replace(f"{{{{{field}}}}}", str(value))
+    return text
+
+CASES = {
+    "UPDATE_TEXT": (config.UPDATE_TEXT, {
+        "author": "<@123456789012345678>",
+        "text": "修复了若干问题，新增 **夜间模式**，详见 changelog_v2",
+        "url": "https://discord.com/channels/1/2/3",
+    }),
+    "DM_PANEL_TEXT": (config.DM_PANEL_TEXT, {
+        "user": "<@123456789012345678>", "thread_update_number": 12, "author_update_number": 3,
+    }),
+    "TRACK_NEW_THREAD_EMBED_TEXT": (config.TRACK_NEW_THREAD_EMBED_TEXT, {
+        "author": "<@123456789012345678>", "thread_url": "https://discord.com/channels/1/2",
+    }),
+}
+
+ESCAPED = {"UPDATE_TEXT": "text"}
+
+def _per_call_ns(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e9
+
+def main(number: int):
+    print(f"{'模板':<28} | {'replace 链(ns)':>14} | {'render(ns)':>10} | {'其中转义(ns)':>12}")
+    for name, (template, values) in CASES.items():
+        legacy = _per_call_ns(lambda: legacy_render(template.source, values), number)
+        compiled = _per_call_ns(lambda: template.render(**values), number)
+        field = ESCAPED.get(name)
+        escape = _per_call_ns(lambda: escape_user_text(values[field]), number) if field else 0.0
+        print(f"{name:<28} | {legacy:>14.0f} | {compiled:>10.0f} | {escape:>12.0f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
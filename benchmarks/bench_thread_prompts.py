@@ -0,0 +1,84 @@
+"""新帖子提示：旧版串行队列（未就绪时原地等 10 秒、最多 3 次、每帖之后再等 1 秒） vs ThreadPromptQueue（延迟堆 + worker 池）。
+
+    python -m benchmarks.bench_thread_prompts [帖子数] [最长未就绪秒数]
+
+在虚拟时钟上一次性创建一批帖子，每个帖子在 0 ~ 最长未就绪秒数之间的随机时刻之前发送消息都返回 40058，
+输出每种做法的总耗时、提示延迟（从收到帖子到提示发出）的 p50/p99 与放弃的帖子数。
+"""
+import asyncio
+import random
+import sys
+import discord
+from benchmarks.fake_discord import FakeDiscordHTTP, FakeGuild, FakeThread, run_virtual
+from src import config
+from src.thread_prompts import THREAD_NOT_READY, ThreadPromptQueue, _percentile
+from src.ui import TrackNewThreadView
+
+class _ForbiddenResponse:
+    status = 403
+    reason = "Forbidden"
+
+class NotReadyThread(FakeThread):
+    """在 ready_at 之前发送消息都返回 40058 的帖子"""
+    def __init__(self, http, thread_id: int, ready_at: float, guild):
+        super().__init__(http, thread_id, owner_id=thread_id, guild=guild)
+        self.ready_at = ready_at
+
+    async def send(self, content=None, **fields):
+        if asyncio.get_running_loop().time() < self.ready_at:
+            await asyncio.sleep(self._http.latency)
+            raise discord.Forbidden(_ForbiddenResponse(), {"code": THREAD_NOT_READY, "message": "Thread not ready"})
+        return await super().send(content, **fields)
+
+class FakeBot:
+    TRACK_NEW_THREAD_EMBED_TITLE = config.TRACK_NEW_THREAD_EMBED_TITLE
+    TRACK_NEW_THREAD_EMBED_TEXT = config.TRACK_NEW_THREAD_EMBED_TEXT
+
+    async def wait_until_ready(self):
+        pass
+
+def make_threads(count: int, max_not_ready: float, seed: int) -> list[NotReadyThread]:
+    rng = random.Random(seed)
+    http = FakeDiscordHTTP()
+    guild = FakeGuild(1)
+    return [NotReadyThread(http, 1000 + i, rng.uniform(0, max_not_ready), guild) for i in range(count)]
+
+async def legacy(threads: list[NotReadyThread]) -> tuple[list[float], int]:
+    """旧版 thread_processor_task 的发送逻辑（一个协程依次处理队列）"""
+    loop = asyncio.get_running_loop()
+    latencies, dead = [], 0
+    for thread in threads:
+        for attempt in range(3):
+            try:
+                await thread.send(embed=None, view=TrackNewThreadView())
+                latencies.append(loop.time())
+                break
+            except discord.Forbidden:
+                if attempt < 2:
+                    await asyncio.sleep(10)
+                else:
+                    dead += 1
+        await asyncio.sleep(1)
+    return latencies, dead
+
+async def pooled(threads: list[NotReadyThread]) -> tuple[list[float], int]:
+    queue = ThreadPromptQueue(FakeBot(), config.THREAD_PROMPT_WORKERS, config.THREAD_PROMPT_MAX_ATTEMPTS,
+                              config.THREAD_PROMPT_RETRY_BASE_SECONDS, config.THREAD_PROMPT_RETRY_MAX_SECONDS, window=len(threads))
+    queue.start()
+    for thread in threads:
+        queue.submit(thread)
+    while queue.depth:
+        await asyncio.sleep(0.1)
+    return list(queue.recent_latencies), queue.dead
+
+def main(count: int, max_not_ready: float):
+    print(f"{count} 个帖子，各自在 0 ~ {max_not_ready:g} 秒内就绪；worker {config.THREAD_PROMPT_WORKERS} 个，"
+          f"退避 {config.THREAD_PROMPT_RETRY_BASE_SECONDS:g} ~ {config.THREAD_PROMPT_RETRY_MAX_SECONDS:g} 秒，最多 {config.THREAD_PROMPT_MAX_ATTEMPTS} 次")
+    print(f"{'做法':<16} | {'总耗时(s)':>9} | {'p50(s)':>7} | {'p99(s)':>7} | {'放弃':>4}")
+    for name, run in (("旧版串行队列", legacy), ("延迟堆 + worker", pooled)):
+        (latencies, dead), elapsed = run_virtual(run(make_threads(count, max_not_ready, seed=0)))
+        p50, p99 = _percentile(latencies, 50), _percentile(latencies, 99)
+        print(f"{name:<16} | {elapsed:>9.1f} | {p50:>7.1f} | {p99:>7.1f} | {dead:>4}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30, float(sys.argv[2]) if len(sys.argv) > 2 else 15)
@@ -0,0 +1,160 @@
+"""订阅按钮的点击吞吐：500 个并发模拟用户反复点击“订阅发行版 / 订阅测试版 / 关注作者”。
+
+    # 与 benchmarks.run 相同，需要一个单独的 MySQL（会清空其中的表！）
+    BENCH_MYSQL_HOST=127.0.0.1 BENCH_MYSQL_PASSWORD=... python -m benchmarks.bench_toggles --users 500 --clicks 20
+
+before 为合并前的流程（单独的建用户请求，切换前后各统计一次未读数，最后单独提交），
+after 直接驱动当前的 SubscriptionView 回调（每次点击一条批量语句）。两轮之间重新写入种子数据。
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import aiomysql
+from benchmarks.db import CountingPool, create_bench_pool, truncate_tables
+from benchmarks.fake_discord import FakeInteraction, FakeThread, RecordingHTTP
+from benchmarks.graph import GUILD_ID, generate_graph, seed_database
+from src import config, database, unread
+from src.bot_app import MyBot
+from src.followers import follower_index
+from src.replicas import ReadRouter
+from src.ui import SubscriptionView
+
+BUTTONS = ("subscribe_release", "subscribe_test", "follow_author")
+_TOGGLE_SQL = {
+    "subscribe_release": """
+        INSERT INTO thread_subscriptions (user_id, thread_id, subscribe_release, last_seen_seq)
+        SELECT %s, thread_id, TRUE, last_update_seq FROM managed_threads WHERE thread_id = %s
+        ON DUPLICATE KEY UPDATE
+            last_seen_seq = IF(subscribe_release OR subscribe_test, thread_subscriptions.last_seen_seq, managed_threads.last_update_seq),
+            subscribe_release = NOT subscribe_release
+    """,
+    "subscribe_test": """
+        INSERT INTO thread_subscriptions (user_id, thread_id, subscribe_test, last_seen_seq)
+        SELECT %s, thread_id, TRUE, last_update_seq FROM managed_threads WHERE thread_id = %s
+        ON DUPLICATE KEY UPDATE
+            last_seen_seq = IF(subscribe_release OR subscribe_test, thread_subscriptions.last_seen_seq, managed_threads.last_update_seq),
+            subscribe_test = NOT subscribe_test
+    """,
+}
+
+# --- 合并前的流程，仅作为参照 ---
+async def _legacy_counts(cursor, user_id: int, scope: str, scope_args: tuple) -> tuple[int, int]:
+    await cursor.execute(f"SELECT COUNT(*) {unread._THREAD_UNREAD_FROM} {scope}", (user_id, *scope_args))
+    thread_count = (await cursor.fetchone())[0]
+    await cursor.execute(f"SELECT COUNT(*) {unread._AUTHOR_UNREAD_FROM} {scope}", (user_id, *scope_args))
+    return thread_count, (await cursor.fetchone())[0]
+
+async def legacy_click(pool, button: str, user_id: int, thread_id: int, author_id: int):
+    await database.check_and_create_user(pool, user_id)
+    scope, scope_args = ("AND t.author_id = %s", (author_id,)) if button == "follow_author" else ("AND t.thread_id IN (%s)", (thread_id,))
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT 1 FROM unread_counters WHERE user_id = %s", (user_id,))
+            tracked = await cursor.fetchone() is not None
+            if tracked:
+                before = await _legacy_counts(cursor, user_id, scope, scope_args)
+            if button == "follow_author":
+                try:
+                    await cursor.execute("INSERT INTO author_follows (follower_id, author_id, last_seen_seq) SELECT %s, %s, COALESCE(MAX(seq), 0) FROM update_sequence",
+                                         (user_id, author_id))
+                except aiomysql.IntegrityError as err:
+                    if err.args[0] != 1062:
+                        raise
+                    await cursor.execute("DELETE FROM author_follows WHERE follower_id = %s AND author_id = %s", (user_id, author_id))
+            else:
+                await cursor.execute(_TOGGLE_SQL[button], (user_id, thread_id))
+            if tracked:
+                after = await _legacy_counts(cursor, user_id, scope, scope_args)
+                if after != before:
+                    await cursor.execute("UPDATE unread_counters SET thread_unread = thread_unread + %s, author_unread = author_unread + %s WHERE user_id = %s",
+                                         (after[0] - before[0], after[1] - before[1], user_id))
+            if button != "follow_author":
+                column = button.removeprefix("subscribe_")
+                await cursor.execute(f"SELECT subscribe_{column} FROM thread_subscriptions WHERE user_id = %s AND thread_id = %s", (user_id, thread_id))
+                await cursor.fetchone()
+        await conn.commit()
+
+# --- 测量 ---
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def prepare(raw_pool, graph, users: list[int]):
+    """重新写入种子数据，并为一半的模拟用户建立未读计数器（打开过控制面板的用户）"""
+    await truncate_tables(raw_pool)
+    await seed_database(raw_pool, graph)
+    async with raw_pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            for user_id in users[::2]:
+                await unread.get_counts(cursor, user_id)
+        await conn.commit()
+    database.known_users.clear()
+    follower_index.clear()
+
+async def run_mode(mode: str, bot: MyBot, pool: CountingPool, graph, users: list[int], clicks: int, seed: int) -> dict:
+    http = RecordingHTTP(0)
+    thread_ids = list(graph.threads)
+    latencies = []
+
+    async def simulated_user(user_id: int):
+        rng = random.Random(seed * 1_000_003 + user_id)
+        for _ in range(clicks):
+            button = rng.choice(BUTTONS)
+            thread_id = rng.choice(thread_ids)
+            start = time.perf_counter()
+            if mode == "before":
+                await legacy_click(pool, button, user_id, thread_id, graph.threads[thread_id])
+            else:
+                thread = FakeThread(http, thread_id, owner_id=graph.threads[thread_id], parent_id=0, guild=None)
+                interaction = FakeInteraction(bot, http, user_id, thread, guild_id=GUILD_ID)
+                await getattr(SubscriptionView(), button).callback(interaction)
+            latencies.append(time.perf_counter() - start)
+
+    pool.round_trips = 0
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(simulated_user(user_id) for user_id in users))
+    wall = time.perf_counter() - wall_start
+    return {
+        "clicks_per_s": len(latencies) / wall,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "db_round_trips": pool.round_trips / len(latencies),
+    }
+
+async def main(args) -> int:
+    graph = generate_graph(args.edges, users=max(args.users, 1000), seed=args.seed)
+    users = random.Random(args.seed).sample(graph.users, args.users)
+    print(f"合成关系图: {len(graph.users)} 用户, {len(graph.threads)} 帖子；{args.users} 个并发用户各点击 {args.clicks} 次，连接池 {args.pool_size}")
+
+    raw_pool = await create_bench_pool(maxsize=args.pool_size)
+    pool = CountingPool(raw_pool)
+    try:
+        await database.setup_database(raw_pool)
+        bot = MyBot()
+        bot.db_pool = pool
+        bot.batch_pool = pool
+        bot.db_reads = ReadRouter(pool, {}, 0, 0)
+
+        print(f"{'流程':<8} | {'点击/s':>8} | {'p50(ms)':>8} | {'p99(ms)':>8} | {'DB往返':>6}")
+        for mode in ("before", "after"):
+            await prepare(raw_pool, graph, users)
+            r = await run_mode(mode, bot, pool, graph, users, args.clicks, args.seed)
+            print(f"{mode:<8} | {r['clicks_per_s']:>8.1f} | {r['p50_ms']:>8.2f} | {r['p99_ms']:>8.2f} | {r['db_round_trips']:>6.1f}")
+    finally:
+        raw_pool.close()
+        await raw_pool.wait_closed()
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500, help="并发模拟用户数")
+    parser.add_argument("--clicks", type=int, default=20, help="每个用户的点击次数")
+    parser.add_argument("--edges", type=int, default=20_000)
+    parser.add_argument("--pool-size", type=int, default=config.POOL_SIZE, help="连接池大小，默认与机器人相同")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,135 @@
+"""基准测试用的数据库连接：连接本地 MySQL 容器，并统计每个场景的数据库往返次数。"""
+import os
+import aiomysql
+from pymysql.constants import CLIENT
+
+BENCH_TABLES = [ # 按外键依赖的逆序清空
+    "graph_changes",
+    "update_events",
+    "unread_counters",
+    "pending_digests",
+    "notification_jobs",
+    "author_thread_reads",
+    "update_sequence",
+    "author_follows",
+    "thread_subscriptions",
+    "thread_permissions",
+    "managed_threads",
+    "users",
+]
+
+async def create_bench_pool(maxsize: int = 20) -> aiomysql.Pool:
+    """连接 BENCH_MYSQL_* 指定的数据库（例如 `docker compose up db` 启动的容器）
+
+    基准测试会清空其中的表，请务必使用单独的数据库。
+    """
+    return await aiomysql.create_pool(
+        host=os.getenv("BENCH_MYSQL_HOST", "127.0.0.1"),
+        port=int(os.getenv("BENCH_MYSQL_PORT", 3306)),
+        user=os.getenv("BENCH_MYSQL_USER", "root"),
+        password=os.getenv("BENCH_MYSQL_PASSWORD", ""),
+        db=os.getenv("BENCH_MYSQL_DATABASE", "update_bot_bench"),
+        minsize=1,
+        maxsize=maxsize,
+        autocommit=False,
+        client_flag=CLIENT.MULTI_STATEMENTS, # 同一个池同时充当 bot.db_pool 与 bot.batch_pool
+    )
+
+async def truncate_tables(pool: aiomysql.Pool):
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in BENCH_TABLES:
+                await cursor.execute(f"TRUNCATE TABLE {table}")
+            await cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        await conn.commit()
+
+# --- 往返次数统计 ---
+class _CountingCursor:
+    def __init__(self, cursor, pool: "CountingPool"):
+        self._cursor = cursor
+        self._pool = pool
+
+    async def execute(self, query, args=None):
+        self._pool.round_trips += 1
+        return await self._cursor.execute(query, args)
+
+    async def executemany(self, query, args):
+        self._pool.round_trips += 1
+        return await self._cursor.executemany(query, args)
+
+    async def callproc(self, procname, args=()):
+        self._pool.round_trips += 1
+        return await self._cursor.callproc(procname, args)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _CursorContext:
+    def __init__(self, conn, pool: "CountingPool", cursor_args):
+        self._conn = conn
+        self._pool = pool
+        self._cursor_args = cursor_args
+        self._wrapped = None
+
+    async def _open(self):
+        self._wrapped = _CountingCursor(await self._conn.cursor(*self._cursor_args), self._pool)
+        return self._wrapped
+
+    def __await__(self):
+        return self._open().__await__()
+
+    async def __aenter__(self):
+        return await self._open()
+
+    async def __aexit__(self, *exc):
+        await self._wrapped._cursor.close()
+
+class _CountingConnection:
+    def __init__(self, conn, pool: "CountingPool"):
+        self._conn = conn
+        self._pool = pool
+
+    def cursor(self, *cursor_args):
+        return _CursorContext(self._conn, self._pool, cursor_args)
+
+    async def commit(self):
+        self._pool.round_trips += 1
+        await self._conn.commit()
+
+    async def rollback(self):
+        self._pool.round_trips += 1
+        await self._conn.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class _AcquireContext:
+    def __init__(self, pool: "CountingPool"):
+        self._pool = pool
+        self._conn = None
+
+    async def __aenter__(self):
+        self._conn = await self._pool.pool.acquire()
+        return _CountingConnection(self._conn, self._pool)
+
+    async def __aexit__(self, *exc):
+        self._pool.pool.release(self._conn)
+
+class CountingPool:
+    """包装 aiomysql 连接池，统计 execute/commit 产生的数据库往返次数"""
+    def __init__(self, pool: aiomysql.Pool):
+        self.pool = pool
+        self.round_trips = 0
+
+    def acquire(self):
+        return _AcquireContext(self)
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
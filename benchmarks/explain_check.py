@@ -0,0 +1,238 @@
+"""对 src/command.py、src/ui.py、src/fanout.py、src/unread.py、src/permissions.py、src/threads.py、src/followers.py、src/history.py、src/compaction.py、src/graph.py 中的每条 SQL 执行 EXPLAIN，出现全表扫描时以非 0 退出。
+
+tests/test_explain.py 在设置了 BENCH_MYSQL_HOST 时随 pytest 一起运行（否则跳过），也可以单独运行：
+
+    # 与 benchmarks.run 相同，需要一个单独的 MySQL（会清空其中的表！）
+    BENCH_MYSQL_HOST=127.0.0.1 BENCH_MYSQL_PASSWORD=... python -m benchmarks.explain_check --edges 20000
+
+SQL 直接从源码的字符串字面量中提取；f-string 中的可变部分（包括 src/unread.py 中拼接的未读条件）按 SUBSTITUTIONS 展开，
+订阅者查询这类由函数拼出的语句由 _generated_statements 补充。键集分页的语句按 SEEK_ACTIONS 各展开一次，带上真实的范围条件。
+占位符按其前面的列名绑定到种子数据中真实存在的 id 与分页键，避免优化器因常量不存在而直接短路。
+不设行数下限：即使种子数据中几乎为空的表出现全表扫描也视为问题。
+"""
+import argparse
+import ast
+import asyncio
+import re
+import sys
+from pathlib import Path
+from benchmarks.db import BENCH_TABLES, create_bench_pool, truncate_tables
+from benchmarks.graph import generate_graph, seed_database
+import aiomysql
+from src import database, fanout, unread
+from src.pagination import KeysetPager
+
+SEEK_ACTIONS = ("first", "next", "prev", "stay", "last")
+
+SOURCES = ["src/command.py", "src/ui.py", "src/fanout.py", "src/unread.py", "src/permissions.py", "src/threads.py", "src/followers.py", "src/history.py", "src/compaction.py", "src/graph.py"]
+SQL_START = re.compile(r"^\s*(SELECT|UPDATE|DELETE|INSERT)\b", re.IGNORECASE)
+
+# f-string 表达式（ast.unparse 后的源码） -> 展开后的 SQL 片段
+SUBSTITUTIONS = {
+    "update_type.value": "release",
+    "update_type": "release",
+    "subscribed_after": "COALESCE(ts.subscribe_release, FALSE)",
+    "_THREAD_UNREAD_BEFORE": unread._THREAD_UNREAD_BEFORE,
+    "','.join(['%s'] * len(ids_to_process))": "%s, %s",
+    "','.join(['%s'] * len(thread_ids_to_update))": "%s, %s",
+    "','.join(['%s'] * len(thread_ids_to_delete))": "%s, %s",
+    "placeholders": "%s, %s",
+    "THREAD_UNREAD_CONDITION": unread.THREAD_UNREAD_CONDITION,
+    "_THREAD_UNREAD_FROM": unread._THREAD_UNREAD_FROM,
+    "_AUTHOR_UNREAD_FROM": unread._AUTHOR_UNREAD_FROM,
+    "AUTHOR_UNREAD_CONDITION": unread.AUTHOR_UNREAD_CONDITION,
+    "_THREAD_UNREAD_TABLES": unread._THREAD_UNREAD_TABLES,
+    "_AUTHOR_UNREAD_TABLES": unread._AUTHOR_UNREAD_TABLES,
+    "scope": "AND t.thread_id IN (%s, %s)",
+}
+# 含有这些表达式的 f-string 由 _generated_statements 覆盖
+GENERATED_MARKERS = ("_subscribers_sql(", "_SUBSCRIPTION_FILTERS[", "audience_filter", "subscribed", "page_from")
+_GENERATED = object()
+
+def _seek_columns(node: ast.JoinedStr) -> tuple[str, ...]:
+    """键集分页语句的排序列：每个 {seek.order} 前面的列名"""
+    columns = []
+    for before, value in zip(node.values, node.values[1:]):
+        if (isinstance(before, ast.Constant) and isinstance(value, ast.FormattedValue)
+                and ast.unparse(value.value) == "seek.order"):
+            columns.append(re.search(r"([\w.]+)\s*$", before.value).group(1))
+    return tuple(columns)
+
+def _seeks(columns: tuple[str, ...]):
+    """每种翻页动作对应的 Seek；分页键的取值由 bind_parameters 按列名绑定"""
+    pager = KeysetPager(*columns)
+    pager.first_key = pager.last_key = (0,) * len(columns)
+    return [(action, pager.seek(action)) for action in SEEK_ACTIONS]
+
+def _render(node: ast.AST, seek=None):
+    """把字符串字面量或 f-string 还原为 SQL；含有未知表达式时返回 None，由函数拼出的部分返回 _GENERATED"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        exprs = [ast.unparse(value.value) for value in node.values if not isinstance(value, ast.Constant)]
+        if any(marker in expr for expr in exprs for marker in GENERATED_MARKERS):
+            return _GENERATED
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            else:
+                expr = ast.unparse(value.value)
+                if seek is not None and expr in ("seek.where", "seek.order"):
+                    parts.append(getattr(seek, expr.split(".")[1]))
+                elif expr in SUBSTITUTIONS:
+                    parts.append(SUBSTITUTIONS[expr])
+                else:
+                    return None
+        return "".join(parts)
+    return None
+
+def extract_statements(root: Path) -> tuple[list[tuple[str, str]], list[str]]:
+    """返回 ([(位置, SQL)], [无法展开的 f-string 位置])"""
+    statements, skipped = [], []
+    for source in SOURCES:
+        tree = ast.parse((root / source).read_text(encoding="utf-8"))
+        fragments = {id(part) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for part in node.values}
+        for node in ast.walk(tree):
+            if not isinstance(node, (ast.Constant, ast.JoinedStr)) or id(node) in fragments:
+                continue
+            if isinstance(node, ast.Constant) and not isinstance(node.value, str):
+                continue
+            location = f"{source}:{node.lineno}"
+            columns = _seek_columns(node) if isinstance(node, ast.JoinedStr) else ()
+            variants = [(f"{location} {action}", seek) for action, seek in _seeks(columns)] if columns else [(location, None)]
+            for variant_location, seek in variants:
+                text = _render(node, seek)
+                if text is _GENERATED:
+                    break
+                if text is None:
+                    head = "".join(v.value for v in node.values if isinstance(v, ast.Constant))
+                    if SQL_START.match(head):
+                        skipped.append(location)
+                    break
+                if SQL_START.match(text) and (" FROM " in text.upper() or " INTO " in text.upper() or text.lstrip().upper().startswith("UPDATE")):
+                    statements.append((variant_location, text))
+    return statements, skipped
+
+def _generated_statements() -> list[tuple[str, str]]:
+    """由函数拼出的语句：fanout 的订阅者查询，unread 的“查看更新”分页查询"""
+    statements = []
+    for update_type in fanout._SUBSCRIPTION_FILTERS:
+        for audience in fanout._AUDIENCE_FILTERS:
+            inner = fanout._subscribers_sql(update_type, audience)
+            statements.append((f"fanout._subscribers_sql({update_type}, {audience}) COUNT",
+                               f"SELECT COUNT(*) FROM ({inner}) AS subscribers"))
+            statements.append((f"fanout._subscribers_sql({update_type}, {audience}) stream",
+                               f"{inner} ORDER BY ts.user_id LIMIT %s"))
+    for view in unread._UPDATE_VIEWS:
+        for action, seek in _seeks(("last_update_seq", "thread_id")):
+            statements.append((f"unread._update_page_sql({view}, {action})", unread._update_page_sql(view, seek)))
+    return statements
+
+# 占位符前面的列名 -> 种子数据中的取值
+_PLACEHOLDER_CONTEXT = re.compile(r"(\w+)\s*(?:[<>]=?|=|IN\s*\(|IN\s*\(\s*[^)]*,)\s*$", re.IGNORECASE)
+
+def bind_parameters(sql: str, ids: dict[str, int]) -> tuple[str, tuple]:
+    """为每个 %s 选一个真实存在的值；ids 中没有的列在 > 之后绑定 0（如 last_seen_seq > %s）"""
+    args = []
+    pieces = sql.split("%s")
+    for i, before in enumerate(pieces[:-1]):
+        tail = before[-80:]
+        upper = tail.upper().rstrip()
+        if upper.endswith("LIMIT"):
+            args.append(5)
+        elif upper.endswith("OFFSET"):
+            args.append(0)
+        else:
+            match = _PLACEHOLDER_CONTEXT.search(tail)
+            column = match.group(1).lower() if match else ""
+            if column in ids:
+                args.append(ids[column])
+            elif upper.endswith(">"):
+                args.append(0)
+            else:
+                args.append(ids["default"])
+    return sql, tuple(args)
+
+def full_scans(rows: list[dict]) -> list[str]:
+    """EXPLAIN 结果中做全表扫描的表；派生表/UNION 临时表与 INSERT 的目标表除外"""
+    problems = []
+    for row in rows:
+        table = row.get("table") or ""
+        if row.get("type") == "ALL" and not table.startswith("<") and row.get("select_type") != "INSERT":
+            problems.append(f"{table} (rows≈{row.get('rows')})")
+    return problems
+
+async def _middle_key(cursor, sql: str, params: tuple) -> int:
+    """某个用户的分页列中间的一个值，作为“下一页/上一页”的分页键"""
+    await cursor.execute(sql, params)
+    keys = [row[0] for row in await cursor.fetchall()]
+    return keys[len(keys) // 2] if keys else 1
+
+async def explain_all(edges: int = 20_000, seed: int = 0, verbose: bool = False) -> tuple[int, list[str]]:
+    """在种子数据上 EXPLAIN 每条 SQL，返回 (检查的语句数, 问题列表)"""
+    root = Path(__file__).resolve().parent.parent
+    statements, skipped = extract_statements(root)
+    statements += _generated_statements()
+    problems = [f"{location}: f-string 中有未知表达式，请在 SUBSTITUTIONS 中补充" for location in skipped]
+
+    graph = generate_graph(edges, seed=seed)
+    hot_thread = graph.hottest_thread()
+    busy_user = graph.busiest_user()
+    ids = {
+        "user_id": busy_user, "follower_id": busy_user,
+        "thread_id": hot_thread, "author_id": graph.threads[hot_thread],
+        "job_id": 1, "digest_id": 1,
+        "last_update_seq": graph.thread_seq(hot_thread),
+        "default": busy_user,
+    }
+
+    pool = await create_bench_pool(maxsize=2)
+    try:
+        await database.setup_database(pool)
+        await truncate_tables(pool)
+        await seed_database(pool, graph)
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("ANALYZE TABLE " + ", ".join(BENCH_TABLES))
+                await cursor.fetchall()
+                ids["subscription_id"] = await _middle_key(
+                    cursor, "SELECT subscription_id FROM thread_subscriptions WHERE user_id = %s ORDER BY subscription_id", (busy_user,))
+                ids["follow_id"] = await _middle_key(
+                    cursor, "SELECT follow_id FROM author_follows WHERE follower_id = %s ORDER BY follow_id", (busy_user,))
+            for location, sql in statements:
+                sql, params = bind_parameters(sql, ids)
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    try:
+                        await cursor.execute("EXPLAIN " + sql, params)
+                        rows = await cursor.fetchall()
+                    except Exception as err:
+                        problems.append(f"{location}: EXPLAIN 失败 {err}")
+                        continue
+                scans = full_scans(rows)
+                if scans:
+                    problems.append(f"{location}: 全表扫描 {', '.join(scans)}")
+                elif verbose:
+                    print(f"✅ {location}")
+            await conn.rollback()
+    finally:
+        pool.close()
+        await pool.wait_closed()
+    return len(statements), problems
+
+async def main(args) -> int:
+    checked, problems = await explain_all(args.edges, args.seed, args.verbose)
+    for problem in problems:
+        print(f"❌ {problem}")
+    print(f"共检查 {checked} 条 SQL，{len(problems)} 条存在问题。")
+    return 1 if problems else 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edges", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="同时列出通过检查的语句")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
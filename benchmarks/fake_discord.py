@@ -0,0 +1,257 @@
+"""假的 Discord 对象。
+
+- FakeDiscordHTTP：在虚拟时钟上模拟 discord.py 的限速桶与 Discord 服务端的限速行为。
+- RecordingHTTP / FakeInteraction：不等待、只记录每次 REST 调用及其模拟延迟，用于驱动真实的指令与视图回调。
+"""
+import asyncio
+import selectors
+from collections import Counter
+import discord
+from discord.http import Route, Ratelimit
+
+# --- 虚拟时钟事件循环 ---
+class _VirtualSelector(selectors.DefaultSelector):
+    """没有 IO 事件时直接把时钟拨到下一个定时器，而不是真的阻塞"""
+    def __init__(self):
+        super().__init__()
+        self.now = 0.0
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if not events and timeout:
+            self.now += timeout
+        return events
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        self._virtual_selector = selector
+
+    def time(self):
+        return self._virtual_selector.now
+
+def run_virtual(coro):
+    """在虚拟时钟上运行协程，返回 (结果, 虚拟耗时秒)"""
+    loop = VirtualTimeLoop()
+    try:
+        start = loop.time()
+        result = loop.run_until_complete(coro)
+        return result, loop.time() - start
+    finally:
+        leftover = asyncio.all_tasks(loop) # 例如调度器的常驻协程
+        for task in leftover:
+            task.cancel()
+        if leftover:
+            loop.run_until_complete(asyncio.gather(*leftover, return_exceptions=True))
+        loop.close()
+
+# --- 假 HTTP 客户端 ---
+# 每条路由在服务端的限额: (请求数, 窗口秒)，数值取自 Discord 对频道消息接口常见的返回
+DEFAULT_LIMITS = {
+    "POST /channels/{channel_id}/messages": (5, 5.0),
+    "DELETE /channels/{channel_id}/messages/{message_id}": (5, 1.0),
+    "PATCH /channels/{channel_id}/messages/{message_id}": (5, 5.0),
+}
+
+class _FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+class FakeDiscordHTTP:
+    """复用 discord.py 自带的 Ratelimit 做客户端记账，服务端按固定窗口计数，超额时返回 429。
+    observers 中的回调会收到每个响应的 (method, url, status, headers)，对应真实客户端里 aiohttp trace 的 on_request_end"""
+    def __init__(self, latency: float = 0.05, limits: dict | None = None):
+        self.latency = latency
+        self.limits = limits or DEFAULT_LIMITS
+        self._bucket_hashes = {}
+        self._buckets = {}
+        self._server_windows = {}
+        self.calls = Counter()
+        self.ratelimited = 0
+        self.observers = []
+
+    def get_ratelimit(self, key: str) -> Ratelimit:
+        try:
+            return self._buckets[key]
+        except KeyError:
+            self._buckets[key] = value = Ratelimit(None)
+            return value
+
+    def _server_check(self, route: Route):
+        """返回 (是否放行, 响应头)"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        limit, per = self.limits.get(route.key, (50, 1.0))
+        window_key = f"{route.key}:{route.major_parameters}"
+        reset_at, used = self._server_windows.get(window_key, (now + per, 0))
+        if now >= reset_at:
+            reset_at, used = now + per, 0
+        allowed = used < limit
+        if allowed:
+            used += 1
+        self._server_windows[window_key] = (reset_at, used)
+        headers = {
+            "X-Ratelimit-Limit": str(limit),
+            "X-Ratelimit-Remaining": str(max(0, limit - used)),
+            "X-Ratelimit-Reset-After": f"{reset_at - now:.3f}",
+            "X-Ratelimit-Bucket": f"hash-{abs(hash(route.key))}",
+        }
+        return allowed, headers
+
+    async def request(self, route: Route):
+        route_key = route.key
+        bucket_hash = self._bucket_hashes.get(route_key)
+        key = f"{bucket_hash or route_key}:{route.major_parameters}"
+        ratelimit = self.get_ratelimit(key)
+        async with ratelimit:
+            while True:
+                await asyncio.sleep(self.latency)
+                self.calls[route.method] += 1
+                allowed, headers = self._server_check(route)
+                if route_key not in self._bucket_hashes:
+                    self._bucket_hashes[route_key] = headers["X-Ratelimit-Bucket"]
+                    self._buckets[f"{headers['X-Ratelimit-Bucket']}:{route.major_parameters}"] = ratelimit
+                if not allowed:
+                    headers["Retry-After"] = headers["X-Ratelimit-Reset-After"]
+                for observe in self.observers:
+                    observe(route.method, route.url, 200 if allowed else 429, headers)
+                if allowed:
+                    ratelimit.update(_FakeResponse(headers))
+                    return
+                self.ratelimited += 1
+                await asyncio.sleep(float(headers["X-Ratelimit-Reset-After"]))
+
+# --- 假 Discord 对象 ---
+class FakeMessage:
+    def __init__(self, http: FakeDiscordHTTP, channel_id: int, message_id: int, content=None):
+        self._http = http
+        self.channel_id = channel_id
+        self.id = message_id
+        self.content = content
+
+    async def delete(self):
+        await self._http.request(Route("DELETE", "/channels/{channel_id}/messages/{message_id}",
+                                       channel_id=self.channel_id, message_id=self.id))
+
+    async def edit(self, **fields):
+        await self._http.request(Route("PATCH", "/channels/{channel_id}/messages/{message_id}",
+                                       channel_id=self.channel_id, message_id=self.id))
+        return self
+
+class FakeThread(discord.Thread):
+    """能通过 isinstance(..., discord.Thread) 检查的假论坛帖子，只设置指令中用到的属性"""
+    def __init__(self, http, thread_id: int, owner_id: int = 0, parent_id: int = 0, guild=None):
+        self._http = http
+        self.id = thread_id
+        self.name = f"thread-{thread_id}"
+        self.owner_id = owner_id
+        self.parent_id = parent_id
+        self.guild = guild
+        self._next_message_id = 1
+        self.sent = []
+
+    async def send(self, content=None, **fields):
+        await self._http.request(Route("POST", "/channels/{channel_id}/messages", channel_id=self.id))
+        self.sent.append(content)
+        message = FakeMessage(self._http, self.id, self._next_message_id, content)
+        self._next_message_id += 1
+        return message
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return FakeMessage(self._http, self.id, message_id)
+
+
+# --- 记录型传输层：驱动真实的指令/视图回调 ---
+class RecordingHTTP:
+    """不真正等待，只记录每次 REST 调用以及按固定延迟累计的模拟耗时"""
+    def __init__(self, latency: float = 0.08):
+        self.latency = latency
+        self.calls = Counter()
+        self.simulated_seconds = 0.0
+
+    async def request(self, route: Route):
+        self.calls[f"{route.method} {route.path}"] += 1
+        self.simulated_seconds += self.latency
+
+    def reset(self):
+        self.calls.clear()
+        self.simulated_seconds = 0.0
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+class FakeDMChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+class _InteractionResponse:
+    _ROUTE = "/interactions/{interaction_id}/{interaction_token}/callback"
+
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _callback(self):
+        await self._interaction._http.request(Route("POST", self._ROUTE, interaction_id=0, interaction_token=""))
+        self._done = True
+
+    async def defer(self, **kwargs):
+        await self._callback()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._callback()
+
+    async def edit_message(self, **kwargs):
+        await self._callback()
+
+    async def send_modal(self, modal):
+        await self._callback()
+
+class _Followup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        http = self._interaction._http
+        await http.request(Route("POST", "/webhooks/{webhook_id}/{webhook_token}", webhook_id=0, webhook_token=""))
+        return FakeMessage(http, self._interaction.channel.id, self._interaction._next_message_id())
+
+    async def edit_message(self, message_id: int, **kwargs):
+        await self._interaction._http.request(Route("PATCH", "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}",
+                                                    webhook_id=0, webhook_token="", message_id=message_id))
+
+class FakeInteraction:
+    """只实现本项目指令与视图回调中用到的 discord.Interaction 接口"""
+    def __init__(self, client, http: RecordingHTTP, user_id: int, channel, guild_id: int | None = None,
+                 data: dict | None = None, message=None):
+        self.client = client
+        self._http = http
+        self.user = FakeUser(user_id)
+        self.channel = channel
+        self.guild = FakeGuild(guild_id) if guild_id else None
+        self.data = data or {}
+        self.message = message
+        self.response = _InteractionResponse(self)
+        self.followup = _Followup(self)
+        self._message_ids = 0
+
+    def _next_message_id(self) -> int:
+        self._message_ids += 1
+        return self._message_ids
+
+    async def original_response(self):
+        await self._http.request(Route("GET", "/webhooks/{webhook_id}/{webhook_token}/messages/@original", webhook_id=0, webhook_token=""))
+        return FakeMessage(self._http, self.channel.id, 0)
+
+    async def edit_original_response(self, **kwargs):
+        await self._http.request(Route("PATCH", "/webhooks/{webhook_id}/{webhook_token}/messages/@original", webhook_id=0, webhook_token=""))
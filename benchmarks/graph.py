@@ -0,0 +1,125 @@
+"""合成的用户/订阅/关注关系图，以及把它批量写入数据库的工具。"""
+import random
+from dataclasses import dataclass, field
+
+USER_ID_BASE = 10**17
+THREAD_ID_BASE = 2 * 10**17
+GUILD_ID = 1
+
+@dataclass
+class SyntheticGraph:
+    users: list[int]
+    authors: list[int]
+    threads: dict[int, int]                   # thread_id -> author_id
+    subscriptions: list[tuple[int, int, bool, bool, bool]] = field(default_factory=list)  # (user, thread, release, test, unread)
+    follows: list[tuple[int, int]] = field(default_factory=list)                          # (follower, author)
+    unread_follows: set[tuple[int, int]] = field(default_factory=set)                     # 作者的帖子全部未读的关注
+
+    def thread_seq(self, thread_id: int) -> int:
+        """种子数据中每个帖子的更新序号即其在 threads 中的位置（从 1 开始）"""
+        return self._seqs[thread_id]
+
+    def __post_init__(self):
+        self._seqs = {thread_id: i + 1 for i, thread_id in enumerate(self.threads)}
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.subscriptions) + len(self.follows)
+
+    def hottest_thread(self) -> int:
+        """订阅者+作者关注者最多的帖子，用于发布更新的场景"""
+        subscribers = {}
+        for _, thread_id, *_ in self.subscriptions:
+            subscribers[thread_id] = subscribers.get(thread_id, 0) + 1
+        followers = {}
+        for _, author_id in self.follows:
+            followers[author_id] = followers.get(author_id, 0) + 1
+        return max(self.threads, key=lambda t: subscribers.get(t, 0) + followers.get(self.threads[t], 0))
+
+    def busiest_user(self) -> int:
+        """订阅最多的用户，用于翻页场景"""
+        counts = {}
+        for user_id, *_ in self.subscriptions:
+            counts[user_id] = counts.get(user_id, 0) + 1
+        return max(counts, key=counts.get)
+
+def _zipf_index(rng: random.Random, size: int, skew: float) -> int:
+    """少数热门对象占据大部分边"""
+    while True:
+        index = int(rng.paretovariate(skew)) - 1
+        if index < size:
+            return index
+
+def generate_graph(edges: int, users: int | None = None, threads_per_author: int = 3,
+                   follow_ratio: float = 0.3, skew: float = 1.2, seed: int = 0) -> SyntheticGraph:
+    """生成约 edges 条边（订阅+关注）的关系图，热门帖子/作者服从幂律分布"""
+    rng = random.Random(seed)
+    user_count = users or max(1000, edges // 10)
+    author_count = max(1, user_count // 50)
+    user_ids = [USER_ID_BASE + i for i in range(user_count)]
+    author_ids = user_ids[:author_count]
+    threads = {}
+    for i, author_id in enumerate(author_ids):
+        for j in range(threads_per_author):
+            threads[THREAD_ID_BASE + i * threads_per_author + j] = author_id
+    thread_ids = list(threads)
+    rng.shuffle(thread_ids) # 热门帖子分散在不同作者之间
+
+    follow_target = int(edges * follow_ratio)
+    subscription_target = edges - follow_target
+    graph = SyntheticGraph(users=user_ids, authors=author_ids, threads=threads)
+
+    seen = set()
+    while len(graph.subscriptions) < subscription_target and len(seen) < user_count * len(thread_ids):
+        pair = (rng.choice(user_ids), thread_ids[_zipf_index(rng, len(thread_ids), skew)])
+        if pair in seen:
+            continue
+        seen.add(pair)
+        release = rng.random() < 0.8
+        test = not release or rng.random() < 0.3
+        graph.subscriptions.append((*pair, release, test, rng.random() < 0.2))
+
+    seen.clear()
+    while len(graph.follows) < follow_target and len(seen) < user_count * author_count:
+        pair = (rng.choice(user_ids), author_ids[_zipf_index(rng, author_count, skew)])
+        if pair in seen or pair[0] == pair[1]:
+            continue
+        seen.add(pair)
+        graph.follows.append(pair)
+
+    graph.unread_follows = {pair for pair in graph.follows if rng.random() < 0.3}
+    return graph
+
+async def _insert_chunks(cursor, sql: str, rows: list, chunk_size: int = 5000):
+    for i in range(0, len(rows), chunk_size):
+        await cursor.executemany(sql, rows[i:i + chunk_size])
+
+async def seed_database(pool, graph: SyntheticGraph):
+    """把关系图写入（已清空的）数据库"""
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await _insert_chunks(cursor, "INSERT INTO users (user_id) VALUES (%s)", [(uid,) for uid in graph.users])
+            await _insert_chunks(cursor, "INSERT INTO update_sequence (seq, thread_id) VALUES (%s, %s)",
+                                 [(graph.thread_seq(thread_id), thread_id) for thread_id in graph.threads])
+            await _insert_chunks(
+                cursor,
+                """INSERT INTO managed_threads (thread_id, guild_id, author_id, last_update_url, last_update_message, last_update_at, last_update_type,
+                                              last_update_seq, last_release_seq, last_test_seq)
+                   VALUES (%s, %s, %s, %s, %s, NOW() - INTERVAL %s MINUTE, %s, %s, %s, %s)""",
+                [(thread_id, GUILD_ID, author_id, f"https://discord.com/channels/{GUILD_ID}/{thread_id}/1", "bench", i % 10000,
+                  "release" if i % 3 else "test", i + 1, i + 1 if i % 3 else 0, 0 if i % 3 else i + 1)
+                 for i, (thread_id, author_id) in enumerate(graph.threads.items())]
+            )
+            await _insert_chunks(
+                cursor,
+                "INSERT INTO thread_subscriptions (user_id, thread_id, subscribe_release, subscribe_test, last_seen_seq) VALUES (%s, %s, %s, %s, %s)",
+                [(user_id, thread_id, release, test, 0 if unread else graph.thread_seq(thread_id))
+                 for user_id, thread_id, release, test, unread in graph.subscriptions]
+            )
+            last_seq = len(graph.threads)
+            await _insert_chunks(
+                cursor,
+                "INSERT INTO author_follows (follower_id, author_id, last_seen_seq) VALUES (%s, %s, %s)",
+                [(*pair, 0 if pair in graph.unread_follows else last_seq) for pair in graph.follows]
+            )
+        await conn.commit()
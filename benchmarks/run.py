@@ -0,0 +1,238 @@
+"""端到端场景基准：在合成关系图上驱动真实的指令与视图回调。
+
+    # 先启动一个单独的 MySQL（会清空其中的表！），例如 docker compose up -d db
+    BENCH_MYSQL_HOST=127.0.0.1 BENCH_MYSQL_PASSWORD=... BENCH_MYSQL_DATABASE=update_bot_bench \\
+        python -m benchmarks.run --edges 100000 --iterations 200 --concurrency 20 --output bench.json
+
+    # 与上一次的结果比较，p99 或数据库往返次数变差超过容忍度时以非 0 退出
+    python -m benchmarks.run --edges 100000 --baseline bench.json --tolerance 0.2
+
+Discord 侧使用 RecordingHTTP：不真正等待，只记录 REST 调用次数与按固定延迟累计的模拟耗时。
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import psutil
+from discord import app_commands
+from benchmarks.db import CountingPool, create_bench_pool, truncate_tables
+from benchmarks.fake_discord import FakeDMChannel, FakeInteraction, FakeThread, RecordingHTTP
+from benchmarks.graph import GUILD_ID, generate_graph, seed_database
+from src import database
+from src.bot_app import MyBot
+from src.replicas import ReadRouter
+from src.command import manage_subscription_panel, update_feed
+from src.ui import ManagementPaginatorView, SubscriptionView, UpdatesPaginatorView, UserPanel
+
+FORUM_CHANNEL_ID = 42
+
+class _RecordingScheduler:
+    """代替 FanoutScheduler：只记录提交的任务，提及的发送耗时由 bench_mentions 单独测量"""
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, job_id: int):
+        self.submitted.append(job_id)
+
+class BenchContext:
+    def __init__(self, bot: MyBot, pool: CountingPool, graph, http: RecordingHTTP, seed: int):
+        self.bot = bot
+        self.pool = pool
+        self.graph = graph
+        self.http = http
+        self.rng = random.Random(seed)
+        self.thread_ids = list(graph.threads)
+        self.hot_thread = graph.hottest_thread()
+        self.busy_user = graph.busiest_user()
+
+    def thread(self, thread_id: int) -> FakeThread:
+        return FakeThread(self.http, thread_id, owner_id=self.graph.threads[thread_id],
+                          parent_id=FORUM_CHANNEL_ID, guild=None)
+
+    def interaction(self, user_id: int, channel, **kwargs) -> FakeInteraction:
+        return FakeInteraction(self.bot, self.http, user_id, channel, guild_id=GUILD_ID, **kwargs)
+
+    def random_user(self) -> int:
+        return self.rng.choice(self.graph.users)
+
+    def random_thread(self) -> int:
+        return self.rng.choice(self.thread_ids)
+
+    async def count(self, sql: str, args) -> int:
+        async with self.pool.pool.acquire() as conn, conn.cursor() as cursor:
+            await cursor.execute(sql, args)
+            return (await cursor.fetchone())[0]
+
+# --- 场景 ---
+SCENARIOS = {}
+
+def scenario(name: str):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+@scenario("update_feed")
+async def _update_feed(ctx: BenchContext):
+    """作者在最热门的帖子发布更新（不含幽灵提及本身）"""
+    thread = ctx.thread(ctx.hot_thread)
+    interaction = ctx.interaction(thread.owner_id, thread)
+    url = f"https://discord.com/channels/{ctx.bot.TARGET_GUILD_ID}/{thread.id}/1"
+    await update_feed.callback(interaction, app_commands.Choice(name="发行版(Release)", value="release"), url, "bench")
+
+@scenario("subscribe_release")
+async def _subscribe_release(ctx: BenchContext):
+    thread = ctx.thread(ctx.random_thread())
+    await SubscriptionView().subscribe_release.callback(ctx.interaction(ctx.random_user(), thread))
+
+@scenario("follow_author")
+async def _follow_author(ctx: BenchContext):
+    thread = ctx.thread(ctx.random_thread())
+    await SubscriptionView().follow_author.callback(ctx.interaction(ctx.random_user(), thread))
+
+@scenario("control_panel")
+async def _control_panel(ctx: BenchContext):
+    user_id = ctx.random_user()
+    await manage_subscription_panel.callback(ctx.interaction(user_id, FakeDMChannel(user_id)))
+
+@scenario("control_panel_warm")
+async def _control_panel_warm(ctx: BenchContext):
+    """订阅最多的用户反复打开控制面板（首次之后只读计数器）"""
+    user_id = ctx.busy_user
+    await manage_subscription_panel.callback(ctx.interaction(user_id, FakeDMChannel(user_id)))
+
+@scenario("view_updates")
+async def _view_updates(ctx: BenchContext):
+    user_id = ctx.random_user()
+    await UserPanel().view_updates.callback(ctx.interaction(user_id, FakeDMChannel(user_id)))
+
+@scenario("management_last_page")
+async def _management_last_page(ctx: BenchContext):
+    """订阅最多的用户在管理面板跳到最后一页"""
+    user_id = ctx.busy_user
+    total = await ctx.count("SELECT COUNT(*) FROM thread_subscriptions WHERE user_id = %s AND (subscribe_release = TRUE OR subscribe_test = TRUE)", (user_id,))
+    view = ManagementPaginatorView(ctx.bot, user_id, 'thread', total)
+    await view.page_callback(ctx.interaction(user_id, FakeDMChannel(user_id), data={"custom_id": "page_last"}))
+
+@scenario("updates_next_page")
+async def _updates_next_page(ctx: BenchContext):
+    user_id = ctx.busy_user
+    view = UpdatesPaginatorView(ctx.bot, user_id, 10**6, 10**6)
+    view.current_view_state = 'threads'
+    await view.page_callback(ctx.interaction(user_id, FakeDMChannel(user_id), data={"custom_id": "page_next"}))
+
+# --- 测量 ---
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def _sample_rss(process: psutil.Process, peak: list[int], stop: asyncio.Event):
+    while not stop.is_set():
+        peak[0] = max(peak[0], process.memory_info().rss)
+        await asyncio.sleep(0.01)
+
+async def run_scenario(ctx: BenchContext, name: str, iterations: int, concurrency: int) -> dict:
+    func = SCENARIOS[name]
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    process = psutil.Process()
+    peak, stop = [process.memory_info().rss], asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(process, peak, stop))
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await func(ctx)
+            latencies.append(time.perf_counter() - start)
+
+    ctx.pool.round_trips = 0
+    ctx.http.reset()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(iterations)))
+    wall = time.perf_counter() - wall_start
+    stop.set()
+    await sampler
+
+    return {
+        "throughput": iterations / wall,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "db_round_trips": ctx.pool.round_trips / iterations,
+        "rest_calls": sum(ctx.http.calls.values()) / iterations,
+        "simulated_rest_ms": ctx.http.simulated_seconds * 1000 / iterations,
+        "peak_rss_mb": peak[0] / (1024 * 1024),
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """返回超出容忍度的指标"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ("p99_ms", "db_round_trips", "rest_calls"):
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}.{metric}: {previous[metric]:.2f} -> {current[metric]:.2f}")
+    return regressions
+
+async def main(args) -> int:
+    graph = generate_graph(args.edges, seed=args.seed)
+    print(f"合成关系图: {len(graph.users)} 用户, {len(graph.threads)} 帖子, {len(graph.subscriptions)} 订阅, {len(graph.follows)} 关注")
+
+    raw_pool = await create_bench_pool(maxsize=max(10, args.concurrency))
+    pool = CountingPool(raw_pool)
+    try:
+        await database.setup_database(raw_pool)
+        await truncate_tables(raw_pool)
+        seed_start = time.perf_counter()
+        await seed_database(raw_pool, graph)
+        print(f"写入数据库耗时 {time.perf_counter() - seed_start:.1f}s")
+
+        bot = MyBot()
+        bot.db_pool = pool
+        bot.batch_pool = pool
+        bot.db_reads = ReadRouter(pool, {}, 0, 0)
+        bot.ALLOWED_CHANNELS = [FORUM_CHANNEL_ID]
+        bot.fanout_scheduler = _RecordingScheduler()
+        ctx = BenchContext(bot, pool, graph, RecordingHTTP(args.rest_latency), args.seed)
+
+        results = {}
+        names = args.scenarios or list(SCENARIOS)
+        print(f"{'场景':<22} | {'吞吐(次/s)':>10} | {'p50(ms)':>8} | {'p99(ms)':>8} | {'DB往返':>6} | {'REST':>5} | {'模拟REST(ms)':>12} | {'峰值RSS(MB)':>11}")
+        for name in names:
+            r = results[name] = await run_scenario(ctx, name, args.iterations, args.concurrency)
+            print(f"{name:<22} | {r['throughput']:>10.1f} | {r['p50_ms']:>8.2f} | {r['p99_ms']:>8.2f} | {r['db_round_trips']:>6.1f} | "
+                  f"{r['rest_calls']:>5.1f} | {r['simulated_rest_ms']:>12.1f} | {r['peak_rss_mb']:>11.1f}")
+    finally:
+        raw_pool.close()
+        await raw_pool.wait_closed()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"edges": args.edges, "results": results}, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        if regressions:
+            print("性能回退：\n  " + "\n  ".join(regressions))
+            return 1
+        print("与基线相比没有超出容忍度的回退。")
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edges", type=int, default=100_000, help="订阅+关注的边数，1k ~ 1M")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rest-latency", type=float, default=0.08, help="每次 REST 调用的模拟延迟（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", nargs="*", choices=sorted(SCENARIOS))
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
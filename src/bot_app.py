@@ -1,24 +1,27 @@
 import discord
 from discord.ext import commands
-from asyncio import Queue
 import datetime
-from src import config , database 
+from src import compaction , config , database , fanout , history , replicas , unread
+from src.thread_prompts import ThreadPromptQueue
+from src.graph import subscription_graph
 from src.command import SubscriptionView , setup_commands
 from src.ui import TrackNewThreadView
 from src.config import get_utc8_now_str
 import asyncio
-from src.database import check_and_create_user
-from discord.errors import Forbidden
 
 # --- 机器人核心类 ---
 class MyBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
         intents.guilds = True
-        super().__init__(command_prefix="!", intents=intents)
-        self.thread_creation_queue = Queue()
+        # 幽灵提及的节奏取决于 Discord 返回的速率限制响应头，通过 aiohttp 的 trace 读取
+        mention_pacer = fanout.MentionPacer(config.UPDATE_MENTION_DELAY / 1000.0, adaptive=config.UPDATE_MENTION_ADAPTIVE == 1)
+        super().__init__(command_prefix="!", intents=intents, http_trace=mention_pacer.trace_config())
+        self.mention_pacer = mention_pacer
         self.start_time = datetime.datetime.now(datetime.timezone.utc)
         self.db_pool = None
+        self.batch_pool = None # 只供 execute_batch/commit_batch 使用、开启了多语句的小连接池
+        self.db_reads = None # 只读查询的连接池选择，见 src/replicas.py
 
         # 从 config 模块加载配置
         self.TARGET_GUILD_ID = config.TARGET_GUILD_ID
@@ -28,6 +31,7 @@ class MyBot(commands.Bot):
         self.EMBED_TEXT = config.EMBED_TEXT
         self.UPDATE_MENTION_MAX_NUMBER = config.UPDATE_MENTION_MAX_NUMBER
         self.UPDATE_MENTION_DELAY = config.UPDATE_MENTION_DELAY
+        self.UPDATE_MENTION_ADAPTIVE = config.UPDATE_MENTION_ADAPTIVE
         self.UPDATE_TITLE = config.UPDATE_TITLE
         self.UPDATE_TEXT = config.UPDATE_TEXT
         self.DM_PANEL_TITLE = config.DM_PANEL_TITLE
@@ -38,6 +42,34 @@ class MyBot(commands.Bot):
         self.TRACK_NEW_THREAD_FROM_ALLOWED_CHANNELS = config.TRACK_NEW_THREAD_FROM_ALLOWED_CHANNELS
         self.TRACK_NEW_THREAD_EMBED_TITLE = config.TRACK_NEW_THREAD_EMBED_TITLE
         self.TRACK_NEW_THREAD_EMBED_TEXT = config.TRACK_NEW_THREAD_EMBED_TEXT
+        self.FANOUT_GLOBAL_RATE = config.FANOUT_GLOBAL_RATE
+        self.FANOUT_MAX_ACTIVE_JOBS = config.FANOUT_MAX_ACTIVE_JOBS
+        self.FANOUT_RETRY_MAX_ATTEMPTS = config.FANOUT_RETRY_MAX_ATTEMPTS
+        self.FANOUT_RETRY_BASE_SECONDS = config.FANOUT_RETRY_BASE_SECONDS
+        self.FANOUT_RETRY_MAX_SECONDS = config.FANOUT_RETRY_MAX_SECONDS
+        self.PROGRESS_UPDATE_INTERVAL = config.PROGRESS_UPDATE_INTERVAL
+        self.PROGRESS_UPDATE_PERCENT_STEP = config.PROGRESS_UPDATE_PERCENT_STEP
+        self.DIGEST_WINDOW_MINUTES = config.DIGEST_WINDOW_MINUTES
+        self.UNREAD_RECONCILE_INTERVAL_MINUTES = config.UNREAD_RECONCILE_INTERVAL_MINUTES
+        self.UPDATE_HISTORY_RETENTION_MONTHS = config.UPDATE_HISTORY_RETENTION_MONTHS
+        self.COMPACTION_INTERVAL_HOURS = config.COMPACTION_INTERVAL_HOURS
+        self.COMPACTION_RETENTION_DAYS = config.COMPACTION_RETENTION_DAYS
+        self.COMPACTION_CHUNK_SIZE = config.COMPACTION_CHUNK_SIZE
+        self.COMPACTION_PAUSE_SECONDS = config.COMPACTION_PAUSE_SECONDS
+        self.THREAD_PROMPT_WORKERS = config.THREAD_PROMPT_WORKERS
+        self.THREAD_PROMPT_MAX_ATTEMPTS = config.THREAD_PROMPT_MAX_ATTEMPTS
+        self.THREAD_PROMPT_RETRY_BASE_SECONDS = config.THREAD_PROMPT_RETRY_BASE_SECONDS
+        self.THREAD_PROMPT_RETRY_MAX_SECONDS = config.THREAD_PROMPT_RETRY_MAX_SECONDS
+        self.SUBSCRIPTION_GRAPH = config.SUBSCRIPTION_GRAPH
+        self.SUBSCRIPTION_GRAPH_SNAPSHOT = config.SUBSCRIPTION_GRAPH_SNAPSHOT
+        self.SUBSCRIPTION_GRAPH_SNAPSHOT_MINUTES = config.SUBSCRIPTION_GRAPH_SNAPSHOT_MINUTES
+        self.POOL_ADAPTIVE = config.POOL_ADAPTIVE
+        self.POOL_ADJUST_INTERVAL = config.POOL_ADJUST_INTERVAL
+        self.REPLICA_LAG_CHECK_INTERVAL = config.REPLICA_LAG_CHECK_INTERVAL
+        self.fanout_scheduler = fanout.FanoutScheduler(self, self.FANOUT_GLOBAL_RATE, self.FANOUT_MAX_ACTIVE_JOBS, self.FANOUT_RETRY_MAX_ATTEMPTS,
+                                                       self.FANOUT_RETRY_BASE_SECONDS, self.FANOUT_RETRY_MAX_SECONDS)
+        self.thread_prompts = ThreadPromptQueue(self, self.THREAD_PROMPT_WORKERS, self.THREAD_PROMPT_MAX_ATTEMPTS,
+                                                self.THREAD_PROMPT_RETRY_BASE_SECONDS, self.THREAD_PROMPT_RETRY_MAX_SECONDS)
 
     async def setup_hook(self):
         # 1. 初始化数据库连接池
@@ -46,6 +78,12 @@ class MyBot(commands.Bot):
             print("数据库连接失败，机器人无法启动。")
             await self.close()
             return
+        self.batch_pool = await database.create_db_pool(multi_statements=True)
+        if not self.batch_pool:
+            print("数据库连接失败，机器人无法启动。")
+            await self.close()
+            return
+        self.db_reads = await replicas.create_read_router(self.db_pool)
         
         # 2. 自动创建表
         await database.setup_database(self.db_pool)
@@ -68,7 +106,21 @@ class MyBot(commands.Bot):
             print(f"指令同步时发生严重错误: {e}")
 
         # 6. 启动后台任务
-        self.loop.create_task(self.thread_processor_task())
+        self.thread_prompts.start()
+        self.fanout_scheduler.start()
+        for job_id in await fanout.load_pending_jobs(self.db_pool): # 重启前未完成的通知任务从游标处续传
+            self.fanout_scheduler.submit(job_id)
+        self.loop.create_task(self.digest_task())
+        self.loop.create_task(self.unread_reconcile_task())
+        self.loop.create_task(self.history_partition_task())
+        if self.COMPACTION_INTERVAL_HOURS > 0:
+            self.loop.create_task(self.compaction_task())
+        if self.SUBSCRIPTION_GRAPH == 1:
+            self.loop.create_task(self.subscription_graph_task())
+        if self.POOL_ADAPTIVE == 1:
+            self.loop.create_task(self.pool_adjust_task())
+        if self.db_reads.replicas:
+            self.loop.create_task(self.replica_lag_task())
         if self.TRACK_NEW_THREAD_FROM_ALLOWED_CHANNELS == 1:
             print("启用追踪新帖子功能")
         else:
@@ -83,80 +135,136 @@ class MyBot(commands.Bot):
         if thread.parent_id not in self.ALLOWED_CHANNELS:
             return
         
-        await database.check_and_create_user(self.db_pool, thread.owner_id)
+        await database.check_and_create_user(self.db_pool, thread.owner_id) #假如是新人第一次发帖
         
-        async with self.db_pool.acquire() as conn, conn.cursor() as cursor:
-            sql = "SELECT track_new_thread FROM users WHERE user_id = %s"
-            await cursor.execute(sql, (thread.owner_id,))
-            result = await cursor.fetchone()
-            if not result or result[0] == 1:
-                await self.thread_creation_queue.put(thread)
-
-    async def thread_processor_task(self):# 队列中的thread将在这里发送
-            await self.wait_until_ready()
-            while not self.is_closed():
-                try:
-                    thread = await self.thread_creation_queue.get()
-                
-                    max_attempts = 3
-                    attempt_delay = 10
-                    url_buffer = f"https://discord.com/channels/{thread.guild.id}/{thread.id}"
-                    title_buffer = self.TRACK_NEW_THREAD_EMBED_TITLE
-                    text_buffer = self.TRACK_NEW_THREAD_EMBED_TEXT.replace("{{author}}", f"<@{thread.owner_id}>").replace("{{thread_url}}", url_buffer)
-                    embed = discord.Embed(title=title_buffer, description=text_buffer, color=discord.Color.blue()).set_footer(text=f"✅已发送 | At {get_utc8_now_str()}")
-
-                    for attempt in range(max_attempts):
-                        try:
-                            # 尝试发送
-                            await thread.send(embed=embed, view=TrackNewThreadView())
-                            
-                            # 如果上面这行代码没有报错，说明发送成功了
-                            print(f"{get_utc8_now_str()}|✅ 成功向帖子 '{thread.name}' (ID: {thread.id}) 发送消息。")
-                            break  # 成功后必须 break，跳出重试循环
-
-                        except Forbidden as e:
-                            if e.code == 40058: # 只处理 40058 错误
-                                if attempt < max_attempts - 1: # 如果不是最后一次尝试
-                                    print(f"{get_utc8_now_str()}|⏳ 帖子 {thread.id} 未就绪 (Error 40058)，将在 {attempt_delay} 秒后重试... (尝试 {attempt + 2}/{max_attempts})")
-                                    await asyncio.sleep(attempt_delay)
-                                else: # 如果是最后一次尝试
-                                    print(f"{get_utc8_now_str()}|❌ 在 {max_attempts} 次尝试后，向帖子 {thread.id} 发送消息仍失败 (Error 40058)。")
-                            else:
-                                # 如果是其他 Forbidden 错误，直接报错并跳出循环
-                                print(f"{get_utc8_now_str()}|处理帖子 {thread.id} 时遇到未处理的权限错误: {e}")
-                                break
-                        except Exception as e:
-                            # 捕获其他任何异常，直接报错并跳出循环
-                            print(f"{get_utc8_now_str()}|处理帖子 {thread.id} 时发送消息失败: {e}")
-                            break
-                    
-                    # --- 重试逻辑结束 ---
-                    
-                    self.thread_creation_queue.task_done()
-                    await asyncio.sleep(1)
-
-                except asyncio.CancelledError:
-                    break
-                except Exception as e:
-                    print(f"Thread processor task 发生严重错误: {e}")
-
-    async def on_thread_create(self,thread:discord.Thread):
-        if self.TRACK_NEW_THREAD_FROM_ALLOWED_CHANNELS != 1 :
-            return
-        if thread.parent_id not in self.ALLOWED_CHANNELS:
-            return
-        await check_and_create_user(self.db_pool, thread.owner_id) #假如是新人第一次发帖
         async with self.db_pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    sql = "SELECT track_new_thread FROM users WHERE user_id = %s"
-                    await cursor.execute(sql,(thread.owner_id,))
-                    result = await cursor.fetchone()
-                    if not result or result[0] == 1: #若启用了新帖子启动更新
-                        try:
-                            await self.thread_creation_queue.put(thread) #压入队列
-                        except Exception as e:
-                            print(f"Error:{e}")
-                await conn.commit()
+            async with conn.cursor() as cursor:
+                sql = "SELECT track_new_thread FROM users WHERE user_id = %s"
+                await cursor.execute(sql, (thread.owner_id,))
+                result = await cursor.fetchone()
+            await conn.commit()
+        if not result or result[0] == 1: #若启用了新帖子启动更新，放入新帖子提示队列
+            self.thread_prompts.submit(thread)
+
+    async def digest_task(self): # 每个窗口合并一次待发的摘要
+        await self.wait_until_ready()
+        while not self.is_closed():
+            try:
+                await asyncio.sleep(self.DIGEST_WINDOW_MINUTES * 60)
+                submitted = await fanout.flush_digests(self)
+                if submitted:
+                    print(f"{get_utc8_now_str()}|已合并并提交 {submitted} 个帖子的摘要通知。")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Digest task 发生严重错误: {e}")
+
+    async def unread_reconcile_task(self): # 定期重新统计未读计数器，报告并修正偏差
+        await self.wait_until_ready()
+        while not self.is_closed():
+            try:
+                await asyncio.sleep(self.UNREAD_RECONCILE_INTERVAL_MINUTES * 60)
+                checked, drifted, max_drift = await unread.reconcile_counters(self.db_pool)
+                if drifted:
+                    print(f"{get_utc8_now_str()}|⚠️ 未读计数器对账：{checked} 个用户中 {drifted} 个存在偏差（最大 {max_drift}），已修正。")
+                else:
+                    print(f"{get_utc8_now_str()}|未读计数器对账：{checked} 个用户均无偏差。")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Unread reconcile task 发生严重错误: {e}")
+
+    async def history_partition_task(self): # 每天为更新历史预建之后几个月的分区，并整分区删除过期的月份
+        await self.wait_until_ready() # 与其他后台任务一样，等 setup_hook（包括数据库迁移）完成、登录就绪后再开始
+        while not self.is_closed():
+            try:
+                created, dropped = await history.maintain_partitions(self.db_pool, retention_months=self.UPDATE_HISTORY_RETENTION_MONTHS)
+                if created or dropped:
+                    print(f"{get_utc8_now_str()}|更新历史分区：新建 {created or '无'}，删除 {dropped or '无'}。")
+                await asyncio.sleep(24 * 60 * 60)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"History partition task 发生严重错误: {e}")
+                await asyncio.sleep(60 * 60)
+
+    async def compaction_task(self): # 定期分块删除不再有作用的行，报告每张表删除的行数
+        await self.wait_until_ready()
+        while not self.is_closed():
+            try:
+                await asyncio.sleep(self.COMPACTION_INTERVAL_HOURS * 60 * 60)
+                start = datetime.datetime.now()
+                reclaimed = await compaction.compact(self.db_pool, self.COMPACTION_RETENTION_DAYS,
+                                                     self.COMPACTION_CHUNK_SIZE, self.COMPACTION_PAUSE_SECONDS)
+                elapsed = (datetime.datetime.now() - start).total_seconds()
+                detail = "，".join(f"{table} {count} 行" for table, count in reclaimed.items())
+                print(f"{get_utc8_now_str()}|数据整理完成，共删除 {sum(reclaimed.values())} 行（{detail}），耗时 {elapsed:.1f} 秒。")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Compaction task 发生严重错误: {e}")
+
+    async def subscription_graph_task(self): # 加载订阅关系图（就绪前收件人仍由数据库解析），之后定期合并变化并写快照
+        while not self.is_closed():
+            try:
+                start = datetime.datetime.now()
+                # 快照之后的变化必须仍在 graph_changes 中，留出一小时的余量
+                origin = await subscription_graph.load(self.db_pool, self.SUBSCRIPTION_GRAPH_SNAPSHOT,
+                                                       max_age_seconds=self.COMPACTION_RETENTION_DAYS * 24 * 60 * 60 - 60 * 60)
+                elapsed = (datetime.datetime.now() - start).total_seconds()
+                print(f"{get_utc8_now_str()}|订阅关系图已从{origin}加载：{subscription_graph.edges} 条边，"
+                      f"{subscription_graph.nbytes / (1024 * 1024):.1f} MB，重放 {subscription_graph.replayed} 条变化，耗时 {elapsed:.2f} 秒。")
+                break
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                print(f"Subscription graph task 加载失败，稍后重试: {e}")
+                await asyncio.sleep(60)
+        verified_at = datetime.datetime.now()
+        while not self.is_closed():
+            try:
+                await asyncio.sleep(self.SUBSCRIPTION_GRAPH_SNAPSHOT_MINUTES * 60)
+                if datetime.datetime.now() - verified_at > datetime.timedelta(days=1):
+                    # 级联删除的订阅/关注不经过 graph_changes，每天核对一次边数，不一致时重建
+                    verified_at = datetime.datetime.now()
+                    mismatched = await subscription_graph.verify(self.db_pool)
+                    if mismatched:
+                        print(f"{get_utc8_now_str()}|订阅关系图与数据库不一致（种类 {mismatched}），重建中...")
+                        await subscription_graph.rebuild(self.db_pool, self.SUBSCRIPTION_GRAPH_SNAPSHOT)
+                        continue
+                async with self.db_pool.acquire() as conn:
+                    async with conn.cursor() as cursor:
+                        await subscription_graph.catch_up(cursor)
+                    await conn.commit()
+                snapshot_age = datetime.datetime.now().timestamp() - subscription_graph.snapshot_at
+                if subscription_graph.pending_changes or snapshot_age > 24 * 60 * 60: # 没有变化时每天刷新一次快照，避免过期
+                    await subscription_graph.save_snapshot(self.SUBSCRIPTION_GRAPH_SNAPSHOT)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Subscription graph task 发生严重错误: {e}")
+
+    async def pool_adjust_task(self): # 按排队等待时间调整数据库连接池大小
+        while not self.is_closed():
+            try:
+                await asyncio.sleep(self.POOL_ADJUST_INTERVAL)
+                limit = await self.db_pool.adjust()
+                if limit is not None:
+                    print(f"{get_utc8_now_str()}|数据库连接池大小调整为 {limit}（范围 {self.db_pool.min_size}-{self.db_pool.max_size}）。")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Pool adjust task 发生严重错误: {e}")
+
+    async def replica_lag_task(self): # 定期检查只读副本的复制延迟，延迟过大的副本暂停使用
+        while not self.is_closed():
+            try:
+                await asyncio.sleep(self.REPLICA_LAG_CHECK_INTERVAL)
+                await self.db_reads.check_lag()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Replica lag task 发生严重错误: {e}")
 
 if __name__ == "__main__":
     bot = MyBot()
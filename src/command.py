@@ -4,11 +4,15 @@ from discord import app_commands ,Interaction
 import datetime
 import os
 import psutil
-import aiomysql
 import asyncio 
 from src.config import get_utc8_now_str , ADMIN_IDS
 from src.ui import SubscriptionView, UserPanel , PermissionManageView
 from src.database import check_and_create_user
+from src.fanout import create_notification_job, count_recipients, queue_digest
+from src import database, history, unread
+from src.threads import ThreadInfo, get_thread, thread_cache
+from src.followers import follower_index
+from src.graph import subscription_graph
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from main import MyBot
@@ -21,6 +25,7 @@ def setup_commands(tree: app_commands.CommandTree, guild: discord.Object):
     tree.add_command(update_feed, guild=guild)
     tree.add_command(review_subscription,guild=guild)
     tree.add_command(manage_permission,guild=guild)
+    tree.add_command(toggle_thread_digest, guild=guild)
     tree.add_command(manage_subscription_panel)
 
 async def is_admin_user(Interaction: Interaction) -> bool:
@@ -53,6 +58,50 @@ class CommandGroup_bot(app_commands.Group): #查询BOT运行状态command
         embed.add_field(name="内存总量/可使用:",value=f"{mem_total:.2f}/{mem_available:.2f}MB（可用:    {mem_available_usage:.2f}%）", inline=True)
         embed.add_field(name="PING延迟", value=f"{latency:.2f} ms", inline=True)
         embed.add_field(name="服务中服务器", value=f"`{guild_count} 个`", inline=True)
+        known_users = database.known_users
+        lookups = known_users.hits + known_users.misses
+        hit_rate = known_users.hits / lookups * 100 if lookups else 0
+        embed.add_field(name="用户缓存", value=f"命中 {known_users.hits} / 未命中 {known_users.misses}（{hit_rate:.1f}%）\n已缓存 {len(known_users)}/{known_users.capacity}", inline=True)
+        thread_lookups = thread_cache.hits + thread_cache.misses
+        thread_hit_rate = thread_cache.hits / thread_lookups * 100 if thread_lookups else 0
+        embed.add_field(name="帖子缓存", value=f"命中 {thread_cache.hits} / 未命中 {thread_cache.misses}（{thread_hit_rate:.1f}%）\n已缓存 {len(thread_cache)}/{thread_cache.capacity}，淘汰 {thread_cache.evictions}", inline=True)
+        follower_lookups = follower_index.hits + follower_index.misses
+        follower_hit_rate = follower_index.hits / follower_lookups * 100 if follower_lookups else 0
+        embed.add_field(name="关注者索引", value=f"{len(follower_index)} 位作者 / {follower_index.size} 条（上限 {follower_index.max_ids}）\n命中 {follower_index.hits} / 加载 {follower_index.misses}（{follower_hit_rate:.1f}%），淘汰 {follower_index.evictions}", inline=True)
+        prompts = bot.thread_prompts
+        prompt_p50, prompt_p99 = prompts.latency_percentiles()
+        prompt_lines = [f"排队 {prompts.depth}（等待重试 {prompts.retrying}），已发送 {prompts.sent}，重试 {prompts.retries} 次",
+                        f"延迟 p50 {prompt_p50:.1f} / p99 {prompt_p99:.1f} 秒，死信 {prompts.dead}"]
+        prompt_lines += [f"`{thread_id}` {reason}（{at}）" for at, thread_id, reason in list(prompts.dead_letters)[-3:]]
+        embed.add_field(name="新帖子提示", value="\n".join(prompt_lines), inline=False)
+        scheduler = bot.fanout_scheduler
+        fanout_lines = [f"运行中 {scheduler.active_jobs}，排队 {scheduler.pending_jobs}，等待重试 {scheduler.retrying_jobs}（累计重试 {scheduler.retries} 次）",
+                        f"已发送 {scheduler.sent_batches} 批，失败 {scheduler.failed} 个任务"]
+        fanout_lines += [f"任务 `{job_id}` {reason}（{at}）" for at, job_id, reason in list(scheduler.failures)[-3:]]
+        embed.add_field(name="通知任务", value="\n".join(fanout_lines), inline=False)
+        if bot.SUBSCRIPTION_GRAPH == 1:
+            graph_state = (f"{subscription_graph.edges} 条边，{subscription_graph.nbytes / (1024 * 1024):.1f} MB\n"
+                           f"未合并变化 {subscription_graph.pending_changes}，水位线 {subscription_graph.watermark}" if subscription_graph.ready else "加载中")
+            embed.add_field(name="订阅关系图", value=graph_state, inline=True)
+        pool = bot.db_pool
+        wait_p50, wait_p99 = pool.wait_percentiles()
+        adaptive = f"自适应 {pool.min_size}-{pool.max_size}，已调整 {pool.resizes} 次" if bot.POOL_ADAPTIVE == 1 else "固定大小"
+        embed.add_field(name="数据库连接池", value=(
+            f"借出 {pool.in_use}/{pool.limit}（连接 {pool.size}，空闲 {pool.freesize}，排队 {pool.waiting}）\n"
+            f"等待 p50 {wait_p50 * 1000:.1f} / p99 {wait_p99 * 1000:.1f} / 最长 {pool.wait_max * 1000:.1f} ms\n"
+            f"超时 {pool.timeouts} 次（共借出 {pool.acquires} 次）｜{adaptive}"
+        ), inline=False)
+        reads = bot.db_reads
+        if reads.replicas:
+            lines = [f"`{host}` 延迟 {'未知' if lag is None else f'{lag} 秒'}{'' if host in reads.healthy() else '（暂停使用）'}，借出 {reads.replicas[host].in_use}/{reads.replicas[host].limit}"
+                     for host, lag in reads.lag.items()]
+            lines.append(f"浏览查询：副本 {reads.replica_reads} 次 / 主库 {reads.primary_reads} 次")
+            embed.add_field(name="只读副本", value="\n".join(lines), inline=False)
+        sites = pool.busiest_sites()
+        if sites:
+            embed.add_field(name="连接占用（按调用位置，总时长前 5）", value="\n".join(
+                f"`{site}` {count} 次，平均 {avg * 1000:.1f} ms，最长 {longest * 1000:.1f} ms" for site, count, avg, longest in sites
+            ), inline=False)
         days = uptime_delta.days
         hours, remainder = divmod(uptime_delta.seconds, 3600)
         minutes, seconds = divmod(remainder, 60)
@@ -87,29 +136,30 @@ async def create_update_feed(interaction: discord.Interaction):
         await check_and_create_user(bot.db_pool, thread_owner.id)
         thread_id = thread_channel.id
         guild_id = interaction.guild.id
+        if await get_thread(bot.db_pool, thread_id) is not None: #如果不是第一次创建
+            embed = discord.Embed(title=bot.EMBED_TITLE, description=f"ℹ️ 这个帖子已经开启了更新推流功能。\n\n{bot.EMBED_TEXT}", color=discord.Color.blue())
+            await interaction.followup.send(embed=embed, view=SubscriptionView(), ephemeral=True)
+            return
         async with bot.db_pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("SELECT EXISTS(SELECT 1 FROM managed_threads WHERE thread_id = %s) AS select_result;", (thread_id,))
-                result = await cursor.fetchone()
-                if result and result['select_result'] == 0:#如果是第一次创建
-                    await cursor.execute(
-                        """INSERT INTO managed_threads (thread_id, guild_id, author_id)
-                        VALUES (%s, %s, %s) AS new_values
-                        ON DUPLICATE KEY UPDATE
-                        guild_id = new_values.guild_id,
-                        author_id = new_values.author_id""",
-                        (thread_id, guild_id, thread_owner.id)
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """INSERT INTO managed_threads (thread_id, guild_id, author_id)
+                    VALUES (%s, %s, %s) AS new_values
+                    ON DUPLICATE KEY UPDATE
+                    guild_id = new_values.guild_id,
+                    author_id = new_values.author_id,
+                    last_update_at = last_update_at""",
+                    (thread_id, guild_id, thread_owner.id)
                 )
-                    insert_notification_sql = """
-                        INSERT INTO follower_thread_notifications (follower_id, thread_id)
-                        SELECT follower_id, %s FROM author_follows WHERE author_id = %s
-                    """
-                    await cursor.execute(insert_notification_sql, (thread_id, thread_owner.id))
-                else: #如果不是第一次创建
-                    embed = discord.Embed(title=bot.EMBED_TITLE, description=f"ℹ️ 这个帖子已经开启了更新推流功能。\n\n{bot.EMBED_TEXT}", color=discord.Color.blue())
-                    await interaction.followup.send(embed=embed, view=SubscriptionView(), ephemeral=True)
-                    return
+                created = cursor.rowcount == 1 # 否则是并发创建时已经存在的行
+                if created: #新帖子分配一个更新序号，关注者据此看到作者动态，无需逐个写入通知
+                    await unread.publish_new_thread(cursor, thread_id)
             await conn.commit()
+        if created:
+            thread_cache.put(thread_id, ThreadInfo(thread_owner.id, False, ()))
+        else:
+            thread_cache.update(thread_id, author_id=thread_owner.id)
+        bot.db_reads.wrote(thread_owner.id) # 作者随后的 /查看订阅入口 从主库读取
         try: #手动执行指令的时候，取消作者的新帖子不再自动提醒创建更新推流状态
             async with bot.db_pool.acquire() as conn:
                 async with conn.cursor() as cursor:
@@ -144,50 +194,31 @@ async def review_subscription(interaction: discord.Interaction):
         return
     try:
         await check_and_create_user(bot.db_pool,interaction.user.id)
-        async with bot.db_pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("SELECT EXISTS(SELECT 1 FROM managed_threads WHERE thread_id = %s) AS select_result;", (interaction.channel.id,))
-                result = await cursor.fetchone()
-                if result and result['select_result'] == 0:
-                    await interaction.followup.send(f"❌ Error : 该帖子未启用更新推流，请联系帖主",ephemeral=True)
-                else :
-                    url_sql = """
-                        SELECT
-                            COALESCE(last_update_url,'NULL') AS last_update_url
-                        FROM
-                            managed_threads
-                        WHERE
-                            thread_id = %s
-                    """
-                    await cursor.execute(url_sql, (interaction.channel.id,))
-                    result_1 = await cursor.fetchone()
-                    if result_1['last_update_url'] == "NULL":
-                        url = f"https://discord.com/channels/{interaction.guild.id}/{interaction.channel.id}/0"
-                        text = f"目前帖子还没有最新的订阅\n你可以在这里看到首楼->{url}"
-                        embed = discord.Embed(title=bot.EMBED_TITLE,description=text,color=discord.Color.blue())
-                        await interaction.followup.send(embed=embed,view=SubscriptionView(),ephemeral=True)
-                    else:
-                        last_sql = """
-                            SELECT
-                                COALESCE(last_update_message, 'NULL') AS last_update_message,
-                                COALESCE(last_update_at, 'NULL') AS last_update_at,
-                                COALESCE(last_update_type, 'NULL') AS last_update_type
-                            FROM
-                                managed_threads
-                            WHERE
-                                thread_id = %s;
-                        """
-                        await cursor.execute(last_sql, (interaction.channel.id,))
-                        result_2 = await cursor.fetchone()
-                        last_update_url = result_1['last_update_url']
-                        last_update_message = result_2['last_update_message']
-                        last_update_at = result_2['last_update_at']
-                        last_update_type = result_2['last_update_type']
-                        
-                        text = f"最近一次的更新->{last_update_url}\n更新类型->{last_update_type}\n\n作者的话:{last_update_message}"
-                        embed = discord.Embed(title=bot.EMBED_TITLE,description=text,color=discord.Color.blue())
-                        embed.set_footer(text=f"最后一次更新在:{last_update_at} |在下方更改你的订阅状态")
-                        await interaction.followup.send(embed=embed,view=SubscriptionView(),ephemeral=True)
+        reads = bot.db_reads.for_read(interaction.user.id)
+        info = await get_thread(reads, interaction.channel.id) # 是否开启推流与最近一次更新都来自帖子缓存
+        if info is None:
+            await interaction.followup.send(f"❌ Error : 该帖子未启用更新推流，请联系帖主",ephemeral=True)
+        elif info.last_update_url is None:
+            url = f"https://discord.com/channels/{interaction.guild.id}/{interaction.channel.id}/0"
+            text = f"目前帖子还没有最新的订阅\n你可以在这里看到首楼->{url}"
+            embed = discord.Embed(title=bot.EMBED_TITLE,description=text,color=discord.Color.blue())
+            await interaction.followup.send(embed=embed,view=SubscriptionView(),ephemeral=True)
+        else:
+            last_update_message = "NULL" if info.last_update_message is None else info.last_update_message
+            last_update_at = "NULL" if info.last_update_at is None else info.last_update_at
+            last_update_type = "NULL" if info.last_update_type is None else info.last_update_type
+
+            text = f"最近一次的更新->{info.last_update_url}\n更新类型->{last_update_type}\n\n作者的话:{last_update_message}"
+            # 更早的几次更新来自 update_events 的覆盖索引
+            async with reads.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    earlier = (await history.recent_for_thread(cursor, interaction.channel.id, bot.UPDATES_PER_PAGE + 1))[1:]
+                await conn.commit() # 结束只读事务，否则连接归还时会被关闭
+            if earlier:
+                text += "\n\n更早的更新:\n" + "\n".join(f"{created:%Y-%m-%d} {update_type} -> {url}" for _, update_type, url, created in earlier)
+            embed = discord.Embed(title=bot.EMBED_TITLE,description=text,color=discord.Color.blue())
+            embed.set_footer(text=f"最后一次更新在:{last_update_at} |在下方更改你的订阅状态")
+            await interaction.followup.send(embed=embed,view=SubscriptionView(),ephemeral=True)
     except Exception as e:
         print(f"未知错误于 /查看订阅入口:{e}")
         await interaction.followup.send(f"❌ Unkown_Error:{e},请联系开发者...",ephemeral=True)
@@ -203,47 +234,18 @@ async def manage_subscription_panel(interaction: discord.Interaction):
     try:
         thread_update_count = 0
         author_update_count = 0
-        async with bot.db_pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                # 查询精确的订阅更新数
-                thread_update_sql = """
-                    SELECT COUNT(DISTINCT t.thread_id)
-                    FROM thread_subscriptions ts JOIN managed_threads t ON ts.thread_id = t.thread_id
-                    WHERE ts.user_id = %s AND ts.has_new_update = TRUE AND (
-                        (ts.subscribe_release = TRUE AND t.last_update_type = 'release') OR
-                        (ts.subscribe_test = TRUE AND t.last_update_type = 'test')
-                    )
-                """
-                await cursor.execute(thread_update_sql, (user.id,))
-                thread_update_count = (await cursor.fetchone())[0]
-
-                # 查询精确的、去重后的作者动态数
-                author_update_sql = """
-                    SELECT COUNT(*)
-                    FROM follower_thread_notifications
-                    WHERE follower_id = %s AND thread_id NOT IN (
-                        SELECT ts.thread_id FROM thread_subscriptions ts
-                        JOIN managed_threads t ON ts.thread_id = t.thread_id
-                        WHERE ts.user_id = %s AND ts.has_new_update = TRUE AND (
-                            (ts.subscribe_release = TRUE AND t.last_update_type = 'release') OR
-                            (ts.subscribe_test = TRUE AND t.last_update_type = 'test')
-                        )
-                    )
-                """
-                await cursor.execute(author_update_sql, (user.id, user.id))
-                author_update_count = (await cursor.fetchone())[0]
+        # 订阅更新数与去重后的作者动态数，来自增量维护的计数器（可由只读副本提供）
+        thread_update_count, author_update_count = await unread.load_counts(bot.db_reads, user.id)
 
     except Exception as err:
         print(f"数据库错误于 控制面板 : {err}")
         await interaction.response.send_message("❌ 无法获取您的订阅状态，请稍后重试。", ephemeral=True)
         return
     
-    description_text = bot.DM_PANEL_TEXT.replace(
-        "{{user}}", user.mention
-    ).replace(
-        "{{thread_update_number}}", str(thread_update_count)
-    ).replace(
-        "{{author_update_number}}", str(author_update_count)
+    description_text = bot.DM_PANEL_TEXT.render(
+        user=user.mention,
+        thread_update_number=thread_update_count,
+        author_update_number=author_update_count
     )
 
     embed = discord.Embed(
@@ -287,8 +289,9 @@ async def update_feed(interaction: discord.Interaction, update_type: app_command
         )
         return
 
-    users_to_notify = set()
+    total_users = 0
     thread_owner_id = None
+    thread_digest_mode = False
     
     try:
         #开始初步响应
@@ -300,116 +303,72 @@ async def update_feed(interaction: discord.Interaction, update_type: app_command
     ).set_footer(text=f"运行状态：准备中...|{discord.utils.format_dt(datetime.datetime.now(), 'T')}")
         await interaction.followup.send(embed=status_embed)
         response_message = await interaction.original_response()
-        #响应完成，开始查表
+        #验证权!帖主与权限组成员来自帖子缓存，命中时不访问数据库
+        info = await get_thread(bot.db_pool, thread.id)
+        if info is None:
+            await response_message.edit(content="❌ 这个帖子没有开启更新推流功能，请先使用 /创建更新推流 指令。")
+            return
+        if not info.allows(user.id):
+            await response_message.edit(content="❌ 你不是帖子作者，也不在权限组内，无法发送更新推流。")
+            return
+        #响应完成，开始写表
         async with bot.db_pool.acquire() as conn:
             async with conn.cursor() as cursor:
-        #验证权!
-                permission_check_sql = """
-                                    SELECT 1 
-                                    FROM 
-                                        managed_threads 
-                                    WHERE 
-                                        thread_id = %s 
-                                        AND %s IN (author_id, thread_permission_group_1,thread_permission_group_2, thread_permission_group_3, thread_permission_group_4);
-                                """
-                await cursor.execute(permission_check_sql, (thread.id, user.id))
-                permission_granted = await cursor.fetchone()
-                if not permission_granted:
-                    await cursor.execute("SELECT 1 FROM managed_threads WHERE thread_id = %s", (thread.id,))
-                    thread_exists = await cursor.fetchone()
-                    if not thread_exists:
-                        await response_message.edit(content="❌ 这个帖子没有开启更新推流功能，请先使用 /创建更新推流 指令。")
-                    else:
-                        await response_message.edit(content="❌ 你不是帖子作者，也不在权限组内，无法发送更新推流。")
-                    return
-
-        # 先更新状态
+        # 先更新状态：分配更新序号，订阅者/关注者的未读状态在读取时由序号与水位线算出
                 thread_owner_id = thread.owner_id #fix:修复thread_onwer_id未赋值导致的bug
-                update_thread_sql = """
+                seq = await unread.next_update_seq(cursor, thread.id)
+                await unread.count_publish(cursor, thread.id, update_type.value) # 在写入新序号之前，按发布前的状态计算计数器的差值
+                update_thread_sql = f"""
             UPDATE managed_threads
-            SET last_update_url = %s, last_update_message = %s, last_update_at = CURRENT_TIMESTAMP, last_update_type = %s
+            SET last_update_url = %s, last_update_message = %s, last_update_at = CURRENT_TIMESTAMP, last_update_type = %s,
+                last_update_seq = %s, last_{update_type.value}_seq = %s
             WHERE thread_id = %s
         """
-                await cursor.execute(update_thread_sql, (url, message, update_type.value, thread.id))
-
-        #标记订阅的该帖子的用户对应的更新状态
-                subscription_update_sql = f"""
-            UPDATE thread_subscriptions 
-            SET has_new_update = TRUE
-            WHERE thread_id = %s AND subscribe_{update_type.value} = TRUE
-        """
-                await cursor.execute(subscription_update_sql, (thread.id,))
-        #顺便查询需要通知的用户数组
-                if update_type.value == "release": # 查询订阅发行版的用户
-                    await cursor.execute("SELECT user_id FROM thread_subscriptions WHERE thread_id = %s AND subscribe_release = TRUE", (thread.id,))
-                else: # 查询订阅测试版的用户
-                    await cursor.execute("SELECT user_id FROM thread_subscriptions WHERE thread_id = %s AND subscribe_test = TRUE", (thread.id,))
-                for row in await cursor.fetchall():
-                    users_to_notify.add(row[0])
-
-                await cursor.execute("SELECT follower_id FROM author_follows WHERE author_id = %s", (thread_owner_id,)) # 查询关注作者的用户
-                for row in await cursor.fetchall():
-                    users_to_notify.add(row[0])
-
-                insert_notification_sql = """
-                        INSERT IGNORE INTO follower_thread_notifications (follower_id, thread_id)
-                        SELECT follower_id, %s FROM author_follows WHERE author_id = %s
-                    """
-                await cursor.execute(insert_notification_sql,(thread.id,thread_owner_id))
+                await cursor.execute(update_thread_sql, (url, message, update_type.value, seq, seq, thread.id))
+                await cursor.execute("SELECT last_update_at FROM managed_threads WHERE thread_id = %s", (thread.id,))
+                last_update_at = (await cursor.fetchone())[0] # 数据库时钟写入的时间，写穿到缓存
+                await history.record_update(cursor, seq, thread.id, thread_owner_id, user.id, update_type.value, url, message)
+
+        #摘要：本次更新记入待合并表，开启了摘要模式的帖子/用户由摘要任务每个窗口统一通知一次
+                thread_digest_mode = info.digest_mode
+                if thread_digest_mode or await count_recipients(cursor, thread.id, thread_owner_id, update_type.value, "digest"):
+                    await queue_digest(cursor, thread.id, thread_owner_id, update_type.value, url, message) #没有人需要摘要时不写入
+        #顺便统计需要即时通知的用户数（订阅者与关注者的并集由数据库去重，名单由后台任务流式读取）
+                if not thread_digest_mode:
+                    total_users = await count_recipients(cursor, thread.id, thread_owner_id, update_type.value, "instant")
+
+        # 写入通知任务，与更新状态处于同一事务中
+                update_text_template = bot.UPDATE_TEXT.render(author=user.mention, text=message, url=url)
+                if total_users:
+                    job_id = await create_notification_job(
+                        cursor, thread.id, thread_owner_id, update_type.value,
+                        update_text_template, response_message, total_users
+                    )
             
             await conn.commit()
+        thread_cache.update(thread.id, last_update_url=url, last_update_message=message,
+                            last_update_at=last_update_at, last_update_type=update_type.value)
+        bot.db_reads.wrote(user.id)
 
     except Exception as err:
         # 如果任何一步数据库操作失败，发送错误消息并返回
         await response_message.edit(content=f"❌ SQL_Error：{err}\n请联系开发者")
         return
     
-    # --- 数据库操作已全部完成，开始发送响应和幽灵提及 ---
-
-    # 开始预处理提及名单
-    user_list = list(users_to_notify)
-    total_users = len(user_list)
-    processed_users = 0 # 开始处理
-
+    # --- 数据库操作已全部完成，幽灵提及交给后台通知队列 ---
     if total_users == 0:
-        final_text = bot.UPDATE_TEXT.replace("{{text}}", message).replace("{{url}}", url).replace("{{author}}", user.mention)
-        final_embed = discord.Embed(title=bot.UPDATE_TITLE, description=final_text, color=discord.Color.blue())
-        final_embed.set_footer(text=f"运行状态：✅没有需要通知的用户|{get_utc8_now_str()}")
+        final_embed = discord.Embed(title=bot.UPDATE_TITLE, description=update_text_template, color=discord.Color.blue())
+        if thread_digest_mode:
+            final_embed.set_footer(text=f"运行状态：✅已记入摘要，将在 {bot.DIGEST_WINDOW_MINUTES} 分钟内统一通知|{get_utc8_now_str()}")
+        else:
+            final_embed.set_footer(text=f"运行状态：✅没有需要通知的用户|{get_utc8_now_str()}")
         await response_message.edit(embed=final_embed)
         return
-    
-    mention_delay = bot.UPDATE_MENTION_DELAY / 1000.0
-    update_text_template = bot.UPDATE_TEXT.replace("{{author}}", user.mention).replace("{{text}}", message).replace("{{url}}", url)
-    update_embed = discord.Embed(title=bot.UPDATE_TITLE, description=update_text_template, color=discord.Color.green())
-
-    for i in range(0, total_users, bot.UPDATE_MENTION_MAX_NUMBER):
-        batch = user_list[i:i + bot.UPDATE_MENTION_MAX_NUMBER]
-        if not batch: continue
 
-        mention_string = " ".join(f"<@{uid}>" for uid in batch)
-        try:
-            ghosted_message = await thread.send(mention_string)
-            await ghosted_message.delete()
-        except discord.Forbidden:
-            print(f"无法发送幽灵提及消息，可能是权限不足。")
-            update_embed.color = discord.Color.red()
-            update_embed.description = "无法发送提及通知，请检查机器人权限。"
-            await response_message.edit(embed=update_embed)
-            return # 无法提及，直接中止
-
-        processed_users += len(batch)
-
-        progress_text = f"运行状态：正在通知 {processed_users}/{total_users}"
-        update_embed.set_footer(text=progress_text + f"|{get_utc8_now_str()}")
-        await response_message.edit(embed=update_embed)
-
-        if mention_delay > 0:
-            await asyncio.sleep(mention_delay) # 等待
-
-    # 完成
-    final_embed = discord.Embed(title=bot.UPDATE_TITLE, description=update_text_template, color=discord.Color.green())
-    final_embed.set_footer(text=f"运行状态：✅已通知 {processed_users}/{total_users} | {get_utc8_now_str()}")
-    await response_message.edit(embed=final_embed)
+    update_embed = discord.Embed(title=bot.UPDATE_TITLE, description=update_text_template, color=discord.Color.green())
+    update_embed.set_footer(text=f"运行状态：已加入通知队列 0/{total_users}|{get_utc8_now_str()}")
+    await response_message.edit(embed=update_embed)
+    bot.fanout_scheduler.submit(job_id)
 
 @app_commands.command(name="管理当前帖子权限组",description="管理当前帖子可用更新推流的权限组")
 async def manage_permission(interaction: discord.Interaction):
@@ -428,24 +387,12 @@ async def manage_permission(interaction: discord.Interaction):
     
     try:
 
-        async with bot.db_pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                sql = """
-                SELECT author_id, thread_permission_group_1, thread_permission_group_2,thread_permission_group_3, thread_permission_group_4
-                       FROM managed_threads WHERE thread_id = %s"""
-                await cursor.execute(sql,(interaction.channel.id,))
-                data = await cursor.fetchone()
-                if not data:
-                    await interaction.followup.send("❌ 错误：此帖子尚未开启推流更新，该功能不可用", ephemeral=True)
-                    return
-                initial_permissions = [
-                    data['thread_permission_group_1'],
-                    data['thread_permission_group_2'],
-                    data['thread_permission_group_3'],
-                    data['thread_permission_group_4']
-                ]
-                author_id = data['author_id']
-            await conn.commit()
+        info = await get_thread(bot.db_pool, interaction.channel.id)
+        if info is None:
+            await interaction.followup.send("❌ 错误：此帖子尚未开启推流更新，该功能不可用", ephemeral=True)
+            return
+        initial_permissions = list(info.members)
+        author_id = info.author_id
 
         view = PermissionManageView(
             bot=bot,
@@ -461,4 +408,37 @@ async def manage_permission(interaction: discord.Interaction):
         if not interaction.response.is_done():
             await interaction.response.send_message(f"❌ 未知错误: {e}\n请联系开发者...", ephemeral=True)
         else:
-            await interaction.followup.send(f"❌ 未知错误: {e}\n请联系开发者...", ephemeral=True)
\ No newline at end of file
+            await interaction.followup.send(f"❌ 未知错误: {e}\n请联系开发者...", ephemeral=True)
+@app_commands.command(name="切换摘要推送", description="开启/关闭当前帖子的摘要模式：一段时间内的多次更新合并为一次提醒")
+async def toggle_thread_digest(interaction: discord.Interaction):
+    bot: "MyBot" = interaction.client
+    if not isinstance(interaction.channel, discord.Thread) or interaction.channel.parent_id not in bot.ALLOWED_CHANNELS:
+        await interaction.response.send_message("❌ 此指令只能在指定的论坛频道的帖子中使用。", ephemeral=True)
+        return
+    if interaction.user.id != interaction.channel.owner_id:
+        await interaction.response.send_message("❌ 只有帖子作者可以切换摘要模式。", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    try:
+        async with bot.db_pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                # last_update_at 带有 ON UPDATE，须显式保留，否则切换开关会被当作一次更新
+                await cursor.execute("UPDATE managed_threads SET digest_mode = NOT digest_mode, last_update_at = last_update_at WHERE thread_id = %s", (interaction.channel.id,))
+                if cursor.rowcount == 0:
+                    await interaction.followup.send("❌ 错误：此帖子尚未开启推流更新，该功能不可用", ephemeral=True)
+                    return
+                await cursor.execute("SELECT digest_mode FROM managed_threads WHERE thread_id = %s", (interaction.channel.id,))
+                digest_mode = (await cursor.fetchone())[0]
+            await conn.commit()
+        thread_cache.update(interaction.channel.id, digest_mode=bool(digest_mode))
+    except Exception as e:
+        print(f"在 /切换摘要推送 出现错误: {e}")
+        await interaction.followup.send(f"❌ SQL_Error: {e}\n请联系开发者...", ephemeral=True)
+        return
+
+    if digest_mode:
+        text = f"✅ 已开启摘要模式：之后的更新将每 {bot.DIGEST_WINDOW_MINUTES} 分钟合并为一次提醒发送给所有订阅者。"
+    else:
+        text = "✅ 已关闭摘要模式：之后的更新将立即提醒订阅者（自行开启了摘要模式的用户除外）。"
+    await interaction.followup.send(text, ephemeral=True)
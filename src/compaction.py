@@ -0,0 +1,79 @@
+"""后台数据整理：删除不再有任何作用的行，避免表无限增长、扫描越来越慢。
+
+- thread_subscriptions：两个订阅开关都已关闭的行（管理面板的“删除”只是关闭开关，以保持未读计数器的增量维护）；
+- author_thread_reads：已被“全部已读”或关注时的水位线覆盖的单帖已读标记，以及已取消关注的作者的标记；
+- notification_jobs：已结束（done / failed）且超过保留期的通知任务；
+- update_sequence：超过保留期的序号（最新的一条保留，MAX(seq) 即当前序号）。
+- graph_changes：超过保留期的关系图变化（更早的快照不再使用，启动时从数据库重建关系图）。
+
+这些行对未读状态没有影响，删除不需要调整未读计数器。每张表按主键范围分块删除，每块单独提交并暂停片刻，
+删除语句只锁住这一小段主键范围，不会长时间阻塞正常的读写。
+"""
+import asyncio
+import aiomysql
+
+# 每项：(表名, 找到下一块主键上界的查询, 删除该块中无用行的语句)；删除语句的前两个参数为 (下界, 上界]
+_TARGETS = (
+    (
+        "thread_subscriptions",
+        "SELECT subscription_id FROM thread_subscriptions WHERE subscription_id > %s ORDER BY subscription_id LIMIT 1 OFFSET %s",
+        """DELETE FROM thread_subscriptions
+        WHERE subscription_id > %s AND subscription_id <= %s AND subscribe_release = FALSE AND subscribe_test = FALSE""",
+    ),
+    (
+        "author_thread_reads",
+        "SELECT follower_id FROM author_thread_reads WHERE follower_id > %s ORDER BY follower_id LIMIT 1 OFFSET %s",
+        """DELETE r FROM author_thread_reads r
+        JOIN users u ON u.user_id = r.follower_id
+        JOIN managed_threads t ON t.thread_id = r.thread_id
+        LEFT JOIN author_follows af ON af.follower_id = r.follower_id AND af.author_id = t.author_id
+        WHERE r.follower_id > %s AND r.follower_id <= %s
+            AND (af.follow_id IS NULL OR r.seen_seq <= GREATEST(af.last_seen_seq, u.authors_seen_seq))""",
+    ),
+    (
+        "notification_jobs",
+        "SELECT job_id FROM notification_jobs WHERE job_id > %s ORDER BY job_id LIMIT 1 OFFSET %s",
+        """DELETE FROM notification_jobs
+        WHERE job_id > %s AND job_id <= %s AND status IN ('done', 'failed') AND updated_at < NOW() - INTERVAL %s DAY""",
+    ),
+    (
+        "update_sequence",
+        "SELECT seq FROM update_sequence WHERE seq > %s ORDER BY seq LIMIT 1 OFFSET %s",
+        """DELETE FROM update_sequence
+        WHERE seq > %s AND seq <= %s AND created_at < NOW() - INTERVAL %s DAY
+            AND seq < (SELECT max_seq FROM (SELECT MAX(seq) AS max_seq FROM update_sequence) AS latest)""",
+    ),
+    (
+        "graph_changes",
+        "SELECT change_id FROM graph_changes WHERE change_id > %s ORDER BY change_id LIMIT 1 OFFSET %s",
+        """DELETE FROM graph_changes
+        WHERE change_id > %s AND change_id <= %s AND created_at < NOW() - INTERVAL %s DAY""",
+    ),
+)
+_MAX_KEY = 2 ** 64 - 1 # BIGINT UNSIGNED 的上限，最后一块的上界
+
+async def compact_table(pool: aiomysql.Pool, boundary_sql: str, delete_sql: str, extra_params: tuple,
+                        chunk_size: int, pause: float) -> int:
+    """从小到大按主键分块执行 delete_sql，返回删除的行数"""
+    deleted = 0
+    lower = 0
+    while lower < _MAX_KEY:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(boundary_sql, (lower, max(0, chunk_size - 1))) # 第 chunk_size 行的主键作为上界
+                row = await cursor.fetchone()
+                upper = row[0] if row else _MAX_KEY
+                await cursor.execute(delete_sql, (lower, upper, *extra_params))
+                deleted += cursor.rowcount
+            await conn.commit()
+        lower = upper
+        await asyncio.sleep(pause)
+    return deleted
+
+async def compact(pool: aiomysql.Pool, retention_days: int, chunk_size: int, pause: float) -> dict[str, int]:
+    """整理所有表一遍，返回 {表名: 删除的行数}"""
+    reclaimed = {}
+    for table, boundary_sql, delete_sql in _TARGETS:
+        extra_params = (retention_days,) if "INTERVAL" in delete_sql else ()
+        reclaimed[table] = await compact_table(pool, boundary_sql, delete_sql, extra_params, chunk_size, pause)
+    return reclaimed
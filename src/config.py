@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 import datetime
+from src.templates import Template, escape_user_text
 # 加载 .env 文件
 load_dotenv()
 
@@ -10,33 +11,69 @@ TARGET_GUILD_ID = int(os.getenv("TARGET_GUILD_ID"))
 ADMIN_IDS = [int(uid.strip()) for uid in os.getenv("ADMIN_IDS", "").split(',') if uid.strip().isdigit()]
 ALLOWED_CHANNELS = [int(c.strip()) for c in os.getenv("ALLOWED_CHANNELS").split(",")]
 
-# --- Embed 文本配置 ---
+# --- Embed 文本配置（带 {{宏}} 的文本在这里编译，宏写错时启动即报错） ---
 EMBED_TITLE = os.getenv("EMBED_TITLE")
 EMBED_TEXT = os.getenv("EMBED_TEXT")
 EMBED_ERROR = os.getenv("EMBED_ERROR")
 UPDATE_TITLE = os.getenv("UPDATE_TITLE")
-UPDATE_TEXT = os.getenv("UPDATE_TEXT")
+UPDATE_TEXT = Template("UPDATE_TEXT", os.getenv("UPDATE_TEXT"), ("author", "text", "url"), escaped={"text": escape_user_text})
 UPDATE_ERROR = os.getenv("UPDATE_ERROR")
 DM_PANEL_TITLE = os.getenv("DM_PANEL_TITLE")
-DM_PANEL_TEXT = os.getenv("DM_PANEL_TEXT")
+DM_PANEL_TEXT = Template("DM_PANEL_TEXT", os.getenv("DM_PANEL_TEXT"), ("user", "thread_update_number", "author_update_number"))
 VIEW_UPDATES_TITLE = os.getenv("VIEW_UPDATES_TITLE")
 VIEW_UPDATES_TEXT = os.getenv("VIEW_UPDATES_TEXT")
 MANAGE_SUBS_TITLE = os.getenv("MANAGE_SUBS_TITLE")
 MANAGE_AUTHORS_TITLE = os.getenv("MANAGE_AUTHORS_TITLE")
 TRACK_NEW_THREAD_EMBED_TITLE = os.getenv("TRACK_NEW_THREAD_EMBED_TITLE")
-TRACK_NEW_THREAD_EMBED_TEXT = os.getenv("TRACK_NEW_THREAD_EMBED_TEXT")
+TRACK_NEW_THREAD_EMBED_TEXT = Template("TRACK_NEW_THREAD_EMBED_TEXT", os.getenv("TRACK_NEW_THREAD_EMBED_TEXT"), ("author", "thread_url"))
 
 # --- 功能参数 ---
-UPDATE_MENTION_MAX_NUMBER = int(os.getenv("UPDATE_MENTION_MAX_NUMBER", 50))
-UPDATE_MENTION_DELAY = int(os.getenv("UPDATE_MENTION_DELAY", 1000))
+UPDATE_MENTION_MAX_NUMBER = int(os.getenv("UPDATE_MENTION_MAX_NUMBER", 0)) # 0 = 只按 2000 字符上限装包
+UPDATE_MENTION_DELAY = int(os.getenv("UPDATE_MENTION_DELAY", 1000)) # 没有速率限制信息时批次之间的间隔（毫秒）
+UPDATE_MENTION_ADAPTIVE = int(os.getenv("UPDATE_MENTION_ADAPTIVE", 1)) # 1 = 按 Discord 返回的速率限制响应头调整节奏，0 = 始终固定间隔
 UPDATES_PER_PAGE = int(os.getenv("UPDATES_PER_PAGE", 5))
 TRACK_NEW_THREAD_FROM_ALLOWED_CHANNELS = int(os.getenv("TRACK_NEW_THREAD_FROM_ALLOWED_CHANNELS", 1))
+FANOUT_GLOBAL_RATE = float(os.getenv("FANOUT_GLOBAL_RATE", 10))
+FANOUT_MAX_ACTIVE_JOBS = int(os.getenv("FANOUT_MAX_ACTIVE_JOBS", 32))
+FANOUT_RETRY_MAX_ATTEMPTS = int(os.getenv("FANOUT_RETRY_MAX_ATTEMPTS", 5)) # 通知任务出错（5xx、超时、数据库错误等）时的最多尝试次数，之后标记为 failed
+FANOUT_RETRY_BASE_SECONDS = float(os.getenv("FANOUT_RETRY_BASE_SECONDS", 30)) # 第一次重试的等待，之后每次翻倍
+FANOUT_RETRY_MAX_SECONDS = float(os.getenv("FANOUT_RETRY_MAX_SECONDS", 900)) # 单次重试等待的上限
+PROGRESS_UPDATE_INTERVAL = float(os.getenv("PROGRESS_UPDATE_INTERVAL", 5))
+PROGRESS_UPDATE_PERCENT_STEP = int(os.getenv("PROGRESS_UPDATE_PERCENT_STEP", 10))
+DIGEST_WINDOW_MINUTES = int(os.getenv("DIGEST_WINDOW_MINUTES", 60)) # 摘要模式下合并更新的时间窗口
+UNREAD_RECONCILE_INTERVAL_MINUTES = int(os.getenv("UNREAD_RECONCILE_INTERVAL_MINUTES", 360)) # 未读计数器的对账间隔
+UPDATE_HISTORY_RETENTION_MONTHS = int(os.getenv("UPDATE_HISTORY_RETENTION_MONTHS", 0)) # 更新历史按月保留，0 = 永久保留
+COMPACTION_INTERVAL_HOURS = int(os.getenv("COMPACTION_INTERVAL_HOURS", 24)) # 后台数据整理的间隔，0 = 关闭
+COMPACTION_RETENTION_DAYS = int(os.getenv("COMPACTION_RETENTION_DAYS", 30)) # 已结束的通知任务与旧序号的保留天数
+COMPACTION_CHUNK_SIZE = int(os.getenv("COMPACTION_CHUNK_SIZE", 1000)) # 每次删除覆盖的主键范围（行数）
+COMPACTION_PAUSE_SECONDS = float(os.getenv("COMPACTION_PAUSE_SECONDS", 0.2)) # 两块之间的暂停
+THREAD_PROMPT_WORKERS = int(os.getenv("THREAD_PROMPT_WORKERS", 4)) # 并发发送新帖子提示的 worker 数
+THREAD_PROMPT_MAX_ATTEMPTS = int(os.getenv("THREAD_PROMPT_MAX_ATTEMPTS", 6)) # 帖子未就绪（40058）时的最多尝试次数，之后记入死信
+THREAD_PROMPT_RETRY_BASE_SECONDS = float(os.getenv("THREAD_PROMPT_RETRY_BASE_SECONDS", 2)) # 第一次重试的等待，之后每次翻倍
+THREAD_PROMPT_RETRY_MAX_SECONDS = float(os.getenv("THREAD_PROMPT_RETRY_MAX_SECONDS", 60)) # 单次重试等待的上限
 
 # --- 数据库配置 ---
 MYSQL_USER = os.getenv('MYSQL_USER')
 MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD')
 MYSQL_DATABASE = os.getenv('MYSQL_DATABASE')
 POOL_SIZE = int(os.getenv("POOL_SIZE", 10))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("POOL_ACQUIRE_TIMEOUT", 10)) # 等待空闲连接的最长秒数，0 = 一直等待
+POOL_ADAPTIVE = int(os.getenv("POOL_ADAPTIVE", 0)) # 1 = 按排队等待时间在 POOL_MIN_SIZE ~ POOL_MAX_SIZE 之间自动调整连接数
+POOL_MIN_SIZE = int(os.getenv("POOL_MIN_SIZE", 5))
+POOL_MAX_SIZE = int(os.getenv("POOL_MAX_SIZE", 30))
+POOL_TARGET_WAIT_MS = float(os.getenv("POOL_TARGET_WAIT_MS", 20)) # 借出连接的等待时间（p90）超过此值时扩大连接池
+POOL_ADJUST_INTERVAL = int(os.getenv("POOL_ADJUST_INTERVAL", 30)) # 自适应调整的间隔（秒）
+BATCH_POOL_SIZE = int(os.getenv("BATCH_POOL_SIZE", 0)) or max(2, POOL_SIZE // 2) # 订阅/关注按钮的多语句批量请求使用的单独连接池，0 = POOL_SIZE 的一半
+MYSQL_REPLICA_HOSTS = [h.strip() for h in os.getenv("MYSQL_REPLICA_HOSTS", "").split(",") if h.strip()] # 只读副本，留空 = 全部走主库
+REPLICA_MAX_LAG_SECONDS = int(os.getenv("REPLICA_MAX_LAG_SECONDS", 3)) # 复制延迟超过此值的副本暂停使用
+REPLICA_LAG_CHECK_INTERVAL = int(os.getenv("REPLICA_LAG_CHECK_INTERVAL", 10)) # 检查副本延迟的间隔（秒）
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", 10)) # 用户写入后这段时间内的读取仍走主库
+KNOWN_USER_CACHE_SIZE = int(os.getenv("KNOWN_USER_CACHE_SIZE", 100000)) # 进程内缓存的“已存在用户”数量上限，0 = 不缓存
+THREAD_CACHE_SIZE = int(os.getenv("THREAD_CACHE_SIZE", 10000)) # 进程内缓存的帖子元数据（帖主、权限组、最近一次更新）数量上限，0 = 不缓存
+FOLLOWER_INDEX_MAX_IDS = int(os.getenv("FOLLOWER_INDEX_MAX_IDS", 2000000)) # 进程内关注者索引的总条目数上限（每条 8 字节）
+SUBSCRIPTION_GRAPH = int(os.getenv("SUBSCRIPTION_GRAPH", 0)) # 1 = 在进程内保存完整的订阅/关注关系图，发布更新时在内存中解析收件人
+SUBSCRIPTION_GRAPH_SNAPSHOT = os.getenv("SUBSCRIPTION_GRAPH_SNAPSHOT", "data/subscription_graph.bin") # 关系图快照文件，重启时直接映射
+SUBSCRIPTION_GRAPH_SNAPSHOT_MINUTES = int(os.getenv("SUBSCRIPTION_GRAPH_SNAPSHOT_MINUTES", 30)) # 写快照（合并变化）的间隔
 
 UTC_PLUS_8 = datetime.timezone(datetime.timedelta(hours=8))
 def get_utc8_now_str():
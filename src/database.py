@@ -1,29 +1,42 @@
 import aiomysql
 import asyncio
-from src import config
+from pymysql.constants import CLIENT
+from src import config, migrations
+from src.dbpool import MonitoredPool
 
-async def create_db_pool():
-    """创建并返回一个aiomysql数据库连接池，包含重试逻辑"""
-    max_retries = 10
+async def create_db_pool(host: str = 'db', max_retries: int = 10, *, multi_statements: bool = False) -> MonitoredPool | None:
+    """创建并返回一个带遥测的aiomysql数据库连接池（见 src/dbpool.py），包含重试逻辑。
+    multi_statements=True 时创建只供 execute_batch/commit_batch 使用的小连接池（BATCH_POOL_SIZE 个连接），
+    只有这个池的连接开启 CLIENT.MULTI_STATEMENTS，其余连接池不允许一次请求执行多条语句"""
     retry_delay = 5
+    if multi_statements:
+        maxsize = config.BATCH_POOL_SIZE
+    else:
+        maxsize = config.POOL_MAX_SIZE if config.POOL_ADAPTIVE == 1 else config.POOL_SIZE # 自适应模式下实际借出数由 MonitoredPool.limit 控制
     for i in range(max_retries):
         try:
             pool = await aiomysql.create_pool(
-                host='db',
+                host=host,
                 user=config.MYSQL_USER,
                 password=config.MYSQL_PASSWORD,
                 db=config.MYSQL_DATABASE,
                 port=3306,
                 minsize=1,
-                maxsize=config.POOL_SIZE,
+                maxsize=maxsize,
                 pool_recycle=600,
-                autocommit=False
+                autocommit=False,
+                client_flag=CLIENT.MULTI_STATEMENTS if multi_statements else 0
             )
             async with pool.acquire() as conn:
                 async with conn.cursor() as cursor:
                     await cursor.execute("SELECT 1")
-            print("数据库连接池创建成功。")
-            return pool
+            print(f"数据库连接池创建成功（{host}）。")
+            if multi_statements:
+                return MonitoredPool(pool, maxsize, acquire_timeout=config.POOL_ACQUIRE_TIMEOUT)
+            if config.POOL_ADAPTIVE == 1:
+                return MonitoredPool(pool, config.POOL_SIZE, min_size=config.POOL_MIN_SIZE, max_size=config.POOL_MAX_SIZE,
+                                     acquire_timeout=config.POOL_ACQUIRE_TIMEOUT, target_wait_ms=config.POOL_TARGET_WAIT_MS)
+            return MonitoredPool(pool, config.POOL_SIZE, acquire_timeout=config.POOL_ACQUIRE_TIMEOUT)
         except Exception as err:
             print(f"数据库连接失败 (尝试 {i+1}/{max_retries}): {err}")
             if i + 1 == max_retries:
@@ -34,108 +47,93 @@ async def create_db_pool():
     return None
 
 async def setup_database(pool: aiomysql.pool.Pool):
-    """检查并创建所有需要的数据库表"""
-    print("正在检查并创建数据库表...")
+    """把数据库结构迁移到最新版本（表结构定义见 src/migrations.py）"""
+    print("正在检查数据库结构版本...")
     try:
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                # 表1: 用户信息与状态表
-                await cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS users (
-                        user_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
-                        last_checked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                        track_new_thread BOOLEAN NOT NULL DEFAULT TRUE
-                    );
-                """)
-                # 兼容旧表，检查列是否存在
-                await cursor.execute("""
-                    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'track_new_thread'
-                """)
-                if (await cursor.fetchone())[0] == 0:
-                    await cursor.execute("ALTER TABLE users ADD COLUMN track_new_thread BOOLEAN NOT NULL DEFAULT TRUE;")
-
-                # 表2: 被管理的帖子表
-                await cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS managed_threads (
-                        thread_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
-                        guild_id BIGINT UNSIGNED NOT NULL,
-                        author_id BIGINT UNSIGNED NOT NULL,
-                        last_update_url VARCHAR(255) DEFAULT NULL,
-                        last_update_message TEXT DEFAULT NULL,
-                        last_update_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
-                        last_update_type ENUM('release', 'test') DEFAULT NULL,
-                        FOREIGN KEY (author_id) REFERENCES users(user_id) ON DELETE CASCADE
-                    );
-                """)
-                # 表3: 帖子订阅表
-                await cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS thread_subscriptions (
-                        subscription_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-                        user_id BIGINT UNSIGNED NOT NULL,
-                        thread_id BIGINT UNSIGNED NOT NULL,
-                        subscribe_release BOOLEAN NOT NULL DEFAULT FALSE,
-                        subscribe_test BOOLEAN NOT NULL DEFAULT FALSE,
-                        has_new_update BOOLEAN NOT NULL DEFAULT FALSE,
-                        UNIQUE KEY unique_subscription (user_id, thread_id),
-                        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-                        FOREIGN KEY (thread_id) REFERENCES managed_threads(thread_id) ON DELETE CASCADE
-                    );
-                """)
-                # 表4: 作者关注表
-                await cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS author_follows (
-                        follow_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-                        follower_id BIGINT UNSIGNED NOT NULL,
-                        author_id BIGINT UNSIGNED NOT NULL,
-                        UNIQUE KEY unique_follow (follower_id, author_id),
-                        FOREIGN KEY (follower_id) REFERENCES users(user_id) ON DELETE CASCADE,
-                        FOREIGN KEY (author_id) REFERENCES users(user_id) ON DELETE CASCADE
-                    );
-                """)
-                # 表5: 作者动态通知表
-                await cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS follower_thread_notifications (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        follower_id BIGINT UNSIGNED NOT NULL,
-                        thread_id BIGINT UNSIGNED NOT NULL,
-                        UNIQUE KEY unique_notification (follower_id, thread_id),
-                        FOREIGN KEY (follower_id) REFERENCES users(user_id) ON DELETE CASCADE,
-                        FOREIGN KEY (thread_id) REFERENCES managed_threads(thread_id) ON DELETE CASCADE
-                    );
-                """)
-
-                #表6：帖子单独的权限组
-                await cursor.execute("""
-                    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_SCHEMA = DATABASE() 
-                      AND TABLE_NAME = 'managed_threads' 
-                      AND COLUMN_NAME = 'thread_permission_group_1'
-                """)
-                if (await cursor.fetchone())[0] == 0:
-                    print("为 managed_threads 表添加 thread_permission_group 列...")
-                    await cursor.execute("""
-                        ALTER TABLE managed_threads
-                        ADD COLUMN thread_permission_group_1 BIGINT UNSIGNED DEFAULT NULL,
-                        ADD COLUMN thread_permission_group_2 BIGINT UNSIGNED DEFAULT NULL,
-                        ADD COLUMN thread_permission_group_3 BIGINT UNSIGNED DEFAULT NULL,
-                        ADD COLUMN thread_permission_group_4 BIGINT UNSIGNED DEFAULT NULL;
-                    """)
-                    print("权限组列已成功添加。")
-                await conn.commit()
-        print("数据库表结构已确认。")
+        applied = await migrations.migrate(pool)
+        print(f"数据库表结构已确认（本次应用了 {applied} 个迁移）。")
     except Exception as err:
-        print(f"数据库建表失败: {err}")
+        print(f"数据库迁移失败: {err}")
         raise
 
+class KnownUserCache:
+    """已确认存在于 users 表中的用户 ID，容量有限，按最近使用淘汰。
+
+    只记录确定存在的用户（不用布隆过滤器：误判会跳过建行，导致后续写入违反外键），
+    用普通 dict 的插入顺序实现 LRU，每个条目只占一个键。users 表中的行不会被删除，缓存无需失效。
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ids: dict[int, None] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def check(self, user_id: int) -> bool:
+        """命中时把该用户移到最近使用的一端"""
+        if user_id in self._ids:
+            self._ids[user_id] = self._ids.pop(user_id)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, user_id: int):
+        if self.capacity <= 0:
+            return
+        self._ids.pop(user_id, None)
+        self._ids[user_id] = None
+        if len(self._ids) > self.capacity:
+            del self._ids[next(iter(self._ids))]
+
+    def clear(self):
+        self._ids.clear()
+        self.hits = 0
+        self.misses = 0
+
+known_users = KnownUserCache(config.KNOWN_USER_CACHE_SIZE)
+
 async def check_and_create_user(db_pool: aiomysql.pool.Pool, user_id: int):
-    """检查用户是否存在，如果不存在则在数据库中创建"""
-    if not user_id:
+    """检查用户是否存在，如果不存在则在数据库中创建；已知存在的用户不访问数据库"""
+    if not user_id or known_users.check(user_id):
         return
     try:
         async with db_pool.acquire() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute("INSERT INTO users (user_id) VALUES (%s) ON DUPLICATE KEY UPDATE user_id = user_id", (user_id,))
             await conn.commit()
+        known_users.add(user_id)
     except Exception as err:
-        print(f"数据库错误于 check_and_create_user: {err}")
\ No newline at end of file
+        print(f"数据库错误于 check_and_create_user: {err}")
+
+def ensure_user_statements(user_id: int) -> list[tuple[str, tuple]]:
+    """拼进批量语句开头的建用户语句；已知存在的用户返回空列表。批量成功后请调用 known_users.add"""
+    if known_users.check(user_id):
+        return []
+    return [("INSERT INTO users (user_id) VALUES (%s) ON DUPLICATE KEY UPDATE user_id = user_id", (user_id,))]
+
+async def execute_batch(cursor: aiomysql.Cursor, statements: list[tuple[str, tuple | None]]) -> list[list[tuple]]:
+    """把多条语句拼成一个请求发送（连接需来自 create_db_pool(multi_statements=True)，即 bot.batch_pool），返回每条语句的结果行。
+    参数由驱动在客户端转义；任何一条出错时后续语句不再执行，异常在读取到该条结果时抛出"""
+    sql = ";\n".join(cursor.mogrify(query.strip().rstrip(";"), args) for query, args in statements)
+    await cursor.execute(sql)
+    results = [await cursor.fetchall()]
+    while await cursor.nextset():
+        results.append(await cursor.fetchall())
+    return results
+
+async def commit_batch(conn: aiomysql.Connection, statements: list[tuple[str, tuple | None]]) -> list[list[tuple]]:
+    """在一个事务中用 execute_batch 发送 statements 并提交，返回每条语句的结果行；出错时回滚后重新抛出"""
+    try:
+        async with conn.cursor() as cursor:
+            results = await execute_batch(cursor, statements)
+        await conn.commit()
+    except Exception:
+        try:
+            await conn.rollback()
+        except Exception:
+            pass # 回滚失败的连接仍处于事务中，归还时由连接池关闭而不是复用
+        raise
+    return results
@@ -0,0 +1,203 @@
+"""数据库连接池的遥测与自适应大小。
+
+MonitoredPool 包装 aiomysql 连接池，用法与 aiomysql.Pool 相同（async with pool.acquire() as conn）：
+- 记录每次借出连接的排队等待时间与超时次数；
+- 按调用位置统计连接占用时间：acquire(site=...) 显式传入标签，否则记下调用方函数的代码对象（只取一帧，不格式化字符串），
+  函数名在 busiest_sites 中才解析（Python 3.11 起为 co_qualname，更早的版本为 co_name）；
+- 同时借出的连接数由 limit 控制。自适应模式下，后台任务按上次调整以来的等待时间在 [min_size, max_size] 之间调整 limit。
+aiomysql 连接池的 maxsize 设为上限，连接按需创建；每次调整后关闭超出 limit 的空闲连接，关闭时同样占用借出名额。
+底层连接池不对外暴露，借出与归还只能经过 acquire，以免绕过 limit 与排队统计。
+"""
+import asyncio
+import collections
+import os
+import sys
+import time
+from types import CodeType
+import aiomysql
+
+_getframe = getattr(sys, "_getframe", None) # 非 CPython 实现可能没有，此时不记录调用位置
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def _site_label(site: str | CodeType) -> str:
+    if isinstance(site, str):
+        return site
+    module = os.path.splitext(os.path.basename(site.co_filename))[0]
+    return f"{module}.{getattr(site, 'co_qualname', site.co_name)}"
+
+class _MonitoredAcquire:
+    def __init__(self, pool: "MonitoredPool", site: str | CodeType | None):
+        self._pool = pool
+        self._site = site
+        self._conn = None
+        self._start = 0.0
+
+    async def __aenter__(self) -> aiomysql.Connection:
+        self._conn = await self._pool._checkout()
+        self._start = time.perf_counter()
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        await self._pool._checkin(self._conn, self._site, time.perf_counter() - self._start)
+
+class MonitoredPool:
+    def __init__(self, pool: aiomysql.Pool, size: int, *, min_size: int = 0, max_size: int = 0,
+                 acquire_timeout: float = 0, target_wait_ms: float = 20, window: int = 2048):
+        self._pool = pool
+        self.min_size = min_size or size
+        self.max_size = max_size or size
+        self.limit = max(self.min_size, min(size, self.max_size))
+        self.acquire_timeout = acquire_timeout # 秒，0 = 一直等待
+        self.target_wait = target_wait_ms / 1000
+        self.in_use = 0
+        self.peak_in_use = 0 # 上次调整以来同时借出的最大数量
+        self.acquires = 0
+        self.timeouts = 0
+        self.wait_max = 0.0
+        self.resizes = 0
+        self.recent_waits = collections.deque(maxlen=window)
+        self.sites: dict[str | CodeType, list] = {} # 调用位置（标签或代码对象） -> [次数, 总占用秒数, 最长占用秒数]
+        self._waiters = collections.deque()
+        self._adjust_mark = (0, 0) # 上次调整时的 (acquires, timeouts)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def size(self) -> int:
+        """底层连接池当前的连接数"""
+        return self._pool.size
+
+    @property
+    def freesize(self) -> int:
+        return self._pool.freesize
+
+    def close(self):
+        self._pool.close()
+
+    async def wait_closed(self):
+        await self._pool.wait_closed()
+
+    def acquire(self, site: str | None = None) -> _MonitoredAcquire:
+        """借出一个连接；site 为空时以调用方的函数作为调用位置"""
+        if site is None and _getframe is not None:
+            site = _getframe(1).f_code
+        return _MonitoredAcquire(self, site)
+
+    # --- 借出名额 ---
+    async def _admit(self):
+        """等待 in_use < limit，先到先得"""
+        while self.in_use >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake() # 已被唤醒却放弃了名额，转交给下一个
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_use += 1
+
+    def _wake(self):
+        free = self.limit - self.in_use
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _leave(self):
+        self.in_use -= 1
+        self._wake()
+
+    async def _admit_and_acquire(self) -> aiomysql.Connection:
+        await self._admit()
+        try:
+            return await self._pool.acquire()
+        except BaseException:
+            self._leave()
+            raise
+
+    async def _checkout(self) -> aiomysql.Connection:
+        start = time.perf_counter()
+        try:
+            if self.acquire_timeout > 0:
+                conn = await asyncio.wait_for(self._admit_and_acquire(), self.acquire_timeout)
+            else:
+                conn = await self._admit_and_acquire()
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        wait = time.perf_counter() - start
+        self.acquires += 1
+        self.wait_max = max(self.wait_max, wait)
+        self.recent_waits.append(wait)
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return conn
+
+    async def _checkin(self, conn: aiomysql.Connection, site: str | CodeType | None, held: float):
+        if site is not None:
+            stats = self.sites.setdefault(site, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += held
+            stats[2] = max(stats[2], held)
+        try:
+            await self._pool.release(conn)
+        finally:
+            self._leave()
+
+    # --- 统计 ---
+    def wait_percentiles(self) -> tuple[float, float]:
+        """最近一批借出的等待时间 (p50, p99)，单位秒"""
+        return _percentile(self.recent_waits, 50), _percentile(self.recent_waits, 99)
+
+    def busiest_sites(self, top: int = 5) -> list[tuple[str, int, float, float]]:
+        """按总占用时间排序的调用位置：(位置, 次数, 平均占用秒数, 最长占用秒数)"""
+        ranked = sorted(self.sites.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return [(_site_label(site), count, total / count, longest) for site, (count, total, longest) in ranked]
+
+    # --- 自适应 ---
+    async def adjust(self) -> int | None:
+        """按上次调整以来的等待时间增减 limit，返回新的 limit；没有变化时返回 None。
+
+        等待时间的 p90 超过目标（或出现超时）时按 1/4 扩大；几乎不排队且借出峰值不到一半时每次缩小 1。
+        无论是否调整，都关闭超出 limit 的空闲连接（上次缩小时仍在使用、之后才归还的连接在这里关闭）。
+        """
+        acquires, timeouts = self.acquires - self._adjust_mark[0], self.timeouts - self._adjust_mark[1]
+        samples = list(self.recent_waits)[-acquires:] if acquires else []
+        self._adjust_mark = (self.acquires, self.timeouts)
+        peak, self.peak_in_use = self.peak_in_use, self.in_use
+        p90 = _percentile(samples, 90)
+
+        limit = self.limit
+        if (p90 > self.target_wait or timeouts) and limit < self.max_size:
+            limit = min(self.max_size, limit + max(1, limit // 4))
+        elif p90 <= self.target_wait / 4 and peak < limit // 2 and limit > self.min_size:
+            limit -= 1
+        if limit == self.limit:
+            await self._close_idle()
+            return None
+        grow = limit > self.limit
+        self.limit = limit
+        self.resizes += 1
+        if grow:
+            self._wake()
+        await self._close_idle()
+        return limit
+
+    async def _close_idle(self):
+        """关闭超出 limit 的空闲连接：与普通借出一样先占用一个名额再借出，关闭后归还，aiomysql 会把已关闭的连接移出连接池。
+        名额已满时不等待（也不计入排队统计），留到下一次调整"""
+        while self._pool.size > self.limit and self._pool.freesize > 0 and self.in_use < self.limit:
+            conn = await self._admit_and_acquire()
+            try:
+                await conn.ensure_closed()
+            finally:
+                await self._checkin(conn, None, 0.0)
@@ -0,0 +1,612 @@
+from __future__ import annotations
+import asyncio
+from array import array
+from collections import deque
+import re
+import aiohttp
+import discord
+import aiomysql
+from src.config import get_utc8_now_str
+from src.followers import after, follower_index
+from src.graph import FOLLOW, RELEASE, TEST, subscription_graph
+from src.progress import ProgressReporter
+from src.templates import escape_user_text
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import MyBot
+
+MESSAGE_CHAR_LIMIT = 2000 # Discord 单条消息的字符上限
+
+class MentionPacker:
+    """把 user_id 逐个装入提及消息，每条不超过 char_limit 个字符；max_count>0 时另设每条人数上限"""
+    def __init__(self, char_limit: int = MESSAGE_CHAR_LIMIT, max_count: int = 0):
+        self.char_limit = char_limit
+        self.max_count = max_count
+        self._batch = []
+        self._length = 0
+
+    def add(self, uid: int) -> list[int] | None:
+        """装入一个 user_id；当前消息已满时先返回装好的那一批"""
+        full_batch = None
+        token_length = len(str(uid)) + 3 # "<@id>"
+        if self._batch and (self._length + 1 + token_length > self.char_limit or
+                            (self.max_count and len(self._batch) >= self.max_count)):
+            full_batch = self.flush()
+        if self._batch:
+            token_length += 1 # 分隔空格
+        self._batch.append(uid)
+        self._length += token_length
+        return full_batch
+
+    def flush(self) -> list[int] | None:
+        batch, self._batch, self._length = self._batch, [], 0
+        return batch or None
+
+def pack_mentions(user_ids, char_limit: int = MESSAGE_CHAR_LIMIT, max_count: int = 0):
+    """按顺序把 user_id 装入尽可能少的提及消息"""
+    packer = MentionPacker(char_limit, max_count)
+    for uid in user_ids:
+        batch = packer.add(uid)
+        if batch:
+            yield batch
+    batch = packer.flush()
+    if batch:
+        yield batch
+
+# 提及消息的发送与删除两条路由，按 (频道, 方法) 各自记录一个速率限制桶
+_MESSAGE_ROUTE = re.compile(r"/channels/(\d+)/messages(?:/\d+)?$")
+
+class MentionPacer:
+    """两批提及之间的节奏，按 Discord 响应头中的速率限制信息决定。
+
+    MyBot 把 trace_config() 作为 http_trace 交给 discord.py（aiohttp 的公开接口），发送与删除消息的每个响应都经过 observe：
+    记下 X-RateLimit-Remaining 与 X-RateLimit-Reset-After；429 时记下 Retry-After，全局限速（X-RateLimit-Global）对所有频道生效。
+    adaptive=True（默认，UPDATE_MENTION_ADAPTIVE=1）时，发送下一批前只在对应的桶已耗尽时等待到重置。
+    某个频道还没有观察到响应头（刚开始发送），或 adaptive=False 时，两批之间按 min_interval（UPDATE_MENTION_DELAY）固定等待。
+    """
+    def __init__(self, min_interval: float = 0.0, adaptive: bool = True):
+        self.min_interval = min_interval # 没有速率限制信息时两批之间的间隔
+        self.adaptive = adaptive
+        self.rate_limited = 0 # 观察到的 429 次数
+        self._buckets = {} # (频道, 方法) -> (剩余次数, 重置时间)
+        self._global_until = 0.0
+        self._last_sent = {}
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_end(session, context, params):
+            self.observe(params.method, str(params.url), params.response.status, params.response.headers)
+
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+    def observe(self, method: str, url: str, status: int, headers):
+        """记录一次响应中的速率限制信息；只关心频道消息的发送与删除"""
+        now = asyncio.get_running_loop().time()
+        headers = {name.lower(): value for name, value in headers.items()}
+        if status == 429:
+            self.rate_limited += 1
+            retry_after = float(headers.get("retry-after") or headers.get("x-ratelimit-reset-after") or 1)
+            if headers.get("x-ratelimit-global", "").lower() == "true":
+                self._global_until = max(self._global_until, now + retry_after)
+                return
+        match = _MESSAGE_ROUTE.search(url.split("?", 1)[0])
+        if match is None:
+            return
+        key = (int(match.group(1)), method.upper())
+        if status == 429:
+            self._buckets[key] = (0, now + retry_after)
+        elif "x-ratelimit-remaining" in headers and "x-ratelimit-reset-after" in headers:
+            self._buckets[key] = (int(headers["x-ratelimit-remaining"]), now + float(headers["x-ratelimit-reset-after"]))
+
+    def delay_for(self, channel_id: int) -> float:
+        """返回向该频道发送下一批（发送+删除两个请求）前需要等待的秒数"""
+        now = asyncio.get_running_loop().time()
+        known = [self._buckets[key] for key in ((channel_id, "POST"), (channel_id, "DELETE")) if key in self._buckets]
+        if self.adaptive and known:
+            delay = max((reset_at - now for remaining, reset_at in known if remaining <= 0), default=0.0)
+        elif self.min_interval > 0 and channel_id in self._last_sent:
+            delay = self._last_sent[channel_id] + self.min_interval - now # 没有速率限制信息：固定间隔
+        else:
+            delay = 0.0
+        if self.adaptive:
+            delay = max(delay, self._global_until - now)
+        return max(delay, 0.0)
+
+    async def wait(self, channel_id: int):
+        delay = self.delay_for(channel_id)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._last_sent[channel_id] = asyncio.get_running_loop().time()
+
+    def forget(self, channel_id: int):
+        self._last_sent.pop(channel_id, None)
+        self._buckets.pop((channel_id, "POST"), None)
+        self._buckets.pop((channel_id, "DELETE"), None)
+
+async def _iterate(user_ids):
+    if hasattr(user_ids, "__aiter__"):
+        async for uid in user_ids:
+            yield uid
+    else:
+        for uid in user_ids:
+            yield uid
+
+async def deliver_mentions(thread, user_ids, pacer: MentionPacer, on_batch=None, max_count: int = 0, acquire_turn=None) -> int:
+    """向帖子发送幽灵提及（发送后立即删除），user_ids 可以是普通或异步可迭代对象；每送达一批调用一次 on_batch(batch)，返回送达人数
+
+    acquire_turn 为可选的协程函数，每批发送前等待它返回（用于 FanoutScheduler 的全局限流与轮转）。
+    """
+    delivered = 0
+    packer = MentionPacker(max_count=max_count)
+
+    async def send(batch):
+        nonlocal delivered
+        await pacer.wait(thread.id)
+        if acquire_turn is not None:
+            await acquire_turn()
+        ghosted_message = await thread.send(" ".join(f"<@{uid}>" for uid in batch))
+        await ghosted_message.delete()
+        delivered += len(batch)
+        if on_batch is not None:
+            await on_batch(batch)
+
+    try:
+        async for uid in _iterate(user_ids):
+            batch = packer.add(uid)
+            if batch:
+                await send(batch)
+        batch = packer.flush()
+        if batch:
+            await send(batch)
+    finally:
+        pacer.forget(thread.id)
+    return delivered
+
+# --- 全局通知调度器 ---
+class FanoutScheduler:
+    """进程内唯一的通知调度器，由 MyBot 持有
+
+    每个通知任务在自己的协程中运行，但每一批提及发送前都要向调度器领取一个名额：
+    名额按全局速率（令牌桶，rate 批/秒）发放，并按先到先得的顺序分给等待中的任务。
+    每个任务同一时刻最多只有一个请求在排队，所以这等价于在活跃任务之间轮转，大任务不会饿死小任务。
+    任务出错时标记为 retrying，按指数退避后重新提交，从游标处续传；等待期间不占用活跃名额。
+    尝试 max_attempts 次仍失败的任务标记为 failed，记入最近的失败记录。
+    """
+    def __init__(self, bot: "MyBot", rate: float, max_active_jobs: int, max_attempts: int = 5,
+                 retry_base: float = 30.0, retry_max: float = 900.0):
+        self.bot = bot
+        self.rate = rate
+        self.max_active_jobs = max(1, max_active_jobs)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.sent_batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.failures = deque(maxlen=10) # 最近失败的任务：(时间, job_id, 原因)
+        self._attempts = {}       # job_id -> 已失败的次数（成功后清除）
+        self._retry_timers = {}   # 等待重试的 job_id -> TimerHandle
+        self._pending = deque()   # 等待启动的 job_id
+        self._active = {}         # job_id -> Task
+        self._waiters = deque()   # 等待发送名额的 Future
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+
+    def start(self):
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    def submit(self, job_id: int):
+        """提交（或在重启后重新提交）一个通知任务"""
+        if job_id in self._active or job_id in self._pending or job_id in self._retry_timers:
+            return
+        self._pending.append(job_id)
+        self._start_pending()
+
+    @property
+    def active_jobs(self) -> int:
+        return len(self._active)
+
+    @property
+    def pending_jobs(self) -> int:
+        return len(self._pending)
+
+    @property
+    def retrying_jobs(self) -> int:
+        """正在等待重试的任务数"""
+        return len(self._retry_timers)
+
+    def _start_pending(self):
+        while self._pending and len(self._active) < self.max_active_jobs:
+            job_id = self._pending.popleft()
+            self._active[job_id] = asyncio.create_task(self._run(job_id))
+
+    async def _run(self, job_id: int):
+        try:
+            await self.bot.wait_until_ready()
+            await run_notification_job(self.bot, job_id, self)
+            self._attempts.pop(job_id, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._retry_or_fail(job_id, e)
+        finally:
+            self._active.pop(job_id, None)
+            self._start_pending()
+
+    async def _retry_or_fail(self, job_id: int, error: Exception):
+        """出错的任务按指数退避重新提交（从游标处续传），次数用尽时标记为 failed"""
+        attempt = self._attempts.get(job_id, 0) + 1
+        reason = f"{type(error).__name__}: {error}"[:255]
+        if attempt >= self.max_attempts:
+            self._attempts.pop(job_id, None)
+            self.failed += 1
+            self.failures.append((get_utc8_now_str(), job_id, reason))
+            print(f"{get_utc8_now_str()}|❌ 通知任务 {job_id} 在 {attempt} 次尝试后仍失败，已放弃：{reason}")
+            status = 'failed'
+        else:
+            self._attempts[job_id] = attempt
+            self.retries += 1
+            delay = min(self.retry_max, self.retry_base * 2 ** (attempt - 1))
+            self._retry_timers[job_id] = asyncio.get_running_loop().call_later(delay, self._resubmit, job_id)
+            print(f"{get_utc8_now_str()}|⏳ 通知任务 {job_id} 出错，将在 {delay:g} 秒后从游标处重试（尝试 {attempt + 1}/{self.max_attempts}）：{reason}")
+            status = 'retrying'
+        try:
+            await _set_job_status(self.bot.db_pool, job_id, status, reason)
+        except Exception as e: # 状态写不进去时仍按内存中的计划重试；重启后 running/retrying 的任务都会续传
+            print(f"{get_utc8_now_str()}|无法记录通知任务 {job_id} 的状态 {status}: {e}")
+
+    def _resubmit(self, job_id: int):
+        self._retry_timers.pop(job_id, None)
+        self.submit(job_id)
+
+    async def acquire_turn(self):
+        """领取一个发送名额"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._wakeup.set()
+        await future
+
+    async def _dispatch_loop(self):
+        loop = asyncio.get_running_loop()
+        tokens, last = 1.0, loop.time()
+        capacity = max(1.0, self.rate) # 最多允许 1 秒的突发
+        while True:
+            while not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            if self.rate > 0:
+                now = loop.time()
+                tokens = min(capacity, tokens + (now - last) * self.rate)
+                last = now
+                if tokens < 1:
+                    await asyncio.sleep((1 - tokens) / self.rate)
+                    tokens, last = 1.0, loop.time()
+                tokens -= 1
+            future = self._waiters.popleft()
+            if future.done(): # 等待者已被取消，名额留给下一个
+                tokens += 1 if self.rate > 0 else 0
+                continue
+            future.set_result(None)
+            self.sent_batches += 1
+
+# --- 收件人解析 ---
+RECIPIENT_CHUNK_SIZE = 1000 # 每次从数据库流式读取的收件人数量
+
+# 更新类型 -> 订阅条件；'any' 用于摘要，合并了同一窗口内的发行版与测试版更新
+_SUBSCRIPTION_FILTERS = {
+    "release": "subscribe_release = TRUE",
+    "test": "subscribe_test = TRUE",
+    "any": "(subscribe_release = TRUE OR subscribe_test = TRUE)",
+}
+# 收件人范围：instant = 即时通知（排除开启了摘要模式的用户），digest = 只通知开启了摘要模式的用户，all = 全部
+_AUDIENCE_FILTERS = {
+    "all": "",
+    "instant": "AND {column} NOT IN (SELECT user_id FROM users WHERE digest_mode = TRUE)",
+    "digest": "AND {column} IN (SELECT user_id FROM users WHERE digest_mode = TRUE)",
+}
+
+# 关系图（src/graph.py）就绪时，收件人（包括是否开启了摘要模式）完全在内存中解析；数据库只用于追上关系图的变化
+_GRAPH_KINDS = {"release": (RELEASE,), "test": (TEST,), "any": (RELEASE, TEST)}
+
+async def _digest_users(cursor: aiomysql.Cursor) -> set[int]:
+    await cursor.execute("SELECT user_id FROM users WHERE digest_mode = TRUE")
+    return {row[0] for row in await cursor.fetchall()}
+
+def _graph_recipients(thread_id: int, author_id: int, update_type: str, audience: str, after_user_id: int = 0):
+    """游标之后、属于该收件人范围的收件人，按 user_id 升序逐个产出（调用前先 catch_up）"""
+    if update_type not in _GRAPH_KINDS:
+        raise ValueError(f"未知的更新类型: {update_type}")
+    if audience not in _AUDIENCE_FILTERS:
+        raise ValueError(f"未知的收件人范围: {audience}")
+    recipients = subscription_graph.recipients(thread_id, author_id, _GRAPH_KINDS[update_type], after_user_id)
+    if audience == "all":
+        return recipients
+    wanted = audience == "digest"
+    return (uid for uid in recipients if subscription_graph.is_digest(uid) == wanted)
+
+# 否则：收件人 = 作者的关注者（来自 follower_index）∪ 帖子订阅者中没有关注作者的用户（来自数据库），两部分互不重叠。
+# 数据库一侧对每个订阅者按 (follower_id, author_id) 唯一索引探测一次，不按 author_id 扫描 author_follows。
+def _subscribers_sql(update_type: str, audience: str = "all") -> str:
+    """帖子订阅者中没有关注作者的用户，以 user_id 作为游标升序返回"""
+    if update_type not in _SUBSCRIPTION_FILTERS:
+        raise ValueError(f"未知的更新类型: {update_type}")
+    if audience not in _AUDIENCE_FILTERS:
+        raise ValueError(f"未知的收件人范围: {audience}")
+    return f"""
+        SELECT ts.user_id FROM thread_subscriptions ts
+        WHERE ts.thread_id = %s AND {_SUBSCRIPTION_FILTERS[update_type]} AND ts.user_id > %s
+            {_AUDIENCE_FILTERS[audience].format(column="ts.user_id")}
+            AND NOT EXISTS (SELECT 1 FROM author_follows af WHERE af.follower_id = ts.user_id AND af.author_id = %s)
+    """
+
+async def _followers_in_audience(cursor: aiomysql.Cursor, author_id: int, audience: str, after_user_id: int = 0) -> array:
+    """游标之后、属于该收件人范围的关注者（升序副本）"""
+    followers = after(await follower_index.get(cursor, author_id), after_user_id)
+    if audience == "all" or not followers:
+        return followers
+    digest_users = await _digest_users(cursor)
+    keep = (lambda uid: uid in digest_users) if audience == "digest" else (lambda uid: uid not in digest_users)
+    return array("Q", filter(keep, followers))
+
+async def count_recipients(cursor: aiomysql.Cursor, thread_id: int, author_id: int, update_type: str,
+                           audience: str = "all") -> int:
+    """统计去重后的收件人数量（不使用关系图时，订阅者一侧只在数据库中计数，不把名单取回 Python）"""
+    if subscription_graph.ready:
+        await subscription_graph.catch_up(cursor)
+        return sum(1 for _ in _graph_recipients(thread_id, author_id, update_type, audience))
+    followers = await _followers_in_audience(cursor, author_id, audience)
+    await cursor.execute(f"SELECT COUNT(*) FROM ({_subscribers_sql(update_type, audience)}) AS subscribers", (thread_id, 0, author_id))
+    return len(followers) + (await cursor.fetchone())[0]
+
+async def stream_recipients(pool: aiomysql.pool.Pool, thread_id: int, author_id: int, update_type: str,
+                            after_user_id: int = 0, chunk_size: int = RECIPIENT_CHUNK_SIZE, audience: str = "all"):
+    """按 user_id 升序流式产出收件人，数据库一侧的内存占用只与 chunk_size 有关
+
+    关注者在开始时从索引复制一份；订阅者每一块用无缓冲的 SSCursor 读取并在块结束时归还连接，
+    整个通知过程（可能持续数十分钟）不会一直占用连接池，也不会因为长时间不读取结果而触发 MySQL 的 net_write_timeout。
+    """
+    if subscription_graph.ready:
+        async for uid in _stream_graph_recipients(pool, thread_id, author_id, update_type, after_user_id, audience):
+            yield uid
+        return
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            followers = await _followers_in_audience(cursor, author_id, audience, after_user_id)
+        await conn.commit()
+    sql = f"{_subscribers_sql(update_type, audience)} ORDER BY ts.user_id LIMIT %s"
+    position = 0
+    more_subscribers = True
+    while more_subscribers:
+        async with pool.acquire() as conn, conn.cursor(aiomysql.SSCursor) as cursor:
+            await cursor.execute(sql, (thread_id, after_user_id, author_id, chunk_size))
+            chunk = [row[0] for row in await cursor.fetchall()]
+        more_subscribers = len(chunk) == chunk_size
+        # 与关注者按序合并；还有下一块时，只产出不超过本块最后一个订阅者的关注者
+        limit = chunk[-1] if more_subscribers else None
+        for uid in chunk:
+            while position < len(followers) and followers[position] < uid:
+                yield followers[position]
+                position += 1
+            yield uid
+        while position < len(followers) and (limit is None or followers[position] < limit):
+            yield followers[position]
+            position += 1
+        if more_subscribers:
+            after_user_id = chunk[-1]
+
+async def _stream_graph_recipients(pool: aiomysql.pool.Pool, thread_id: int, author_id: int, update_type: str,
+                                   after_user_id: int, audience: str):
+    """直接从关系图按 user_id 升序逐个产出游标之后的收件人，不复制名单；产出完时追上变化、从游标处再解析一次，
+    只包含游标之后新增的用户（通常为空），与数据库路径一样，发布后新增的订阅者也会被通知到。
+    通知过程中被其他任务应用的取消订阅会跳过尚未产出的用户；新增的订阅只在再解析时产出"""
+    while True:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await subscription_graph.catch_up(cursor)
+            await conn.commit()
+        start = after_user_id
+        for after_user_id in _graph_recipients(thread_id, author_id, update_type, audience, after_user_id):
+            yield after_user_id
+        if after_user_id == start:
+            return
+
+# --- 幽灵提及通知任务 ---
+# /更新推流 只负责写入一条 notification_jobs 记录，真正的提及由 MyBot 的后台 worker 完成。
+# 每成功发送一批就把该批最大的 user_id 写回 last_user_id，重启后从这个游标继续。
+
+async def create_notification_job(cursor: aiomysql.Cursor, thread_id: int, author_id: int, update_type: str,
+                                  update_text: str, response_message: discord.Message, total_users: int,
+                                  audience: str = "instant") -> int:
+    """在发布更新的事务内写入通知任务，返回 job_id"""
+    sql = """
+        INSERT INTO notification_jobs
+            (thread_id, author_id, update_type, audience, update_text, response_channel_id, response_message_id, total_users)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    await cursor.execute(sql, (thread_id, author_id, update_type, audience, update_text,
+                               response_message.channel.id, response_message.id, total_users))
+    return cursor.lastrowid
+
+async def load_pending_jobs(pool: aiomysql.pool.Pool) -> list[int]:
+    """读取所有未完成的通知任务，用于重启后续传"""
+    async with pool.acquire() as conn, conn.cursor() as cursor:
+        await cursor.execute("SELECT job_id FROM notification_jobs WHERE status IN ('pending', 'running', 'retrying') ORDER BY job_id")
+        return [row[0] for row in await cursor.fetchall()]
+
+async def _fetch_job(pool: aiomysql.pool.Pool, job_id: int) -> dict | None:
+    async with pool.acquire() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute("SELECT * FROM notification_jobs WHERE job_id = %s", (job_id,))
+        return await cursor.fetchone()
+
+async def _set_job_status(pool: aiomysql.pool.Pool, job_id: int, status: str, error: str | None = None):
+    """error 为空时清除上一次的错误"""
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("UPDATE notification_jobs SET status = %s, last_error = %s WHERE job_id = %s", (status, error, job_id))
+        await conn.commit()
+
+async def _ack_batch(pool: aiomysql.pool.Pool, job_id: int, last_user_id: int, processed_users: int):
+    """确认一批已送达，推进游标"""
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                "UPDATE notification_jobs SET last_user_id = %s, processed_users = %s WHERE job_id = %s",
+                (last_user_id, processed_users, job_id)
+            )
+        await conn.commit()
+
+async def _get_channel(bot: "MyBot", channel_id: int):
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        channel = await bot.fetch_channel(channel_id)
+    return channel
+
+async def run_notification_job(bot: "MyBot", job_id: int, scheduler: FanoutScheduler | None = None):
+    """执行（或续传）一条通知任务。无法获取帖子或没有发送权限时标记为 failed；
+    其他错误（Discord 5xx、超出限速器的 429、数据库错误等）抛给调用方，由 FanoutScheduler 退避后重试"""
+    job = await _fetch_job(bot.db_pool, job_id)
+    if not job or job['status'] in ('done', 'failed'):
+        return
+    await _set_job_status(bot.db_pool, job_id, 'running')
+
+    try:
+        thread = await _get_channel(bot, job['thread_id'])
+    except (discord.NotFound, discord.Forbidden) as e:
+        print(f"{get_utc8_now_str()}|通知任务 {job_id} 无法获取帖子 {job['thread_id']}: {e}")
+        await _set_job_status(bot.db_pool, job_id, 'failed', f"无法获取帖子: {e}"[:255])
+        return
+
+    response_message = None
+    if job['response_message_id']:
+        try:
+            response_channel = thread if job['response_channel_id'] == thread.id else await _get_channel(bot, job['response_channel_id'])
+            response_message = response_channel.get_partial_message(job['response_message_id'])
+        except discord.HTTPException as e:
+            print(f"{get_utc8_now_str()}|通知任务 {job_id} 无法获取进度消息所在频道: {e}")
+
+    recipients = stream_recipients(bot.db_pool, job['thread_id'], job['author_id'], job['update_type'],
+                                   after_user_id=job['last_user_id'], audience=job['audience'])
+    processed_users = job['processed_users']
+    total_users = max(job['total_users'], processed_users)
+
+    def render_progress(done, total):
+        embed = discord.Embed(title=bot.UPDATE_TITLE, description=job['update_text'], color=discord.Color.green())
+        return embed.set_footer(text=f"运行状态：正在通知 {done}/{total}|{get_utc8_now_str()}")
+
+    reporter = ProgressReporter(response_message, render_progress, total_users, done=processed_users,
+                                interval=bot.PROGRESS_UPDATE_INTERVAL, percent_step=bot.PROGRESS_UPDATE_PERCENT_STEP)
+
+    async def on_batch(batch):
+        nonlocal processed_users, total_users
+        processed_users += len(batch)
+        total_users = max(total_users, processed_users) # 发布后新增的订阅者也会被通知到
+        reporter.total = total_users
+        await _ack_batch(bot.db_pool, job_id, batch[-1], processed_users)
+        await reporter.update(processed_users)
+
+    try:
+        await deliver_mentions(thread, recipients, bot.mention_pacer, on_batch, max_count=bot.UPDATE_MENTION_MAX_NUMBER,
+                               acquire_turn=scheduler.acquire_turn if scheduler else None)
+    except discord.Forbidden:
+        print(f"无法发送幽灵提及消息，可能是权限不足。")
+        error_embed = discord.Embed(title=bot.UPDATE_TITLE, description="无法发送提及通知，请检查机器人权限。", color=discord.Color.red())
+        await reporter.finish(error_embed)
+        await _set_job_status(bot.db_pool, job_id, 'failed', "没有发送提及的权限")
+        return # 无法提及，直接中止
+
+    await _set_job_status(bot.db_pool, job_id, 'done')
+    # 完成
+    final_embed = discord.Embed(title=bot.UPDATE_TITLE, description=job['update_text'], color=discord.Color.green())
+    final_embed.set_footer(text=f"运行状态：✅已通知 {processed_users}/{total_users} | {get_utc8_now_str()}")
+    await reporter.finish(final_embed)
+
+# --- 摘要模式 ---
+# 开启了摘要模式的帖子/用户不会在每次 /更新推流 时被即时提及：发布只写入一行 pending_digests，
+# 由 MyBot.digest_task 每个窗口调用一次 flush_digests，每个帖子合并成一条摘要与一次幽灵提及。
+DIGEST_MAX_LINES = 10 # 摘要中最多列出的更新条数，更早的只计数
+DIGEST_MESSAGE_LIMIT = 100 # 每条更新描述的截断长度，保证摘要不超过 Embed 描述的 4096 字符上限
+
+async def queue_digest(cursor: aiomysql.Cursor, thread_id: int, author_id: int, update_type: str, url: str, message: str):
+    """在发布更新的事务内记录一次待合并的更新"""
+    await cursor.execute(
+        """INSERT INTO pending_digests (thread_id, author_id, update_type, update_url, update_message)
+           VALUES (%s, %s, %s, %s, %s)""",
+        (thread_id, author_id, update_type, url, message)
+    )
+
+def _render_digest(rows: list[dict], window_minutes: int) -> str:
+    lines = [f"过去 {window_minutes} 分钟内共有 {len(rows)} 次更新："]
+    for row in rows[-DIGEST_MAX_LINES:]:
+        label = "发行版" if row['update_type'] == 'release' else "测试版"
+        message = escape_user_text((row['update_message'] or '')[:DIGEST_MESSAGE_LIMIT])
+        lines.append(f"- [{label}] {row['update_url']} {message}".rstrip())
+    if len(rows) > DIGEST_MAX_LINES:
+        lines.insert(1, f"（仅列出最近 {DIGEST_MAX_LINES} 次）")
+    return "\n".join(lines)
+
+async def _flush_thread_digest(bot: "MyBot", thread_id: int, rows: list[dict], last_digest_id: int) -> int | None:
+    """把一个帖子在本窗口内的更新合并为一条通知任务，返回 job_id（无人需要通知时返回 None）"""
+    author_id = rows[-1]['author_id']
+    types = {row['update_type'] for row in rows}
+    update_type = types.pop() if len(types) == 1 else "any"
+    audience = "all" if rows[-1]['thread_digest_mode'] else "digest"
+
+    # 先在一个短事务中统计收件人并认领（删除）本窗口的行，发送 Discord 消息时不占用连接、不持有事务。
+    # 认领之后、写入通知任务之前出错时，本窗口的摘要被丢弃，不会重复发送
+    async with bot.db_pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            total_users = await count_recipients(cursor, thread_id, author_id, update_type, audience)
+            await cursor.execute("DELETE FROM pending_digests WHERE thread_id = %s AND digest_id <= %s", (thread_id, last_digest_id))
+        await conn.commit()
+    if not total_users:
+        return None
+
+    try:
+        thread = await _get_channel(bot, thread_id)
+        update_text = _render_digest(rows, bot.DIGEST_WINDOW_MINUTES)
+        embed = discord.Embed(title=bot.UPDATE_TITLE, description=update_text, color=discord.Color.green())
+        embed.set_footer(text=f"运行状态：已加入通知队列 0/{total_users}|{get_utc8_now_str()}")
+        response_message = await thread.send(embed=embed)
+    except (discord.NotFound, discord.Forbidden) as e:
+        print(f"{get_utc8_now_str()}|无法向帖子 {thread_id} 发送摘要，已丢弃本窗口的摘要: {e}")
+        return None
+
+    async with bot.db_pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            job_id = await create_notification_job(cursor, thread_id, author_id, update_type,
+                                                   update_text, response_message, total_users, audience)
+        await conn.commit()
+    return job_id
+
+async def flush_digests(bot: "MyBot") -> int:
+    """合并并发送截至目前的所有待发摘要，返回提交的通知任务数"""
+    async with bot.db_pool.acquire() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute("""
+            SELECT p.digest_id, p.thread_id, p.author_id, p.update_type, p.update_url, p.update_message,
+                   t.digest_mode AS thread_digest_mode
+            FROM pending_digests p JOIN managed_threads t ON p.thread_id = t.thread_id
+            ORDER BY p.digest_id
+        """)
+        pending = await cursor.fetchall()
+    if not pending:
+        return 0
+
+    last_digest_id = pending[-1]['digest_id'] # 之后写入的更新留给下一个窗口
+    by_thread = {}
+    for row in pending:
+        by_thread.setdefault(row['thread_id'], []).append(row)
+
+    submitted = 0
+    for thread_id, rows in by_thread.items():
+        try:
+            job_id = await _flush_thread_digest(bot, thread_id, rows, last_digest_id)
+        except Exception as e:
+            print(f"{get_utc8_now_str()}|合并帖子 {thread_id} 的摘要时发生错误: {e}")
+            continue
+        if job_id:
+            bot.fanout_scheduler.submit(job_id)
+            submitted += 1
+    return submitted
@@ -0,0 +1,79 @@
+"""作者关注者的进程内索引：作者 -> 按 follower_id 升序排列的 array('Q')。
+
+发布更新时，收件人中“关注了作者”的部分直接从索引取出，不再每次按 author_id 扫描 author_follows；
+数据库只负责帖子订阅者中没有关注作者的那部分（见 fanout.count_recipients / stream_recipients）。
+订阅关系图（src/graph.py）就绪后收件人改由关系图解析，本索引用于关系图关闭或仍在加载时。
+索引在第一次用到某个作者时加载；本机器人增删关注并提交后调用 follower_index.add / discard 就地修改（写穿）。
+总条目数超过上限时按最近使用淘汰整个作者，被淘汰的作者下次用到时重新加载。
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+import aiomysql
+from src import config
+
+class FollowerIndex:
+    def __init__(self, max_ids: int):
+        self.max_ids = max_ids
+        self._authors: dict[int, array] = {} # 按最近使用排列
+        self.size = 0 # 所有作者的关注者总数
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.version = 0 # 每次写入加一，加载期间发生过写入的结果不放入索引
+
+    def __len__(self):
+        return len(self._authors)
+
+    async def get(self, cursor: aiomysql.Cursor, author_id: int) -> array:
+        """作者的关注者（升序）。返回的数组可能被之后的写入就地修改，长时间使用时请先复制"""
+        followers = self._authors.pop(author_id, None)
+        if followers is not None:
+            self._authors[author_id] = followers
+            self.hits += 1
+            return followers
+        self.misses += 1
+        version = self.version
+        await cursor.execute("SELECT follower_id FROM author_follows WHERE author_id = %s ORDER BY follower_id", (author_id,))
+        followers = array("Q", [row[0] for row in await cursor.fetchall()])
+        if self.version == version and len(followers) <= self.max_ids:
+            self._store(author_id, followers)
+        return followers
+
+    def _store(self, author_id: int, followers: array):
+        self._authors[author_id] = followers
+        self.size += len(followers)
+        while self.size > self.max_ids and len(self._authors) > 1:
+            evicted = self._authors.pop(next(iter(self._authors)))
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def add(self, author_id: int, follower_id: int):
+        self.version += 1
+        followers = self._authors.get(author_id)
+        if followers is None:
+            return
+        position = bisect_left(followers, follower_id)
+        if position == len(followers) or followers[position] != follower_id:
+            followers.insert(position, follower_id)
+            self.size += 1
+
+    def discard(self, author_id: int, follower_id: int):
+        self.version += 1
+        followers = self._authors.get(author_id)
+        if followers is None:
+            return
+        position = bisect_left(followers, follower_id)
+        if position < len(followers) and followers[position] == follower_id:
+            del followers[position]
+            self.size -= 1
+
+    def clear(self):
+        self._authors.clear()
+        self.size = 0
+        self.version += 1
+
+def after(followers: array, user_id: int) -> array:
+    """游标之后的关注者（副本）"""
+    return followers[bisect_right(followers, user_id):]
+
+follower_index = FollowerIndex(config.FOLLOWER_INDEX_MAX_IDS)
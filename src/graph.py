@@ -0,0 +1,403 @@
+"""订阅关系图：帖子 -> 发行版/测试版订阅者、作者 -> 关注者，以及开启了摘要模式的用户，以 CSR（压缩稀疏行）的形式保存在进程内。
+
+每种边由三个 BIGINT UNSIGNED 数组组成：升序的源（帖子或作者）、每个源在目标数组中的起点、按源分段且段内升序的 user_id，
+每条边 8 字节，每个源另占 16 字节。摘要模式的用户按同样的格式保存为源 0 的一段（DIGEST）。
+四种边连同水位线定期写入快照文件；重启时用 mmap 直接映射快照（不逐行解析），
+再从 graph_changes 重放快照之后的变化即可使用。快照不存在、损坏或过旧时从数据库重建一次。
+
+订阅/关注的每次修改都在同一事务内向 graph_changes 写一行修改后的状态（见 thread_change_statement / follow_change_statement），
+解析收件人之前先 catch_up 读取新的变化（通常是一次结果为空的主键范围查询），本进程与其他实例的修改都能看到。
+重放的是状态而不是增量，重复应用没有影响；水位线只越过创建时间早于 CHANGE_SETTLE_SECONDS 的行，
+自增 id 较小、但提交较晚的事务不会被跳过。变化先记在覆盖层中，写快照时合并进新的 CSR。
+收件人按 user_id 升序逐个产出：每个源的邻居本来就是 CSR 中升序的一段，几个源之间用 heapq.merge 归并去重，不构造集合。
+
+用户或帖子被删除时级联删除的订阅/关注不经过 graph_changes（MySQL 的外键级联也不触发触发器）：verify 在同一个一致性快照中
+比较每种边的数量，发现不一致时 rebuild 从数据库重建，后台任务每天核对一次。
+"""
+import asyncio
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
+import mmap
+import os
+import time
+import aiomysql
+from src.config import get_utc8_now_str
+
+RELEASE, TEST, FOLLOW, DIGEST = 0, 1, 2, 3 # 帖子的发行版订阅者、测试版订阅者，作者的关注者，以及源 0 -> 开启了摘要模式的用户
+EDGE_KINDS = (RELEASE, TEST, FOLLOW)
+KINDS = EDGE_KINDS + (DIGEST,)
+CHANGE_SETTLE_SECONDS = 10 # 事务最长持续时间的估计，水位线只越过早于此时的变化
+BUILD_FETCH_SIZE = 10000 # 重建时每次从数据库读取的行数
+
+_MAGIC = int.from_bytes(b"SUBGRPH2", "little") # 文件格式变化时修改
+_HEADER_WORDS = 3 + 2 * len(KINDS) # magic、水位线、快照时间，以及每种边的源数量与边数量
+_EDGE_SQL = {
+    RELEASE: "SELECT thread_id, user_id FROM thread_subscriptions WHERE subscribe_release = TRUE ORDER BY thread_id, user_id",
+    TEST: "SELECT thread_id, user_id FROM thread_subscriptions WHERE subscribe_test = TRUE ORDER BY thread_id, user_id",
+    FOLLOW: "SELECT author_id, follower_id FROM author_follows ORDER BY author_id, follower_id",
+    DIGEST: "SELECT 0, user_id FROM users WHERE digest_mode = TRUE ORDER BY user_id",
+}
+_COUNT_SQL = {
+    RELEASE: "SELECT COUNT(*) FROM thread_subscriptions WHERE subscribe_release = TRUE",
+    TEST: "SELECT COUNT(*) FROM thread_subscriptions WHERE subscribe_test = TRUE",
+    FOLLOW: "SELECT COUNT(*) FROM author_follows",
+    DIGEST: "SELECT COUNT(*) FROM users WHERE digest_mode = TRUE",
+}
+
+def thread_change_statement(user_id: int, thread_id: int) -> tuple[str, tuple]:
+    """订阅开关修改后、同一事务内执行：记下该订阅当前的两个开关"""
+    return (
+        """INSERT INTO graph_changes (kind, source_id, user_id, flags)
+        SELECT 'thread', thread_id, user_id, subscribe_release | subscribe_test << 1 FROM thread_subscriptions WHERE user_id = %s AND thread_id = %s""",
+        (user_id, thread_id)
+    )
+
+def follow_change_statement(follower_id: int, author_id: int) -> tuple[str, tuple]:
+    """关注或取消关注后、同一事务内执行：记下当前是否关注"""
+    return (
+        """INSERT INTO graph_changes (kind, source_id, user_id, flags)
+        SELECT 'author', %s, %s, COUNT(*) FROM author_follows WHERE follower_id = %s AND author_id = %s""",
+        (author_id, follower_id, follower_id, author_id)
+    )
+
+def digest_change_statement(user_id: int) -> tuple[str, tuple]:
+    """切换摘要模式后、同一事务内执行：记下当前是否开启"""
+    return (
+        """INSERT INTO graph_changes (kind, source_id, user_id, flags)
+        SELECT 'digest', 0, user_id, digest_mode FROM users WHERE user_id = %s""",
+        (user_id,)
+    )
+
+class CSRBuilder:
+    """按 (源, user_id) 升序逐条追加边，生成 (keys, offsets, targets)"""
+    def __init__(self):
+        self.keys = array("Q")
+        self.offsets = array("Q")
+        self.targets = array("Q")
+
+    def add(self, source: int, user_id: int):
+        if not self.keys or self.keys[-1] != source:
+            self.keys.append(source)
+            self.offsets.append(len(self.targets))
+        self.targets.append(user_id)
+
+    def extend(self, source: int, user_ids):
+        """追加一个源的全部边（升序）；没有边的源不写入"""
+        if len(user_ids):
+            self.keys.append(source)
+            self.offsets.append(len(self.targets))
+            if isinstance(user_ids, memoryview):
+                self.targets.frombytes(user_ids.tobytes()) # 映射的快照中的一段，按内存整体复制，不逐个转换为 int
+            else:
+                self.targets.extend(user_ids)
+
+    def finish(self) -> tuple:
+        self.offsets.append(len(self.targets))
+        return self.keys, self.offsets, self.targets
+
+_EMPTY = (array("Q"), array("Q", [0]), array("Q"))
+
+def write_snapshot(path: str, base: list[tuple], watermark: int, created_at: int):
+    """先写临时文件再原子替换，已映射旧快照的进程不受影响"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    header = array("Q", [_MAGIC, watermark, created_at])
+    for keys, offsets, targets in base:
+        header.extend((len(keys), len(targets)))
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        for csr in base:
+            for part in csr:
+                f.write(part)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def map_snapshot(path: str) -> tuple[list[tuple], int, int, mmap.mmap]:
+    """映射快照文件，返回 (每种边的 CSR, 水位线, 快照时间, 映射)；CSR 是指向映射内存的 memoryview，不复制数据。
+    不再使用时调用 unmap_snapshot 关闭映射"""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    base = []
+    raw = memoryview(mapped)
+    words = raw.cast("Q")
+    try:
+        if len(words) < _HEADER_WORDS or words[0] != _MAGIC:
+            raise ValueError("不是订阅关系图的快照文件")
+        position = _HEADER_WORDS
+        for kind in KINDS:
+            key_count, edge_count = words[3 + 2 * kind], words[4 + 2 * kind]
+            parts = []
+            for length in (key_count, key_count + 1, edge_count):
+                parts.append(words[position:position + length])
+                position += length
+            base.append(tuple(parts))
+        if position != len(words):
+            raise ValueError("快照文件长度与文件头不符")
+        watermark, created_at = words[1], words[2]
+    except ValueError:
+        unmap_snapshot(base, mapped)
+        raise
+    finally:
+        words.release()
+        raw.release()
+    return base, watermark, created_at, mapped
+
+def unmap_snapshot(base: list[tuple], mapped: mmap.mmap | None):
+    """释放 map_snapshot 返回的 CSR 并关闭映射；仍有调用方持有其中的切片时，映射在切片释放后由垃圾回收关闭"""
+    if mapped is None:
+        return
+    for csr in base:
+        for part in csr:
+            if isinstance(part, memoryview):
+                part.release()
+    try:
+        mapped.close()
+    except BufferError:
+        pass
+
+class SubscriptionGraph:
+    def __init__(self):
+        self._base: list[tuple] = [_EMPTY] * len(KINDS)
+        self._mapped: mmap.mmap | None = None # _base 映射自快照文件时的映射
+        self._delta: list[dict[int, dict[int, bool]]] = [{} for _ in KINDS] # 源 -> {user_id: 是否存在}，与 _base 不同的边
+        self.watermark = 0 # 已连续应用到的 change_id
+        self.snapshot_at = 0 # _base 对应的时间（unix 秒）
+        self.ready = False
+        self.version = 0 # 每次有边发生变化时加一
+        self.replayed = 0 # 水位线累计越过的变化行数
+        self._lock = asyncio.Lock() # 定时任务与发布更新可能同时 catch_up，串行执行，水位线不会后退
+
+    @property
+    def edges(self) -> int:
+        """订阅与关注三种边的总数（覆盖层中的变化未计入）"""
+        return sum(len(self._base[kind][2]) for kind in EDGE_KINDS)
+
+    def count(self, kind: int) -> int:
+        """某种边当前的数量（包括覆盖层中的变化）"""
+        return len(self._base[kind][2]) + sum(1 if present else -1 for overrides in self._delta[kind].values() for present in overrides.values())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(part) * part.itemsize for csr in self._base for part in csr)
+
+    @property
+    def pending_changes(self) -> int:
+        """覆盖层中尚未合并进 CSR 的边"""
+        return sum(len(overrides) for delta in self._delta for overrides in delta.values())
+
+    def _base_range(self, kind: int, source: int) -> tuple[int, int]:
+        keys, offsets, _ = self._base[kind]
+        i = bisect_left(keys, source)
+        if i < len(keys) and keys[i] == source:
+            return offsets[i], offsets[i + 1]
+        return 0, 0
+
+    def _in_base(self, kind: int, source: int, user_id: int) -> bool:
+        lo, hi = self._base_range(kind, source)
+        targets = self._base[kind][2]
+        i = bisect_left(targets, user_id, lo, hi)
+        return i < hi and targets[i] == user_id
+
+    def members(self, kind: int, source: int, after_user_id: int = 0):
+        """源的 user_id 大于 after_user_id 的邻居，升序：没有覆盖层时是 CSR 中的一段，否则与覆盖层中新增的边归并、跳过被删除的边"""
+        lo, hi = self._base_range(kind, source)
+        targets = self._base[kind][2]
+        lo = bisect_right(targets, after_user_id, lo, hi)
+        members = targets[lo:hi]
+        overrides = self._delta[kind].get(source)
+        if not overrides:
+            return members
+        added = sorted(user_id for user_id, present in overrides.items() if present and user_id > after_user_id)
+        return (user_id for user_id in heapq.merge(members, added) if overrides.get(user_id, True))
+
+    def recipients(self, thread_id: int, author_id: int, kinds: tuple[int, ...], after_user_id: int = 0):
+        """帖子在 kinds 中的订阅者 ∪ 作者的关注者，按 user_id 升序逐个产出（去重，只含 user_id 大于 after_user_id 的用户）"""
+        last = None
+        for user_id in heapq.merge(self.members(FOLLOW, author_id, after_user_id),
+                                   *(self.members(kind, thread_id, after_user_id) for kind in kinds)):
+            if user_id != last:
+                yield user_id
+                last = user_id
+
+    def is_digest(self, user_id: int) -> bool:
+        """用户是否开启了摘要模式"""
+        overrides = self._delta[DIGEST].get(0)
+        if overrides and user_id in overrides:
+            return overrides[user_id]
+        return self._in_base(DIGEST, 0, user_id)
+
+    def apply(self, kind: int, source: int, user_id: int, present: bool) -> bool:
+        """把一条边设为存在/不存在，返回是否发生了变化"""
+        in_base = self._in_base(kind, source, user_id)
+        delta = self._delta[kind]
+        overrides = delta.get(source, {})
+        if overrides.get(user_id, in_base) == present:
+            return False
+        if present == in_base:
+            del overrides[user_id]
+            if not overrides:
+                del delta[source]
+        else:
+            delta.setdefault(source, overrides)[user_id] = present
+        self.version += 1
+        return True
+
+    def _replace_base(self, base: list[tuple], mapped: mmap.mmap | None = None):
+        old_base, old_mapped = self._base, self._mapped
+        self._base, self._mapped = base, mapped
+        unmap_snapshot(old_base, old_mapped)
+
+    async def catch_up(self, cursor: aiomysql.Cursor) -> int:
+        """应用水位线之后的变化，返回发生变化的边数"""
+        async with self._lock:
+            return await self._catch_up(cursor)
+
+    async def _catch_up(self, cursor: aiomysql.Cursor) -> int:
+        await cursor.execute(
+            """SELECT change_id, kind, source_id, user_id, flags, created_at < NOW() - INTERVAL %s SECOND
+            FROM graph_changes WHERE change_id > %s ORDER BY change_id""",
+            (CHANGE_SETTLE_SECONDS, self.watermark)
+        )
+        changed = 0
+        settled = True
+        for change_id, kind, source_id, user_id, flags, is_settled in await cursor.fetchall():
+            if kind == "thread":
+                changed += self.apply(RELEASE, source_id, user_id, bool(flags & 1))
+                changed += self.apply(TEST, source_id, user_id, bool(flags & 2))
+            elif kind == "digest":
+                changed += self.apply(DIGEST, 0, user_id, bool(flags & 1))
+            else:
+                changed += self.apply(FOLLOW, source_id, user_id, bool(flags & 1))
+            settled = settled and bool(is_settled)
+            if settled:
+                self.watermark = change_id
+                self.replayed += 1
+        return changed
+
+    def _merged(self) -> list[tuple]:
+        """把覆盖层合并进新的 CSR"""
+        merged = []
+        for kind in KINDS:
+            keys, offsets, targets = self._base[kind]
+            pending = sorted(self._delta[kind])
+            builder = CSRBuilder()
+            j = 0
+            for i, source in enumerate(keys):
+                while j < len(pending) and pending[j] < source:
+                    builder.extend(pending[j], array("Q", self.members(kind, pending[j])))
+                    j += 1
+                if j < len(pending) and pending[j] == source:
+                    builder.extend(source, array("Q", self.members(kind, source)))
+                    j += 1
+                else:
+                    builder.extend(source, targets[offsets[i]:offsets[i + 1]])
+            for source in pending[j:]:
+                builder.extend(source, array("Q", self.members(kind, source)))
+            merged.append(builder.finish())
+        return merged
+
+    async def _build(self, pool: aiomysql.Pool) -> tuple[list[tuple], int]:
+        """从数据库重建 CSR，返回 (CSR, 水位线)；每种边一条按 (源, user_id) 有序的覆盖索引扫描，无缓冲地分批读取。
+        水位线取开始读取前已经稳定的最后一条变化：它之前的变化都已反映在读到的行中，不再重放
+        （重放更早的状态会把之后被级联删除的边加回来）"""
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT change_id FROM graph_changes WHERE created_at < NOW() - INTERVAL %s SECOND ORDER BY change_id DESC LIMIT 1",
+                    (CHANGE_SETTLE_SECONDS,)
+                )
+                row = await cursor.fetchone()
+            await conn.commit()
+        watermark = row[0] if row else 0
+        base = []
+        for kind in KINDS:
+            builder = CSRBuilder()
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.SSCursor) as cursor:
+                    await cursor.execute(_EDGE_SQL[kind])
+                    while rows := await cursor.fetchmany(BUILD_FETCH_SIZE):
+                        for source, user_id in rows:
+                            builder.add(source, user_id)
+                await conn.commit()
+            base.append(builder.finish())
+        return base, watermark
+
+    async def load(self, pool: aiomysql.Pool, path: str, max_age_seconds: int) -> str:
+        """映射快照（或从数据库重建）并重放之后的变化，返回数据来源的说明"""
+        mapped = None
+        try:
+            base, watermark, snapshot_at, mapped = map_snapshot(path)
+            if time.time() - snapshot_at > max_age_seconds:
+                unmap_snapshot(base, mapped)
+                raise ValueError("快照早于 graph_changes 的保留期")
+            origin = "快照"
+        except FileNotFoundError:
+            base = None
+            origin = "数据库（没有快照）"
+        except (OSError, ValueError, TypeError) as e:
+            base = mapped = None
+            origin = f"数据库（快照不可用：{e}）"
+        if base is None:
+            # 重建期间的修改在水位线之后，与之后的变化一起重放，状态会收敛到数据库当前的值
+            snapshot_at = int(time.time())
+            base, watermark = await self._build(pool)
+        await self._install(pool, base, watermark, snapshot_at, mapped)
+        if origin != "快照":
+            await self._save_or_warn(path)
+        return origin
+
+    async def rebuild(self, pool: aiomysql.Pool, path: str):
+        """从数据库重建并写入新快照，用于 verify 发现不一致之后；重建期间收件人仍由当前的关系图解析"""
+        snapshot_at = int(time.time())
+        base, watermark = await self._build(pool)
+        await self._install(pool, base, watermark, snapshot_at)
+        await self._save_or_warn(path)
+
+    async def _install(self, pool: aiomysql.Pool, base: list[tuple], watermark: int, snapshot_at: int, mapped: mmap.mmap | None = None):
+        async with self._lock, pool.acquire() as conn:
+            self._replace_base(base, mapped)
+            self._delta = [{} for _ in KINDS]
+            self.watermark = watermark
+            self.snapshot_at = snapshot_at
+            self.version += 1
+            async with conn.cursor() as cursor:
+                await self._catch_up(cursor)
+            await conn.commit()
+        self.ready = True
+
+    async def _save_or_warn(self, path: str):
+        try:
+            await self.save_snapshot(path)
+        except OSError as e: # 没有快照也能运行，只是下次启动需要重建
+            print(f"{get_utc8_now_str()}|无法写入订阅关系图快照 {path}: {e}")
+
+    async def verify(self, pool: aiomysql.Pool) -> list[int]:
+        """在同一个一致性快照中统计每种边的数量并追上变化，返回与数据库数量不一致的种类。
+        持有锁期间不会有其他 catch_up 应用更新的变化，关系图与统计看到的是同一组已提交的修改；
+        不一致说明有修改没有经过 graph_changes（例如删除用户或帖子时级联删除的订阅/关注）"""
+        async with self._lock, pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+                expected = []
+                for kind in KINDS:
+                    await cursor.execute(_COUNT_SQL[kind])
+                    expected.append((await cursor.fetchone())[0])
+                await self._catch_up(cursor)
+            await conn.commit()
+        return [kind for kind in KINDS if self.count(kind) != expected[kind]]
+
+    async def save_snapshot(self, path: str):
+        """合并覆盖层、写入快照，然后改为映射新快照（堆上只在写入期间保留一份 CSR）"""
+        async with self._lock:
+            base, watermark, snapshot_at = self._merged(), self.watermark, int(time.time())
+            # 覆盖层中水位线之后的变化会在下次启动时重放，合并进来没有影响
+            self._replace_base(base)
+            self._delta, self.snapshot_at = [{} for _ in KINDS], snapshot_at
+        await asyncio.to_thread(write_snapshot, path, base, watermark, snapshot_at)
+        if self._base is base: # 写入期间没有再次保存
+            mapped_base, _, _, mapped = map_snapshot(path)
+            self._replace_base(mapped_base, mapped)
+
+subscription_graph = SubscriptionGraph()
@@ -0,0 +1,71 @@
+"""更新历史：每次 /更新推流 在同一事务中向 update_events 追加一行，managed_threads 上仍只保留最新一次。
+
+update_events 按月 RANGE 分区（分区 pYYYYMM 存放该月的事件，pmax 兜底）。maintain_partitions 提前为当月与之后几个月
+拆出分区；设置了保留期时，整月都过期的分区直接 DROP PARTITION，不必逐行 DELETE。
+某个帖子或作者最近 N 次更新的查询只读 idx_thread_recent / idx_author_recent 两个覆盖索引，不回表（不含正文）。
+"""
+import datetime
+import aiomysql
+
+async def record_update(cursor: aiomysql.Cursor, seq: int, thread_id: int, author_id: int, publisher_id: int,
+                        update_type: str, url: str, message: str):
+    """追加一条更新事件，调用方负责提交"""
+    await cursor.execute(
+        """INSERT INTO update_events (seq, thread_id, author_id, publisher_id, update_type, url, message)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+        (seq, thread_id, author_id, publisher_id, update_type, url, message)
+    )
+
+async def recent_for_thread(cursor: aiomysql.Cursor, thread_id: int, limit: int) -> list[tuple]:
+    """帖子最近的更新：[(seq, update_type, url, created_at)]，新的在前"""
+    await cursor.execute(
+        """SELECT seq, update_type, url, created_at FROM update_events
+        WHERE thread_id = %s ORDER BY seq DESC LIMIT %s""",
+        (thread_id, limit)
+    )
+    return list(await cursor.fetchall())
+
+async def recent_for_author(cursor: aiomysql.Cursor, author_id: int, limit: int) -> list[tuple]:
+    """作者所有帖子最近的更新：[(seq, thread_id, update_type, url, created_at)]，新的在前"""
+    await cursor.execute(
+        """SELECT seq, thread_id, update_type, url, created_at FROM update_events
+        WHERE author_id = %s ORDER BY seq DESC LIMIT %s""",
+        (author_id, limit)
+    )
+    return list(await cursor.fetchall())
+
+# --- 分区维护 ---
+def _add_months(month: datetime.date, count: int) -> datetime.date:
+    years, index = divmod(month.month - 1 + count, 12)
+    return datetime.date(month.year + years, index + 1, 1)
+
+def partition_name(month: datetime.date) -> str:
+    return f"p{month:%Y%m}"
+
+async def maintain_partitions(pool: aiomysql.Pool, months_ahead: int = 3, retention_months: int = 0) -> tuple[list[str], list[str]]:
+    """为当月与之后 months_ahead 个月拆出分区；retention_months > 0 时删除整月都早于保留期的分区。返回 (新建的分区, 删除的分区)"""
+    created, dropped = [], []
+    async with pool.acquire() as conn, conn.cursor() as cursor:
+        await cursor.execute("SELECT CURRENT_DATE()") # created_at 由数据库按自己的时区写入，月份也以数据库为准
+        this_month = (await cursor.fetchone())[0].replace(day=1)
+        await cursor.execute(
+            """SELECT PARTITION_NAME FROM INFORMATION_SCHEMA.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'update_events' ORDER BY PARTITION_ORDINAL_POSITION"""
+        )
+        existing = [row[0] for row in await cursor.fetchall()]
+        await conn.commit()
+
+        # 新分区只能从 pmax 中拆出（pmax 平时为空，拆分几乎没有代价）
+        latest = max((name for name in existing if name != "pmax"), default="")
+        missing = [month for month in (_add_months(this_month, i) for i in range(months_ahead + 1)) if partition_name(month) > latest]
+        if missing:
+            parts = ", ".join(f"PARTITION {partition_name(m)} VALUES LESS THAN ('{_add_months(m, 1):%Y-%m-%d}')" for m in missing)
+            await cursor.execute(f"ALTER TABLE update_events REORGANIZE PARTITION pmax INTO ({parts}, PARTITION pmax VALUES LESS THAN (MAXVALUE))")
+            created = [partition_name(m) for m in missing]
+
+        if retention_months > 0:
+            cutoff = partition_name(_add_months(this_month, -retention_months))
+            dropped = [name for name in existing if name != "pmax" and name < cutoff]
+            if dropped:
+                await cursor.execute(f"ALTER TABLE update_events DROP PARTITION {', '.join(dropped)}")
+    return created, dropped
@@ -0,0 +1,431 @@
+"""版本化的数据库迁移。
+
+每个迁移有固定的版本号和一组 SQL，应用后连同 SQL 的校验和一起记入 schema_version 表。
+机器人启动时只读一次 schema_version，只执行缺失的迁移；已应用的迁移被修改时拒绝启动。
+
+也可以在发布新容器前单独执行：
+
+    docker compose run --rm app python -m src.migrations           # 应用缺失的迁移
+    docker compose run --rm app python -m src.migrations --status  # 只查看状态
+"""
+import argparse
+import asyncio
+import hashlib
+from dataclasses import dataclass
+import aiomysql
+import pymysql
+from src.config import get_utc8_now_str
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: tuple[str, ...]
+    # 引入 schema_version 之前，旧版 setup_database 可能已经做过同样的修改。
+    # 返回 >0 表示已存在，此时只登记版本而不执行（只在应用该迁移时查询一次，不在每次启动时探测）。
+    # 也用于让破坏性的迁移可以安全重试：中途失败后再次启动时，已完成的部分不会重复执行
+    applied_probe: str | None = None
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256("\n;\n".join(s.strip() for s in self.statements).encode("utf-8")).hexdigest()
+
+def _column_probe(table: str, column: str) -> str:
+    return f"""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}' AND COLUMN_NAME = '{column}'
+    """
+
+# --- 迁移列表：只能在末尾追加，已发布的迁移不要修改 ---
+MIGRATIONS: list[Migration] = [
+    Migration(1, "baseline", (
+        # 表1: 用户信息与状态表
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
+            last_checked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            track_new_thread BOOLEAN NOT NULL DEFAULT TRUE
+        )
+        """,
+        # 表2: 被管理的帖子表
+        """
+        CREATE TABLE IF NOT EXISTS managed_threads (
+            thread_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
+            guild_id BIGINT UNSIGNED NOT NULL,
+            author_id BIGINT UNSIGNED NOT NULL,
+            last_update_url VARCHAR(255) DEFAULT NULL,
+            last_update_message TEXT DEFAULT NULL,
+            last_update_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
+            last_update_type ENUM('release', 'test') DEFAULT NULL,
+            FOREIGN KEY (author_id) REFERENCES users(user_id) ON DELETE CASCADE
+        )
+        """,
+        # 表3: 帖子订阅表
+        """
+        CREATE TABLE IF NOT EXISTS thread_subscriptions (
+            subscription_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_id BIGINT UNSIGNED NOT NULL,
+            thread_id BIGINT UNSIGNED NOT NULL,
+            subscribe_release BOOLEAN NOT NULL DEFAULT FALSE,
+            subscribe_test BOOLEAN NOT NULL DEFAULT FALSE,
+            has_new_update BOOLEAN NOT NULL DEFAULT FALSE,
+            UNIQUE KEY unique_subscription (user_id, thread_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (thread_id) REFERENCES managed_threads(thread_id) ON DELETE CASCADE
+        )
+        """,
+        # 表4: 作者关注表
+        """
+        CREATE TABLE IF NOT EXISTS author_follows (
+            follow_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            follower_id BIGINT UNSIGNED NOT NULL,
+            author_id BIGINT UNSIGNED NOT NULL,
+            UNIQUE KEY unique_follow (follower_id, author_id),
+            FOREIGN KEY (follower_id) REFERENCES users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (author_id) REFERENCES users(user_id) ON DELETE CASCADE
+        )
+        """,
+        # 表5: 作者动态通知表
+        """
+        CREATE TABLE IF NOT EXISTS follower_thread_notifications (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            follower_id BIGINT UNSIGNED NOT NULL,
+            thread_id BIGINT UNSIGNED NOT NULL,
+            UNIQUE KEY unique_notification (follower_id, thread_id),
+            FOREIGN KEY (follower_id) REFERENCES users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (thread_id) REFERENCES managed_threads(thread_id) ON DELETE CASCADE
+        )
+        """,
+    )),
+    # 非常早期的 users 表没有 track_new_thread 列
+    Migration(2, "users_track_new_thread", (
+        "ALTER TABLE users ADD COLUMN track_new_thread BOOLEAN NOT NULL DEFAULT TRUE",
+    ), applied_probe=_column_probe("users", "track_new_thread")),
+    # 表6: 帖子单独的权限组
+    Migration(3, "thread_permission_groups", (
+        """
+        ALTER TABLE managed_threads
+            ADD COLUMN thread_permission_group_1 BIGINT UNSIGNED DEFAULT NULL,
+            ADD COLUMN thread_permission_group_2 BIGINT UNSIGNED DEFAULT NULL,
+            ADD COLUMN thread_permission_group_3 BIGINT UNSIGNED DEFAULT NULL,
+            ADD COLUMN thread_permission_group_4 BIGINT UNSIGNED DEFAULT NULL
+        """,
+    ), applied_probe=_column_probe("managed_threads", "thread_permission_group_1")),
+    # 表7: 幽灵提及通知任务表（持久化，可在重启后从游标处续传）
+    Migration(4, "notification_jobs", (
+        """
+        CREATE TABLE IF NOT EXISTS notification_jobs (
+            job_id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            thread_id BIGINT UNSIGNED NOT NULL,
+            author_id BIGINT UNSIGNED NOT NULL,
+            update_type ENUM('release', 'test') NOT NULL,
+            status ENUM('pending', 'running', 'retrying', 'done', 'failed') NOT NULL DEFAULT 'pending',
+            last_error VARCHAR(255) DEFAULT NULL,
+            update_text TEXT NOT NULL,
+            response_channel_id BIGINT UNSIGNED DEFAULT NULL,
+            response_message_id BIGINT UNSIGNED DEFAULT NULL,
+            total_users INT UNSIGNED NOT NULL DEFAULT 0,
+            processed_users INT UNSIGNED NOT NULL DEFAULT 0,
+            last_user_id BIGINT UNSIGNED NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            KEY idx_status (status),
+            FOREIGN KEY (thread_id) REFERENCES managed_threads(thread_id) ON DELETE CASCADE
+        )
+        """,
+    )),
+    # 摘要任务需要 'any' 类型与 audience 列
+    Migration(5, "notification_jobs_audience", (
+        """
+        ALTER TABLE notification_jobs
+            MODIFY COLUMN update_type ENUM('release', 'test', 'any') NOT NULL,
+            ADD COLUMN audience ENUM('all', 'instant', 'digest') NOT NULL DEFAULT 'instant' AFTER update_type
+        """,
+    ), applied_probe=_column_probe("notification_jobs", "audience")),
+    # 表8: 摘要模式，用户与帖子各自的开关
+    Migration(6, "users_digest_mode", (
+        "ALTER TABLE users ADD COLUMN digest_mode BOOLEAN NOT NULL DEFAULT FALSE",
+    ), applied_probe=_column_probe("users", "digest_mode")),
+    Migration(7, "managed_threads_digest_mode", (
+        "ALTER TABLE managed_threads ADD COLUMN digest_mode BOOLEAN NOT NULL DEFAULT FALSE",
+    ), applied_probe=_column_probe("managed_threads", "digest_mode")),
+    # 待合并的更新，每次发布一行，由摘要任务按窗口合并后删除
+    Migration(8, "pending_digests", (
+        """
+        CREATE TABLE IF NOT EXISTS pending_digests (
+            digest_id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            thread_id BIGINT UNSIGNED NOT NULL,
+            author_id BIGINT UNSIGNED NOT NULL,
+            update_type ENUM('release', 'test') NOT NULL,
+            update_url VARCHAR(255) NOT NULL,
+            update_message TEXT DEFAULT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_thread (thread_id, digest_id),
+            FOREIGN KEY (thread_id) REFERENCES managed_threads(thread_id) ON DELETE CASCADE
+        )
+        """,
+    )),
+    # 热点查询的覆盖索引（InnoDB 二级索引隐含主键列）
+    Migration(9, "hot_path_indexes", (
+        # 发布更新：按帖子+订阅类型找订阅者，并以 user_id 作为游标；管理面板：按用户倒序分页
+        """
+        ALTER TABLE thread_subscriptions
+            ADD INDEX idx_thread_release (thread_id, subscribe_release, user_id),
+            ADD INDEX idx_thread_test (thread_id, subscribe_test, user_id),
+            ADD INDEX idx_user_page (user_id, subscription_id, thread_id, subscribe_release, subscribe_test)
+        """,
+        # 发布更新：按作者找关注者；管理面板：按关注者倒序分页
+        """
+        ALTER TABLE author_follows
+            ADD INDEX idx_author_follower (author_id, follower_id),
+            ADD INDEX idx_follower_page (follower_id, follow_id, author_id)
+        """,
+        "ALTER TABLE managed_threads ADD INDEX idx_last_update (last_update_at)",
+        # 摘要模式的收件人过滤：SELECT user_id FROM users WHERE digest_mode = TRUE
+        "ALTER TABLE users ADD INDEX idx_digest_mode (digest_mode)",
+    )),
+    # 未读状态改为“更新序号 + 已读水位线”，发布更新不再逐个写订阅者/关注者的行（见 src/unread.py）
+    # 旧数据的回填：已有的帖子序号记为 1，仍有作者动态未读的帖子记为 2；序号 1、2 为回填保留
+    # （last_update_at 带有 ON UPDATE CURRENT_TIMESTAMP，回填时须显式保留原值）。
+    # 旧的未读标记在迁移 15 中才删除：回填中途失败时旧数据仍在，可以修复后重新回填
+    Migration(10, "update_watermarks", (
+        """
+        CREATE TABLE IF NOT EXISTS update_sequence (
+            seq BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            thread_id BIGINT UNSIGNED NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) AUTO_INCREMENT = 3
+        """,
+        """
+        ALTER TABLE managed_threads
+            ADD COLUMN last_update_seq BIGINT UNSIGNED NOT NULL DEFAULT 0,
+            ADD COLUMN last_release_seq BIGINT UNSIGNED NOT NULL DEFAULT 0,
+            ADD COLUMN last_test_seq BIGINT UNSIGNED NOT NULL DEFAULT 0,
+            ADD INDEX idx_author_seq (author_id, last_update_seq)
+        """,
+        "ALTER TABLE thread_subscriptions ADD COLUMN last_seen_seq BIGINT UNSIGNED NOT NULL DEFAULT 0",
+        "ALTER TABLE author_follows ADD COLUMN last_seen_seq BIGINT UNSIGNED NOT NULL DEFAULT 0",
+        """
+        ALTER TABLE users
+            ADD COLUMN subscriptions_seen_seq BIGINT UNSIGNED NOT NULL DEFAULT 0,
+            ADD COLUMN authors_seen_seq BIGINT UNSIGNED NOT NULL DEFAULT 0
+        """,
+        # 作者动态的单帖已读标记
+        """
+        CREATE TABLE IF NOT EXISTS author_thread_reads (
+            follower_id BIGINT UNSIGNED NOT NULL,
+            thread_id BIGINT UNSIGNED NOT NULL,
+            seen_seq BIGINT UNSIGNED NOT NULL,
+            PRIMARY KEY (follower_id, thread_id),
+            FOREIGN KEY (follower_id) REFERENCES users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (thread_id) REFERENCES managed_threads(thread_id) ON DELETE CASCADE
+        )
+        """,
+        """
+        UPDATE managed_threads SET
+            last_update_at = last_update_at,
+            last_update_seq = IF(thread_id IN (SELECT thread_id FROM follower_thread_notifications), 2, 1),
+            last_release_seq = IF(last_update_type = 'release', 1, 0),
+            last_test_seq = IF(last_update_type = 'test', 1, 0)
+        """,
+        "UPDATE thread_subscriptions SET last_seen_seq = 1 WHERE has_new_update = FALSE",
+        "UPDATE author_follows SET last_seen_seq = 1",
+        # 序号为 2 的帖子：没有通知记录的关注者视为已读
+        """
+        INSERT INTO author_thread_reads (follower_id, thread_id, seen_seq)
+        SELECT af.follower_id, t.thread_id, 2
+        FROM author_follows af JOIN managed_threads t ON t.author_id = af.author_id
+        WHERE t.last_update_seq = 2 AND NOT EXISTS (
+            SELECT 1 FROM follower_thread_notifications f WHERE f.follower_id = af.follower_id AND f.thread_id = t.thread_id
+        )
+        """,
+    )),
+    # 控制面板的未读计数器：首次打开面板时统计，之后增量维护（包括发布更新时）；允许短暂为负，由后台对账修正
+    Migration(11, "unread_counters", (
+        """
+        CREATE TABLE IF NOT EXISTS unread_counters (
+            user_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
+            thread_unread INT NOT NULL DEFAULT 0,
+            author_unread INT NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+        )
+        """,
+    )),
+    # 权限组成员改为单独的表（人数不再受四个槽位限制，鉴权可以走主键），迁移旧槽位中的数据后删除这四列
+    Migration(12, "thread_permissions", (
+        """
+        CREATE TABLE IF NOT EXISTS thread_permissions (
+            thread_id BIGINT UNSIGNED NOT NULL,
+            user_id BIGINT UNSIGNED NOT NULL,
+            added_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (thread_id, user_id),
+            FOREIGN KEY (thread_id) REFERENCES managed_threads(thread_id) ON DELETE CASCADE
+        )
+        """,
+        """
+        INSERT IGNORE INTO thread_permissions (thread_id, user_id)
+        SELECT thread_id, thread_permission_group_1 FROM managed_threads WHERE thread_permission_group_1 IS NOT NULL
+        UNION ALL SELECT thread_id, thread_permission_group_2 FROM managed_threads WHERE thread_permission_group_2 IS NOT NULL
+        UNION ALL SELECT thread_id, thread_permission_group_3 FROM managed_threads WHERE thread_permission_group_3 IS NOT NULL
+        UNION ALL SELECT thread_id, thread_permission_group_4 FROM managed_threads WHERE thread_permission_group_4 IS NOT NULL
+        """,
+        """
+        ALTER TABLE managed_threads
+            DROP COLUMN thread_permission_group_1,
+            DROP COLUMN thread_permission_group_2,
+            DROP COLUMN thread_permission_group_3,
+            DROP COLUMN thread_permission_group_4
+        """,
+    )),
+    # 更新历史：只追加，按月分区（分区表不支持外键），新月份的分区由 history.maintain_partitions 从 pmax 拆出。
+    # 两个覆盖索引服务于“某帖子/某作者最近 N 次更新”；已有帖子的最近一次更新作为第一条历史导入
+    Migration(13, "update_events", (
+        """
+        CREATE TABLE IF NOT EXISTS update_events (
+            event_id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            seq BIGINT UNSIGNED NOT NULL,
+            thread_id BIGINT UNSIGNED NOT NULL,
+            author_id BIGINT UNSIGNED NOT NULL,
+            publisher_id BIGINT UNSIGNED DEFAULT NULL,
+            update_type ENUM('release', 'test') NOT NULL,
+            url VARCHAR(255) NOT NULL,
+            message TEXT,
+            PRIMARY KEY (event_id, created_at),
+            KEY idx_thread_recent (thread_id, seq, update_type, url, created_at),
+            KEY idx_author_recent (author_id, seq, thread_id, update_type, url, created_at)
+        )
+        PARTITION BY RANGE COLUMNS (created_at) (
+            PARTITION pmax VALUES LESS THAN (MAXVALUE)
+        )
+        """,
+        """
+        INSERT INTO update_events (created_at, seq, thread_id, author_id, update_type, url, message)
+        SELECT COALESCE(last_update_at, CURRENT_TIMESTAMP), last_update_seq, thread_id, author_id, last_update_type, last_update_url, last_update_message
+        FROM managed_threads
+        WHERE last_update_url IS NOT NULL AND last_update_type IS NOT NULL
+        """,
+    )),
+    # 订阅关系图的变化日志：订阅/关注/摘要模式的每次修改在同一事务内写入修改后的状态，进程内的关系图据此追上数据库（见 src/graph.py）。
+    # 只按主键范围读取；超过保留期的行由后台数据整理删除
+    Migration(14, "graph_changes", (
+        """
+        CREATE TABLE IF NOT EXISTS graph_changes (
+            change_id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            kind ENUM('thread', 'author', 'digest') NOT NULL,
+            source_id BIGINT UNSIGNED NOT NULL,
+            user_id BIGINT UNSIGNED NOT NULL,
+            flags TINYINT UNSIGNED NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    )),
+    # 迁移 10 回填完成后删除旧的未读标记。先删表再删列：删列之后探测到列已不存在即视为完成
+    Migration(15, "drop_legacy_unread_flags", (
+        "DROP TABLE IF EXISTS follower_thread_notifications",
+        "ALTER TABLE thread_subscriptions DROP COLUMN has_new_update",
+    ), applied_probe=f"SELECT ({_column_probe('thread_subscriptions', 'has_new_update')}) = 0"),
+]
+
+SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT UNSIGNED NOT NULL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+MIGRATION_LOCK = "update_bot_schema_migration"
+MIGRATION_LOCK_TIMEOUT = 300 # 秒，多个容器同时启动时，后来者等待先到者迁移完成
+
+class MigrationError(RuntimeError):
+    pass
+
+async def _applied_versions(cursor: aiomysql.Cursor) -> dict[int, str] | None:
+    """读取已应用的版本 -> 校验和；schema_version 表不存在时返回 None"""
+    try:
+        await cursor.execute("SELECT version, checksum FROM schema_version")
+    except pymysql.err.ProgrammingError as err:
+        if err.args[0] == 1146: # ER_NO_SUCH_TABLE
+            return None
+        raise
+    return {version: checksum for version, checksum in await cursor.fetchall()}
+
+def _missing(applied: dict[int, str]) -> list[Migration]:
+    """校验已应用的迁移，返回尚未应用的迁移"""
+    known = {m.version: m for m in MIGRATIONS}
+    for version, checksum in applied.items():
+        migration = known.get(version)
+        if migration is None:
+            raise MigrationError(f"数据库的 schema 版本 {version} 比当前代码更新，请先升级机器人。")
+        if migration.checksum != checksum:
+            raise MigrationError(f"已应用的迁移 {version}_{migration.name} 被修改过（校验和不一致），请新增迁移而不是修改旧迁移。")
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+async def _apply(conn: aiomysql.Connection, cursor: aiomysql.Cursor, migration: Migration):
+    skipped = False
+    if migration.applied_probe:
+        await cursor.execute(migration.applied_probe)
+        skipped = (await cursor.fetchone())[0] > 0
+    if not skipped:
+        for statement in migration.statements:
+            await cursor.execute(statement)
+    await cursor.execute(
+        "INSERT INTO schema_version (version, name, checksum) VALUES (%s, %s, %s)",
+        (migration.version, migration.name, migration.checksum)
+    )
+    await conn.commit()
+    state = "已存在，仅登记" if skipped else "已应用"
+    print(f"{get_utc8_now_str()}|迁移 {migration.version}_{migration.name} {state}。")
+
+async def migrate(pool: aiomysql.pool.Pool) -> int:
+    """应用所有缺失的迁移，返回本次应用的数量；schema 已是最新时只有一次查询"""
+    async with pool.acquire() as conn, conn.cursor() as cursor:
+        applied = await _applied_versions(cursor)
+        if applied is not None and not _missing(applied):
+            return 0
+
+        # 有迁移要做：加锁后重新读取，避免多个容器重复执行
+        await cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if (await cursor.fetchone())[0] != 1:
+            raise MigrationError("等待迁移锁超时，可能有其他实例正在迁移。")
+        try:
+            await cursor.execute(SCHEMA_VERSION_TABLE)
+            missing = _missing(await _applied_versions(cursor) or {})
+            for migration in missing:
+                await _apply(conn, cursor, migration)
+            return len(missing)
+        finally:
+            await cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            await cursor.fetchone()
+
+async def status(pool: aiomysql.pool.Pool) -> list[tuple[Migration, bool]]:
+    async with pool.acquire() as conn, conn.cursor() as cursor:
+        applied = await _applied_versions(cursor) or {}
+    _missing(applied)
+    return [(m, m.version in applied) for m in MIGRATIONS]
+
+async def _main(args) -> int:
+    from src.database import create_db_pool
+    pool = await create_db_pool()
+    if not pool:
+        return 1
+    try:
+        if args.status:
+            for migration, applied in await status(pool):
+                print(f"{'✅' if applied else '⏳'} {migration.version:>3}_{migration.name}")
+        else:
+            count = await migrate(pool)
+            print(f"共应用 {count} 个迁移，schema 版本: {MIGRATIONS[-1].version}")
+    except MigrationError as err:
+        print(f"迁移失败: {err}")
+        return 1
+    finally:
+        pool.close()
+        await pool.wait_closed()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="应用或查看数据库迁移")
+    parser.add_argument("--status", action="store_true", help="只显示每个迁移是否已应用")
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
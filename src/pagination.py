@@ -0,0 +1,52 @@
+"""键集（seek）分页：按若干列倒序翻页，只记录当前页首尾两行的键。
+
+与 LIMIT/OFFSET 不同，任何深度的翻页都只读取一页的行；翻页之间有项目被删除或标记已读时，
+当前页也不会整体错位。
+"""
+from dataclasses import dataclass
+
+# 翻页动作：first / prev / next / last 对应分页按钮，stay 表示在当前页原地刷新（删除、标记已读之后）
+PAGE_ACTIONS = {"page_first": "first", "page_prev": "prev", "page_next": "next", "page_last": "last"}
+
+@dataclass
+class Seek:
+    where: str    # 追加在 WHERE 之后的条件（以 AND 开头，可能为空）
+    params: tuple
+    order: str    # 每个排序列的方向：DESC，或从另一端读取时的 ASC
+
+def _compare(columns: tuple[str, ...], op: str, key: tuple) -> tuple[str, tuple]:
+    """按列的字典序比较，例如 (a, b) < (x, y) 展开为 a < x OR (a = x AND b < y)，便于使用索引范围扫描"""
+    strict = op[0]
+    clauses, params = [], []
+    for i, column in enumerate(columns):
+        last = i == len(columns) - 1
+        conditions = [f"{c} = %s" for c in columns[:i]] + [f"{column} {op if last else strict} %s"]
+        clauses.append("(" + " AND ".join(conditions) + ")")
+        params += [*key[:i], key[i]]
+    return "AND (" + " OR ".join(clauses) + ")", tuple(params)
+
+class KeysetPager:
+    """按 columns 倒序分页；columns 的组合必须唯一"""
+    def __init__(self, *columns: str):
+        self.columns = columns
+        self.first_key = None
+        self.last_key = None
+
+    def seek(self, action: str) -> Seek:
+        if action == "next" and self.last_key is not None:
+            return Seek(*_compare(self.columns, "<", self.last_key), "DESC")
+        if action == "prev" and self.first_key is not None:
+            return Seek(*_compare(self.columns, ">", self.first_key), "ASC")
+        if action == "stay" and self.first_key is not None:
+            return Seek(*_compare(self.columns, "<=", self.first_key), "DESC")
+        if action == "last":
+            return Seek("", (), "ASC")
+        return Seek("", (), "DESC")
+
+    def land(self, seek: Seek, rows, key_of) -> list:
+        """记录本页首尾两行的键，返回按显示顺序（倒序）排列的行"""
+        rows = list(reversed(rows)) if seek.order == "ASC" else list(rows)
+        if rows:
+            self.first_key = key_of(rows[0])
+            self.last_key = key_of(rows[-1])
+        return rows
@@ -0,0 +1,25 @@
+"""帖子的权限组：帖主与 thread_permissions 中的成员可以发布更新推流，成员人数不受列数限制。
+
+权限组是帖子元数据的一部分：鉴权读 src/threads.py 中缓存的 ThreadInfo.members（见 ThreadInfo.allows），
+没有单独的 ACL 缓存。这里的写操作提交后直接写穿同一个 thread_cache，调用方无需再做什么。
+"""
+import aiomysql
+from src.threads import thread_cache
+
+async def add_member(pool: aiomysql.Pool, thread_id: int, user_id: int) -> bool:
+    """加入权限组并写穿缓存，已是成员时返回 False"""
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("INSERT IGNORE INTO thread_permissions (thread_id, user_id) VALUES (%s, %s)", (thread_id, user_id))
+            added = cursor.rowcount > 0
+        await conn.commit()
+    thread_cache.update_members(thread_id, added=user_id)
+    return added
+
+async def remove_member(pool: aiomysql.Pool, thread_id: int, user_id: int):
+    """移出权限组并写穿缓存"""
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("DELETE FROM thread_permissions WHERE thread_id = %s AND user_id = %s", (thread_id, user_id))
+        await conn.commit()
+    thread_cache.update_members(thread_id, removed=user_id)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+import asyncio
+import discord
+from src.config import get_utc8_now_str
+
+# --- 长任务的状态消息进度回写 ---
+class ProgressReporter:
+    """合并进度更新：距上次编辑满 interval 秒，或进度跨过一个 percent_step 百分比台阶时才编辑状态消息，finish() 总会写入最终状态
+
+    message 只需要支持 `await message.edit(embed=...)`，render(done, total) 返回要显示的 Embed。
+    """
+    def __init__(self, message, render, total: int, done: int = 0, interval: float = 5.0, percent_step: int = 10):
+        self.message = message
+        self.render = render
+        self.total = total
+        self.done = done
+        self.interval = interval
+        self.percent_step = percent_step
+        self.edit_count = 0
+        self._last_flush = None
+        self._last_step = self._step_of(done)
+
+    def _step_of(self, done: int) -> int:
+        if self.total <= 0 or self.percent_step <= 0:
+            return 0
+        return (done * 100 // self.total) // self.percent_step
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    async def update(self, done: int):
+        """记录最新进度，必要时才真正编辑消息"""
+        self.done = done
+        step = self._step_of(done)
+        interval_passed = self._last_flush is None or self._now() - self._last_flush >= self.interval
+        if interval_passed or step > self._last_step:
+            self._last_step = step
+            await self._flush(self.render(self.done, self.total))
+
+    async def advance(self, count: int):
+        await self.update(self.done + count)
+
+    async def finish(self, embed: discord.Embed | None = None):
+        """写入最终状态；不传 embed 时按当前进度渲染"""
+        await self._flush(embed if embed is not None else self.render(self.done, self.total))
+
+    async def _flush(self, embed: discord.Embed):
+        self._last_flush = self._now()
+        if self.message is None:
+            return
+        try:
+            await self.message.edit(embed=embed)
+            self.edit_count += 1
+        except discord.HTTPException as e: # 进度回写失败（消息被删等）不应影响任务本身
+            print(f"{get_utc8_now_str()}|无法更新进度消息: {e}")
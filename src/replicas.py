@@ -0,0 +1,80 @@
+"""读写分离：可选的只读副本连接池，以及按查询选择连接池的 ReadRouter。
+
+写入与发布路径一律使用主库（bot.db_pool）。只读的浏览查询（控制面板计数、管理面板与“查看更新”的翻页、/查看订阅入口）
+通过 bot.db_reads.for_read(user_id) 取得连接池：
+- 没有配置副本、所有副本延迟过大或无法读取延迟时，回到主库；
+- 用户刚刚写入过（wrote 之后 READ_YOUR_WRITES_SECONDS 秒内）时，该用户的读取走主库，保证读到自己的修改；
+- 其余情况在健康的副本之间轮流分配。
+"""
+import time
+import aiomysql
+from src import config, database
+from src.config import get_utc8_now_str
+from src.dbpool import MonitoredPool
+
+class ReadRouter:
+    def __init__(self, primary: MonitoredPool, replicas: dict[str, MonitoredPool], max_lag: int, sticky_seconds: int):
+        self.primary = primary
+        self.replicas = replicas
+        self.lag: dict[str, int | None] = {host: None for host in replicas} # None = 未知或复制未在运行
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self._recent_writes: dict[int, float] = {} # 用户 -> 最近一次写入的时间，按写入先后排列
+        self._turn = 0
+
+    def wrote(self, user_id: int):
+        """记录用户刚刚写入，随后一段时间内该用户的读取走主库"""
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        self._recent_writes.pop(user_id, None)
+        self._recent_writes[user_id] = now
+        for stale_user, written_at in list(self._recent_writes.items()): # 最早的在前，过期的只会出现在开头
+            if now - written_at < self.sticky_seconds:
+                break
+            del self._recent_writes[stale_user]
+
+    def healthy(self) -> list[str]:
+        return [host for host, lag in self.lag.items() if lag is not None and lag <= self.max_lag]
+
+    def for_read(self, user_id: int | None = None) -> MonitoredPool:
+        written_at = self._recent_writes.get(user_id)
+        hosts = self.healthy()
+        if not hosts or (written_at is not None and time.monotonic() - written_at < self.sticky_seconds):
+            self.primary_reads += 1
+            return self.primary
+        self._turn += 1
+        self.replica_reads += 1
+        return self.replicas[hosts[self._turn % len(hosts)]]
+
+    async def check_lag(self):
+        """读取每个副本的复制延迟（秒）；读取失败或复制未运行时记为 None，该副本暂停使用"""
+        for host, pool in self.replicas.items():
+            previous = self.lag[host]
+            try:
+                async with pool.acquire() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute("SHOW REPLICA STATUS")
+                    status = await cursor.fetchone()
+                self.lag[host] = status["Seconds_Behind_Source"] if status else None
+            except Exception as err:
+                print(f"{get_utc8_now_str()}|读取副本 {host} 的复制延迟失败: {err}")
+                self.lag[host] = None
+            now_usable = host in self.healthy()
+            if now_usable != (previous is not None and previous <= self.max_lag):
+                state = "可用" if now_usable else "暂停使用，读取回到主库"
+                print(f"{get_utc8_now_str()}|只读副本 {host} 延迟 {self.lag[host]} 秒，{state}。")
+
+async def create_read_router(primary: MonitoredPool) -> ReadRouter:
+    """为 MYSQL_REPLICA_HOSTS 中的每个副本创建连接池；连不上的副本跳过，不影响启动"""
+    replicas = {}
+    for host in config.MYSQL_REPLICA_HOSTS:
+        pool = await database.create_db_pool(host, max_retries=1)
+        if pool:
+            replicas[host] = pool
+        else:
+            print(f"只读副本 {host} 不可用，已跳过。")
+    router = ReadRouter(primary, replicas, config.REPLICA_MAX_LAG_SECONDS, config.READ_YOUR_WRITES_SECONDS)
+    await router.check_lag()
+    return router
@@ -0,0 +1,51 @@
+""".env 中带 {{宏}} 的文本模板。
+
+启动时（导入 src.config 时）把每个模板切分为 (字面文本, 宏, 转义函数) 的片段列表，渲染时按顺序拼接一次，
+所有宏在同一遍中替换，用户输入中出现的 {{url}} 之类不会被再次展开；需要转义的字段在拼接时先经过转义函数。
+模板中出现未声明的宏时启动即报错，而不是原样留在发出的消息里。
+"""
+import re
+from typing import Callable
+import discord
+
+_MACRO = re.compile(r"\{\{(.*?)\}\}")
+
+def escape_user_text(text: str) -> str:
+    """用户填写的文本：转义 @everyone / @here 与用户、身份组提及；Markdown 保留，作者可以用它排版"""
+    return discord.utils.escape_mentions(text)
+
+class Template:
+    def __init__(self, name: str, source: str | None, fields: tuple[str, ...], escaped: dict[str, Callable[[str], str]] | None = None):
+        if source is None:
+            raise ValueError(f"缺少模板 {name}，请在 .env 中填写")
+        self.name = name
+        self.source = source
+        self.fields = fields
+        escaped = escaped or {}
+
+        # 每个片段：(宏之前的字面文本, 宏名, 转义函数)；末尾的字面文本单独成为没有宏的片段
+        self.parts: list[tuple[str, str | None, Callable[[str], str] | None]] = []
+        position = 0
+        for match in _MACRO.finditer(source):
+            field = match.group(1)
+            if field not in fields:
+                available = ", ".join(f"{{{{{f}}}}}" for f in fields)
+                raise ValueError(f"模板 {name} 中有未知的宏 {match.group(0)}，可用的宏：{available}")
+            self.parts.append((source[position:match.start()], field, escaped.get(field)))
+            position = match.end()
+        self.parts.append((source[position:], None, None))
+        self._field_set = frozenset(fields)
+
+    def render(self, **values) -> str:
+        if values.keys() != self._field_set:
+            raise TypeError(f"模板 {self.name} 需要参数 {', '.join(self.fields)}，实际传入 {', '.join(values)}")
+        chunks = []
+        for literal, field, escape in self.parts:
+            chunks.append(literal)
+            if field is not None:
+                value = values[field]
+                chunks.append(escape(value) if escape else str(value))
+        return "".join(chunks)
+
+    def __repr__(self):
+        return f"Template({self.name!r}, {self.source!r})"
@@ -0,0 +1,129 @@
+"""新帖子提示（“是否为该帖子开启更新推流”）的发送队列：延迟堆 + 多个并发 worker。
+
+on_thread_create 把帖子放入按“可发送时间”排序的堆，调度协程把到期的帖子交给 workers 个 worker 并发发送。
+帖子尚未就绪（Discord 错误 40058）时按指数退避放回堆中，等待期间不占用 worker，其他帖子照常发送；
+超过最大尝试次数或遇到其他错误的帖子记入死信（日志 + 最近几条记录），不再重试。
+队列深度、提示延迟（从收到新帖子到提示发出）与死信可在 /bot 运行状态 中查看。
+"""
+import asyncio
+import collections
+import heapq
+import itertools
+import discord
+from src.config import get_utc8_now_str
+from src.ui import TrackNewThreadView
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import MyBot
+
+THREAD_NOT_READY = 40058 # Discord：帖子刚创建、还不能发送消息
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+class ThreadPromptQueue:
+    """进程内唯一的新帖子提示队列，由 MyBot 持有"""
+    def __init__(self, bot: "MyBot", workers: int, max_attempts: int, retry_base: float, retry_max: float, window: int = 500):
+        self.bot = bot
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.sent = 0
+        self.retries = 0
+        self.dead = 0
+        self.dead_letters = collections.deque(maxlen=10) # 最近的死信：(时间, 帖子 id, 原因)
+        self.recent_latencies = collections.deque(maxlen=window)
+        self.in_flight = 0
+        self._delayed = [] # 堆：(可发送时间, 序号, 帖子, 已尝试次数, 收到帖子的时间)
+        self._ready = asyncio.Queue()
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks.append(asyncio.create_task(self._dispatch_loop()))
+            self._tasks.extend(asyncio.create_task(self._worker()) for _ in range(self.workers))
+
+    def submit(self, thread: discord.Thread):
+        self._schedule(thread, 0.0, 0, asyncio.get_running_loop().time())
+
+    @property
+    def depth(self) -> int:
+        """尚未发出提示的帖子数（包括等待重试与正在发送的）"""
+        return len(self._delayed) + self._ready.qsize() + self.in_flight
+
+    @property
+    def retrying(self) -> int:
+        return len(self._delayed)
+
+    def latency_percentiles(self) -> tuple[float, float]:
+        """最近一批提示的延迟 (p50, p99)，单位秒"""
+        return _percentile(self.recent_latencies, 50), _percentile(self.recent_latencies, 99)
+
+    def _schedule(self, thread: discord.Thread, delay: float, attempt: int, received_at: float):
+        ready_at = asyncio.get_running_loop().time() + delay
+        heapq.heappush(self._delayed, (ready_at, next(self._sequence), thread, attempt, received_at))
+        self._wakeup.set()
+
+    async def _dispatch_loop(self):
+        """把到期的帖子移入就绪队列；堆顶未到期时等到它到期或有新的帖子加入"""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            if not self._delayed:
+                await self._wakeup.wait()
+                continue
+            delay = self._delayed[0][0] - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                    continue # 有帖子加入，重新查看堆顶
+                except asyncio.TimeoutError:
+                    pass # 期间没有帖子加入，堆顶就是到期的那个（定时器可能比堆顶时间略早触发）
+            self._ready.put_nowait(heapq.heappop(self._delayed))
+
+    async def _worker(self):
+        await self.bot.wait_until_ready()
+        while True:
+            _, _, thread, attempt, received_at = await self._ready.get()
+            self.in_flight += 1
+            try:
+                await self._prompt(thread, attempt, received_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._dead_letter(thread, f"发送消息失败: {e}")
+            finally:
+                self.in_flight -= 1
+
+    async def _prompt(self, thread: discord.Thread, attempt: int, received_at: float):
+        bot = self.bot
+        thread_url = f"https://discord.com/channels/{thread.guild.id}/{thread.id}"
+        text = bot.TRACK_NEW_THREAD_EMBED_TEXT.render(author=f"<@{thread.owner_id}>", thread_url=thread_url)
+        embed = discord.Embed(title=bot.TRACK_NEW_THREAD_EMBED_TITLE, description=text, color=discord.Color.blue())
+        embed.set_footer(text=f"✅已发送 | At {get_utc8_now_str()}")
+        try:
+            await thread.send(embed=embed, view=TrackNewThreadView())
+        except discord.Forbidden as e:
+            if e.code != THREAD_NOT_READY:
+                self._dead_letter(thread, f"未处理的权限错误: {e}")
+            elif attempt + 1 >= self.max_attempts:
+                self._dead_letter(thread, f"{self.max_attempts} 次尝试后仍未就绪 (Error {THREAD_NOT_READY})")
+            else:
+                delay = min(self.retry_max, self.retry_base * 2 ** attempt)
+                self.retries += 1
+                print(f"{get_utc8_now_str()}|⏳ 帖子 {thread.id} 未就绪 (Error {THREAD_NOT_READY})，将在 {delay:g} 秒后重试... (尝试 {attempt + 2}/{self.max_attempts})")
+                self._schedule(thread, delay, attempt + 1, received_at)
+            return
+        latency = asyncio.get_running_loop().time() - received_at
+        self.sent += 1
+        self.recent_latencies.append(latency)
+        print(f"{get_utc8_now_str()}|✅ 成功向帖子 '{thread.name}' (ID: {thread.id}) 发送消息，距收到新帖子 {latency:.1f} 秒。")
+
+    def _dead_letter(self, thread: discord.Thread, reason: str):
+        self.dead += 1
+        self.dead_letters.append((get_utc8_now_str(), thread.id, reason))
+        print(f"{get_utc8_now_str()}|❌ 放弃向帖子 {thread.id} 发送提示：{reason}")
@@ -0,0 +1,142 @@
+"""帖子元数据缓存：是否开启了更新推流、帖主、摘要模式、权限组成员与最近一次更新。
+
+帖子相关的指令（/查看订阅入口、/创建更新推流、/更新推流、/管理当前帖子权限组、新帖子的“是”按钮）先查进程内缓存，
+未命中时一次查询读出整行并缓存；“未开启推流”同样缓存，开启推流的两处入口写入后直接放入新条目。
+本机器人写 managed_threads 并提交后，用 thread_cache.update 就地修改缓存的条目（写穿）；权限组的写入由 src/permissions.py
+提交后调用 update_members 写穿。因此缓存与数据库保持一致，无需等待过期。
+这是帖子权限（ACL）唯一的缓存：ThreadInfo 在帖主、摘要模式与成员之外加上了最近一次更新，淘汰的做法不变。
+未命中时的加载与写穿可能交错：每个正在加载的帖子记一个写入次数，加载期间该帖子被写过的结果不放入缓存，其他帖子的写入互不影响。
+"""
+from dataclasses import dataclass, replace
+import datetime
+import aiomysql
+from src import config
+
+@dataclass(frozen=True)
+class ThreadInfo:
+    author_id: int
+    digest_mode: bool
+    members: tuple[int, ...] # 权限组成员（不含帖主），按加入顺序
+    last_update_url: str | None = None
+    last_update_message: str | None = None
+    last_update_at: datetime.datetime | None = None
+    last_update_type: str | None = None
+
+    def allows(self, user_id: int) -> bool:
+        """帖主与权限组成员可以发布更新推流"""
+        return user_id == self.author_id or user_id in self.members
+
+MISS = object() # ThreadCache.get 未命中；None 表示已知该帖子未开启推流
+
+class ThreadCache:
+    """帖子 -> ThreadInfo | None，容量有限，按最近使用淘汰（与 KnownUserCache 相同，用 dict 的插入顺序实现 LRU）"""
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: dict[int, ThreadInfo | None] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._loads: dict[int, list[int]] = {} # 正在加载的帖子 -> [加载中的读取数, 加载开始以来的写入次数]
+        self._epoch = 0 # clear() 时加一，之前开始的加载全部作废
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, thread_id: int):
+        info = self._entries.pop(thread_id, MISS)
+        if info is MISS:
+            self.misses += 1
+            return MISS
+        self._entries[thread_id] = info
+        self.hits += 1
+        return info
+
+    def begin_load(self, thread_id: int) -> tuple[int, int]:
+        """未命中、开始从数据库加载前调用，返回交给 finish_load 的标记"""
+        load = self._loads.setdefault(thread_id, [0, 0])
+        load[0] += 1
+        return self._epoch, load[1]
+
+    def finish_load(self, thread_id: int, token: tuple[int, int], info=MISS):
+        """加载结束（包括出错）后调用；加载期间该帖子没有被写过时放入 info，info 为 MISS 时只结束加载"""
+        load = self._loads[thread_id]
+        load[0] -= 1
+        if info is not MISS and token == (self._epoch, load[1]):
+            self.store(thread_id, info)
+        if load[0] == 0:
+            del self._loads[thread_id]
+
+    def _written(self, thread_id: int):
+        load = self._loads.get(thread_id)
+        if load is not None:
+            load[1] += 1
+
+    def put(self, thread_id: int, info: ThreadInfo | None):
+        """写穿：本机器人写入后直接放入新条目"""
+        self._written(thread_id)
+        self.store(thread_id, info)
+
+    def store(self, thread_id: int, info: ThreadInfo | None):
+        """放入从数据库读到的条目"""
+        if self.capacity <= 0:
+            return
+        self._entries.pop(thread_id, None)
+        self._entries[thread_id] = info
+        if len(self._entries) > self.capacity:
+            del self._entries[next(iter(self._entries))]
+            self.evictions += 1
+
+    def update(self, thread_id: int, **changes):
+        """写穿：修改已缓存的条目；未缓存（或缓存为未开启推流）时丢弃，下次读取时重新加载"""
+        self._written(thread_id)
+        info = self._entries.get(thread_id)
+        if info is not None:
+            self._entries[thread_id] = replace(info, **changes)
+        else:
+            self._entries.pop(thread_id, None)
+
+    def update_members(self, thread_id: int, *, added: int | None = None, removed: int | None = None):
+        """写穿权限组的变化，基于缓存中的成员名单（而不是某个面板上可能过时的名单）"""
+        info = self._entries.get(thread_id)
+        members = tuple(m for m in (info.members if info else ()) if m != removed)
+        if added is not None and added not in members:
+            members += (added,)
+        self.update(thread_id, members=members)
+
+    def clear(self):
+        self._entries.clear()
+        self._epoch += 1
+
+thread_cache = ThreadCache(config.THREAD_CACHE_SIZE)
+
+async def load_thread(cursor: aiomysql.Cursor, thread_id: int) -> ThreadInfo | None:
+    """一次查询读出帖子的一行与权限组成员；帖子未开启更新推流时返回 None"""
+    await cursor.execute(
+        """SELECT t.author_id, t.digest_mode, t.last_update_url, t.last_update_message, t.last_update_at, t.last_update_type, p.user_id
+        FROM managed_threads t LEFT JOIN thread_permissions p ON p.thread_id = t.thread_id
+        WHERE t.thread_id = %s
+        ORDER BY p.added_at, p.user_id""",
+        (thread_id,)
+    )
+    rows = await cursor.fetchall()
+    if not rows:
+        return None
+    author_id, digest_mode, url, message, updated_at, update_type, _ = rows[0]
+    members = tuple(row[6] for row in rows if row[6] is not None)
+    return ThreadInfo(author_id, bool(digest_mode), members, url, message, updated_at, update_type)
+
+async def get_thread(pool: aiomysql.Pool, thread_id: int) -> ThreadInfo | None:
+    """先查缓存，未命中时从 pool 借一个连接加载并缓存"""
+    info = thread_cache.get(thread_id)
+    if info is MISS:
+        token = thread_cache.begin_load(thread_id)
+        loaded = MISS
+        try:
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    info = await load_thread(cursor, thread_id)
+                await conn.commit() # 结束只读事务，否则连接归还时会被关闭
+            loaded = info
+        finally:
+            thread_cache.finish_load(thread_id, token, loaded)
+    return info
@@ -1,8 +1,13 @@
 from __future__ import annotations
 import discord
 from discord import ui
-import aiomysql
-from src.database import check_and_create_user
+from src.database import check_and_create_user, commit_batch, ensure_user_statements, known_users
+from src import unread
+from src.permissions import add_member, remove_member
+from src.threads import ThreadInfo, get_thread, thread_cache
+from src.followers import follower_index
+from src.graph import digest_change_statement, follow_change_statement, thread_change_statement
+from src.pagination import PAGE_ACTIONS, KeysetPager
 from src.config import get_utc8_now_str
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -22,28 +27,35 @@ class SubscriptionView(ui.View):
         new_status = None
         await interaction.response.defer()
 
-        await check_and_create_user(bot.db_pool,user_id)
-
         try:
-            async with bot.db_pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    toggle_sql = """
-                INSERT INTO thread_subscriptions (user_id, thread_id, subscribe_release)
-                VALUES (%s, %s, TRUE)
-                ON DUPLICATE KEY UPDATE subscribe_release = NOT subscribe_release;
-                """
-                    await cursor.execute(toggle_sql, (user_id, thread_id))
-                    select_sql = "SELECT subscribe_release FROM thread_subscriptions WHERE user_id = %s AND thread_id = %s"
-                    await cursor.execute(select_sql, (user_id, thread_id))    
-                    result = await cursor.fetchone()
-                    if result:
-                        new_status = bool(result[0])
-                await conn.commit()
+            async with bot.batch_pool.acquire() as conn:
+                # 新订阅（或全部取消后重新订阅）从帖子当前的序号开始计算未读
+                toggle_sql = """
+            INSERT INTO thread_subscriptions (user_id, thread_id, subscribe_release, last_seen_seq)
+            SELECT %s, thread_id, TRUE, last_update_seq FROM managed_threads WHERE thread_id = %s
+            ON DUPLICATE KEY UPDATE
+                last_seen_seq = IF(subscribe_release OR subscribe_test, thread_subscriptions.last_seen_seq, managed_threads.last_update_seq),
+                subscribe_release = NOT subscribe_release;
+            """
+                select_sql = "SELECT subscribe_release FROM thread_subscriptions WHERE user_id = %s AND thread_id = %s"
+                # 建用户、切换、维护未读计数与读回新状态合并为一次往返，成功后提交，出错时回滚
+                before, after = unread.tracking_statements(user_id, thread_ids=[thread_id])
+                results = await commit_batch(conn, [
+                    *ensure_user_statements(user_id),
+                    before,
+                    (toggle_sql, (user_id, thread_id)),
+                    thread_change_statement(user_id, thread_id),
+                    after,
+                    (select_sql, (user_id, thread_id)),
+                ])
+                known_users.add(user_id)
+                bot.db_reads.wrote(user_id)
+                if results[-1]:
+                    new_status = bool(results[-1][0][0])
 
         except Exception as err:
             print(f"数据库错误于[subscribe_release_button]: {err}")
-            if not interaction.response.is_done():
-                await interaction.followup.send(f"❌ SQL_Error:{err}\n数据库操作失败，请稍后再试", ephemeral=True)
+            await interaction.followup.send(f"❌ SQL_Error:{err}\n数据库操作失败，请稍后再试", ephemeral=True)
             return  
 
         if new_status is True:
@@ -62,29 +74,34 @@ class SubscriptionView(ui.View):
         thread_id = interaction.channel.id
         new_status = None
         await interaction.response.defer()
-        
-        await check_and_create_user(bot.db_pool,user_id)
 
         try:
-            async with bot.db_pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    toggle_sql = """
-                INSERT INTO thread_subscriptions (user_id, thread_id, subscribe_test)
-                VALUES (%s, %s, TRUE)
-                ON DUPLICATE KEY UPDATE subscribe_test = NOT subscribe_test;  
+            async with bot.batch_pool.acquire() as conn:
+                toggle_sql = """
+            INSERT INTO thread_subscriptions (user_id, thread_id, subscribe_test, last_seen_seq)
+            SELECT %s, thread_id, TRUE, last_update_seq FROM managed_threads WHERE thread_id = %s
+            ON DUPLICATE KEY UPDATE
+                last_seen_seq = IF(subscribe_release OR subscribe_test, thread_subscriptions.last_seen_seq, managed_threads.last_update_seq),
+                subscribe_test = NOT subscribe_test;  
             """
-                    await cursor.execute(toggle_sql, (user_id, thread_id))
-                    select_sql = "SELECT subscribe_test FROM thread_subscriptions WHERE user_id = %s AND thread_id = %s"
-                    await cursor.execute(select_sql, (user_id, thread_id))
-                    result = await cursor.fetchone()
-                    if result:
-                        new_status = bool(result[0])
-                await conn.commit()
+                select_sql = "SELECT subscribe_test FROM thread_subscriptions WHERE user_id = %s AND thread_id = %s"
+                before, after = unread.tracking_statements(user_id, thread_ids=[thread_id])
+                results = await commit_batch(conn, [
+                    *ensure_user_statements(user_id),
+                    before,
+                    (toggle_sql, (user_id, thread_id)),
+                    thread_change_statement(user_id, thread_id),
+                    after,
+                    (select_sql, (user_id, thread_id)),
+                ])
+                known_users.add(user_id)
+                bot.db_reads.wrote(user_id)
+                if results[-1]:
+                    new_status = bool(results[-1][0][0])
 
         except Exception as err:
             print(f"数据库错误于[subscribe_test_button]: {err}")
-            if not interaction.response.is_done():
-                await interaction.followup.send(f"❌ SQL_Error:{err}\n数据库操作失败，请稍后再试", ephemeral=True)
+            await interaction.followup.send(f"❌ SQL_Error:{err}\n数据库操作失败，请稍后再试", ephemeral=True)
             return
 
         if new_status is True:
@@ -105,29 +122,33 @@ class SubscriptionView(ui.View):
             return
         author_id = interaction.channel.owner_id 
         new_status = None
-        await check_and_create_user(bot.db_pool,user_id) #因为有交互作者肯定在DB中，只考虑交互者的情况
 
         try:
-            async with bot.db_pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    insert_sql = "INSERT INTO author_follows (follower_id, author_id) VALUES (%s, %s)"# 插入关注记录
-                    try:
-                        await cursor.execute(insert_sql, (user_id, author_id))
-                        new_status = True  # 成功插入，表示关注成功
-                    except aiomysql.IntegrityError as err:
-                        if err.args[0] == 1062:
-                    # 如果是重复键错误，表示已经关注了，开始删除
-                            delete_sql = "DELETE FROM author_follows WHERE follower_id = %s AND author_id = %s"
-                            await cursor.execute(delete_sql, (user_id, author_id))
-                            new_status = False  # 成功删除，表示取消关注
-                        else:
-                            raise err
-                await conn.commit()
+            async with bot.batch_pool.acquire() as conn:
+                # 已关注则删除，否则插入关注记录（关注之前的动态视为已读）；因为有交互作者肯定在DB中，只需为交互者建用户
+                before, after = unread.tracking_statements(user_id, author_ids=[author_id])
+                results = await commit_batch(conn, [
+                    *ensure_user_statements(user_id),
+                    before,
+                    ("SET @was_following = (SELECT COUNT(*) FROM author_follows WHERE follower_id = %s AND author_id = %s)", (user_id, author_id)),
+                    ("DELETE FROM author_follows WHERE follower_id = %s AND author_id = %s AND @was_following > 0", (user_id, author_id)),
+                    ("INSERT INTO author_follows (follower_id, author_id, last_seen_seq) SELECT %s, %s, COALESCE(MAX(seq), 0) FROM update_sequence HAVING @was_following = 0",
+                     (user_id, author_id)),
+                    follow_change_statement(user_id, author_id),
+                    after,
+                    ("SELECT @was_following = 0", None),
+                ])
+                known_users.add(user_id)
+                bot.db_reads.wrote(user_id)
+                new_status = bool(results[-1][0][0])
+                if new_status:
+                    follower_index.add(author_id, user_id)
+                else:
+                    follower_index.discard(author_id, user_id)
 
         except Exception as err:
             print(f"数据库错误于[follow_author_button]: {err}")
-            if not interaction.response.is_done():
-                await interaction.followup.send(f"❌ SQL_Error:{err}\n数据库操作失败，请稍后再试", ephemeral=True)
+            await interaction.followup.send(f"❌ SQL_Error:{err}\n数据库操作失败，请稍后再试", ephemeral=True)
             return
 
         if new_status is True:
@@ -150,6 +171,7 @@ class ManagementPaginatorView(ui.View):
         
         self.current_page = 0
         self.total_pages = max(0, (self.total_item_count - 1) // self.bot.UPDATES_PER_PAGE)
+        self.pager = KeysetPager("subscription_id" if item_type == 'thread' else "follow_id")
         
         self._create_components()
 
@@ -170,33 +192,42 @@ class ManagementPaginatorView(ui.View):
         self.last_page_button = ui.Button(label="»", style=discord.ButtonStyle.secondary, row=2, custom_id="page_last")
         self.last_page_button.callback = self.page_callback
 
-    async def _fetch_page_data(self): #根据页码从数据库仅获取当前页的数据
-        
-        limit = self.bot.UPDATES_PER_PAGE
-        offset = self.current_page * limit
-        
+    async def _fetch_page_data(self, action: str = "first"): #按键集分页只获取当前页的数据，翻到任意深度的代价都相同
+        per_page = self.bot.UPDATES_PER_PAGE
+        limit = self.total_item_count - self.total_pages * per_page if action == "last" else per_page
+        seek = self.pager.seek(action)
         try:
-            async with self.bot.db_pool.acquire() as conn, conn.cursor() as cursor:
+            async with self.bot.db_reads.for_read(self.user_id).acquire() as conn, conn.cursor() as cursor:
                 if self.item_type == 'thread':
-                    sql = """
+                    sql = f"""
                         SELECT subscription_id, thread_id, subscribe_release, subscribe_test
                         FROM thread_subscriptions
-                        WHERE user_id = %s AND (subscribe_release = TRUE OR subscribe_test = TRUE)
-                        ORDER BY subscription_id DESC
-                        LIMIT %s OFFSET %s
+                        WHERE user_id = %s AND (subscribe_release = TRUE OR subscribe_test = TRUE) {seek.where}
+                        ORDER BY subscription_id {seek.order}
+                        LIMIT %s
                     """
-                    await cursor.execute(sql, (self.user_id, limit, offset))
+                    await cursor.execute(sql, (self.user_id, *seek.params, max(1, limit)))
                 else: # author
-                    sql = """
+                    sql = f"""
                         SELECT follow_id, author_id FROM author_follows
-                        WHERE follower_id = %s ORDER BY follow_id DESC
-                        LIMIT %s OFFSET %s
+                        WHERE follower_id = %s {seek.where} ORDER BY follow_id {seek.order}
+                        LIMIT %s
                     """
-                    await cursor.execute(sql, (self.user_id, limit, offset))
-                self.current_page_items = await cursor.fetchall()
+                    await cursor.execute(sql, (self.user_id, *seek.params, max(1, limit)))
+                self.current_page_items = self.pager.land(seek, await cursor.fetchall(), lambda item: (item[0],))
+                await conn.commit()
         except Exception as e:
             print(f"Error fetching management page data: {e}")
             self.current_page_items = []
+            return
+
+        # 翻页期间前面的项目被取消时，上一页可能不满一页，或当前页已经没有项目：分别回到第一页/最后一页
+        if action == "prev" and len(self.current_page_items) < per_page:
+            self.current_page = 0
+            await self._fetch_page_data("first")
+        elif action == "stay" and not self.current_page_items and self.total_item_count:
+            self.current_page = self.total_pages
+            await self._fetch_page_data("last")
 
     def create_embed(self):
         if not self.total_item_count:
@@ -290,21 +321,41 @@ class ManagementPaginatorView(ui.View):
 
         try:
             async with self.bot.db_pool.acquire() as conn, conn.cursor() as cursor:
+                unfollowed_authors = []
+                params = tuple(ids_to_process) + (self.user_id,)
                 if self.item_type == 'thread':
-                    sql = f"UPDATE thread_subscriptions SET subscribe_release = FALSE, subscribe_test = FALSE WHERE subscription_id IN ({','.join(['%s']*len(ids_to_process))}) AND user_id = %s"
+                    # 先记下涉及的帖子，计数器只按这些帖子修改前后的差值维护
+                    await cursor.execute(f"SELECT thread_id FROM thread_subscriptions WHERE subscription_id IN ({','.join(['%s']*len(ids_to_process))}) AND user_id = %s",
+                                         params)
+                    thread_ids = [row[0] for row in await cursor.fetchall()]
+                    if thread_ids:
+                        async with unread.tracking(cursor, self.user_id, thread_ids=thread_ids):
+                            sql = f"UPDATE thread_subscriptions SET subscribe_release = FALSE, subscribe_test = FALSE WHERE subscription_id IN ({','.join(['%s']*len(ids_to_process))}) AND user_id = %s"
+                            await cursor.execute(sql, params)
+                        await cursor.execute(f"""INSERT INTO graph_changes (kind, source_id, user_id, flags)
+                            SELECT 'thread', thread_id, user_id, 0 FROM thread_subscriptions WHERE subscription_id IN ({','.join(['%s']*len(ids_to_process))}) AND user_id = %s""",
+                                             params)
                 else:
-                    sql = f"DELETE FROM author_follows WHERE follow_id IN ({','.join(['%s']*len(ids_to_process))}) AND follower_id = %s"
-                
-                params = tuple(ids_to_process) + (self.user_id,)
-                await cursor.execute(sql, params)
+                    # 先记下被取消关注的作者，提交后从关注者索引中移除
+                    await cursor.execute(f"SELECT author_id FROM author_follows WHERE follow_id IN ({','.join(['%s']*len(ids_to_process))}) AND follower_id = %s",
+                                         params)
+                    unfollowed_authors = [row[0] for row in await cursor.fetchall()]
+                    if unfollowed_authors:
+                        async with unread.tracking(cursor, self.user_id, author_ids=unfollowed_authors):
+                            await cursor.execute(f"DELETE FROM author_follows WHERE follow_id IN ({','.join(['%s']*len(ids_to_process))}) AND follower_id = %s", params)
+                        await cursor.executemany("INSERT INTO graph_changes (kind, source_id, user_id, flags) VALUES ('author', %s, %s, 0)",
+                                                 [(author_id, self.user_id) for author_id in unfollowed_authors])
                 await conn.commit()
+            for author_id in unfollowed_authors:
+                follower_index.discard(author_id, self.user_id)
+            self.bot.db_reads.wrote(self.user_id) # 随后的翻页从主库读取，看到取消后的结果
 
             self.total_item_count -= len(ids_to_process)
             self.total_pages = max(0, (self.total_item_count - 1) // self.bot.UPDATES_PER_PAGE)
             if self.current_page > self.total_pages:
                 self.current_page = self.total_pages
             self.select_menu.values.clear()
-            await self._fetch_page_data()
+            await self._fetch_page_data("stay")
             self.update_view()
             embed = self.create_embed()
             await interaction.edit_original_response(embed=embed, view=self)
@@ -315,6 +366,7 @@ class ManagementPaginatorView(ui.View):
 
     async def page_callback(self, interaction: discord.Interaction):
         custom_id = interaction.data['custom_id']
+        action = PAGE_ACTIONS[custom_id]
         
         if custom_id == 'page_first':
             self.current_page = 0
@@ -324,9 +376,11 @@ class ManagementPaginatorView(ui.View):
             self.current_page = min(self.total_pages, self.current_page + 1)
         elif custom_id == 'page_last':
             self.current_page = self.total_pages
+        if self.current_page == 0:
+            action = "first"
         
         await interaction.response.defer() # 翻页操作需要defer
-        await self._fetch_page_data()
+        await self._fetch_page_data(action)
         self.update_view()
         embed = self.create_embed()
         await interaction.edit_original_response(embed=embed, view=self)
@@ -346,6 +400,7 @@ class UpdatesPaginatorView(ui.View):
         self.current_view_state = "initial"
         self.current_page = 0
         self.total_pages = 0
+        self.pager = KeysetPager("last_update_seq", "thread_id")
         
         self._create_components()
         self.update_view()
@@ -377,54 +432,43 @@ class UpdatesPaginatorView(ui.View):
         self.back_button = ui.Button(label="返回", style=discord.ButtonStyle.grey, emoji="↩️", row=3, custom_id="go_back")
         self.back_button.callback = self.go_back_callback
 
-    async def _fetch_page_data(self): #从数据库中只获取当前页所需的数据
+    async def _fetch_page_data(self, action: str = "first"): #按键集分页只获取当前页所需的数据
         if self.current_view_state == "initial":
             self.current_page_items = []
             return
 
-        limit = self.bot.UPDATES_PER_PAGE
-        offset = self.current_page * limit
+        per_page = self.bot.UPDATES_PER_PAGE
+        total = self.thread_updates_count if self.current_view_state == 'threads' else self.author_updates_count
+        limit = max(1, total - max(0, (total - 1) // per_page) * per_page) if action == "last" else per_page
+        seek = self.pager.seek(action)
         try:
-            async with self.bot.db_pool.acquire() as conn, conn.cursor() as cursor:
-                if self.current_view_state == 'threads':
-                    await cursor.execute("SELECT author_id FROM author_follows WHERE follower_id = %s", (self.user_id,))
-                    followed_author_ids = {row[0] for row in await cursor.fetchall()}
-                    
-                    sql = """
-                        SELECT t.thread_id, t.author_id, t.last_update_type, t.last_update_url, t.last_update_message, t.last_update_at
-                        FROM thread_subscriptions ts JOIN managed_threads t ON ts.thread_id = t.thread_id
-                        WHERE ts.user_id = %s AND ts.has_new_update = TRUE AND (
-                            (ts.subscribe_release = TRUE AND t.last_update_type = 'release') OR
-                            (ts.subscribe_test = TRUE AND t.last_update_type = 'test')
-                        )
-                        ORDER BY t.last_update_at DESC
-                        LIMIT %s OFFSET %s
-                    """
-                    await cursor.execute(sql, (self.user_id, limit, offset))
-                    raw_updates = await cursor.fetchall()
-                    
-                    processed_updates = []
-                    for update in raw_updates:
-                        is_followed = update[1] in followed_author_ids
-                        processed_updates.append(update + (is_followed,))
-                    self.current_page_items = processed_updates
-
-                elif self.current_view_state == 'authors':
-                    sql = """
-                        SELECT t.thread_id, t.author_id, t.last_update_url, t.last_update_at
-                        FROM follower_thread_notifications ftn JOIN managed_threads t ON ftn.thread_id = t.thread_id
-                        WHERE ftn.follower_id = %s AND ftn.thread_id NOT IN (
-                            SELECT ts.thread_id FROM thread_subscriptions ts JOIN managed_threads t ON ts.thread_id = t.thread_id
-                            WHERE ts.user_id = %s AND ts.has_new_update = TRUE
-                        )
-                        ORDER BY t.last_update_at DESC
-                        LIMIT %s OFFSET %s
-                    """
-                    await cursor.execute(sql, (self.user_id, self.user_id, limit, offset))
-                    self.current_page_items = await cursor.fetchall()
+            pool = self.bot.db_reads.for_read(self.user_id)
+            async with pool.acquire() as conn, conn.cursor() as cursor:
+                # 两个计数与本页数据来自同一条语句；计数与面板计数器不一致时顺便修正计数器
+                thread_count, author_count, rows = await unread.fetch_update_page(cursor, self.user_id, self.current_view_state, seek, limit)
+                if thread_count is None: thread_count = self.thread_updates_count
+                if author_count is None: author_count = self.author_updates_count
+                if (thread_count, author_count) != (self.thread_updates_count, self.author_updates_count):
+                    self.thread_updates_count, self.author_updates_count = thread_count, author_count
+                    if pool is self.bot.db_pool: # 只读副本上的快照可能落后于主库，只用主库的结果修正计数器
+                        await unread.correct_counts(cursor, self.user_id, thread_count, author_count)
+                await conn.commit()
+            key_index = 6 if self.current_view_state == 'threads' else 4
+            self.current_page_items = self.pager.land(seek, rows, lambda update: (update[key_index], update[0]))
         except Exception as e:
             print(f"Error fetching page data: {e}")
             self.current_page_items = []
+            return
+
+        # 与管理面板相同：上一页不满一页时回到第一页，当前页被全部标记已读时回到最后一页
+        if action == "prev" and len(self.current_page_items) < per_page:
+            self.current_page = 0
+            await self._fetch_page_data("first")
+        elif action == "stay" and not self.current_page_items:
+            total = self.thread_updates_count if self.current_view_state == 'threads' else self.author_updates_count
+            if total:
+                self.current_page = max(0, (total - 1) // per_page)
+                await self._fetch_page_data("last")
  
     def update_view(self): #根据当前状态，更新组件属性并决定显示哪些组件 
         self.clear_items()
@@ -490,12 +534,12 @@ class UpdatesPaginatorView(ui.View):
         self.add_item(self.last_page_button)
         self.add_item(self.back_button)
 
-    async def create_embed(self):
+    async def create_embed(self, action: str = "first"):
         """异步创建Embed，在需要时会自动获取分页数据。"""
         if self.current_view_state == "initial":
             return self.create_initial_embed()
         
-        await self._fetch_page_data()
+        await self._fetch_page_data(action)
         
         if self.current_view_state == "threads":
             return self.create_threads_embed()
@@ -521,7 +565,7 @@ class UpdatesPaginatorView(ui.View):
 
     def create_threads_embed(self):
         def formatter(uid, item): # <-- 接收计算好的 uid
-            thread_id, _, update_type, url, message, _, is_followed = item
+            thread_id, _, update_type, url, message, _, _, is_followed = item
             if len(message) > 50:
                 display_message  = message[:50] + "..."
             else:
@@ -534,15 +578,15 @@ class UpdatesPaginatorView(ui.View):
 
     def create_authors_embed(self):
         def formatter(uid, item): # 同理进行操作
-            thread_id, author_id, url, _ = item
+            thread_id, author_id, url, _, _ = item
             if url is None:
                 return f"**{uid}.** ❤️ 您关注的作者 <@{author_id}> 发布了新帖子: <#{thread_id}>"
             else:
                 return f"**{uid}.** ❤️ 您关注的作者 <@{author_id}> 更新了帖子 <#{thread_id}>! \n└─[▶跳转至最新的楼层]({url})"
         return self._create_paginated_embed("👤 关注的作者动态", formatter)
 
-    async def _update_and_respond(self, interaction: discord.Interaction):
-        embed = await self.create_embed()
+    async def _update_and_respond(self, interaction: discord.Interaction, action: str = "first"):
+        embed = await self.create_embed(action)
         self.update_view()
         await interaction.response.edit_message(embed=embed, view=self)
 
@@ -561,11 +605,13 @@ class UpdatesPaginatorView(ui.View):
 
     async def page_callback(self, interaction: discord.Interaction):
         custom_id = interaction.data['custom_id']
+        action = PAGE_ACTIONS[custom_id]
         if custom_id == 'page_first': self.current_page = 0
         elif custom_id == 'page_prev': self.current_page = max(0, self.current_page - 1)
         elif custom_id == 'page_next': self.current_page = min(self.total_pages, self.current_page + 1)
         elif custom_id == 'page_last': self.current_page = self.total_pages
-        await self._update_and_respond(interaction)
+        if self.current_page == 0: action = "first"
+        await self._update_and_respond(interaction, action)
         
     async def mark_selected_as_read_callback(self, interaction: discord.Interaction):
         if not self.select_menu.values:
@@ -583,12 +629,11 @@ class UpdatesPaginatorView(ui.View):
         try:
             async with self.bot.db_pool.acquire() as conn, conn.cursor() as cursor:
                 if thread_ids_to_update:
-                    sql = f"UPDATE thread_subscriptions SET has_new_update = FALSE WHERE user_id = %s AND thread_id IN ({','.join(['%s']*len(thread_ids_to_update))})"
-                    await cursor.execute(sql, (self.user_id, *thread_ids_to_update))
+                    await unread.mark_threads_read(cursor, self.user_id, thread_ids_to_update)
                 if thread_ids_to_delete:
-                    sql = f"DELETE FROM follower_thread_notifications WHERE follower_id = %s AND thread_id IN ({','.join(['%s']*len(thread_ids_to_delete))})"
-                    await cursor.execute(sql, (self.user_id, *thread_ids_to_delete))
+                    await unread.mark_author_threads_read(cursor, self.user_id, thread_ids_to_delete)
                 await conn.commit()
+            self.bot.db_reads.wrote(self.user_id)
             
             if self.current_view_state == 'threads' and thread_ids_to_update:
                 self.thread_updates_count -= len(thread_ids_to_update)
@@ -600,7 +645,7 @@ class UpdatesPaginatorView(ui.View):
             if self.current_page > new_total_pages:
                 self.current_page = new_total_pages
             self.select_menu.values.clear()
-            await self._update_and_respond(interaction)
+            await self._update_and_respond(interaction, "stay")
 
         except Exception as err:
             print(f"数据库错误于 mark_selected: {err}")
@@ -612,15 +657,16 @@ class UpdatesPaginatorView(ui.View):
         try:
             async with self.bot.db_pool.acquire() as conn, conn.cursor() as cursor:
                 if self.current_view_state == 'threads':
-                    await cursor.execute("UPDATE thread_subscriptions SET has_new_update = FALSE WHERE user_id = %s", (self.user_id,))
+                    await unread.mark_all_threads_read(cursor, self.user_id)
                     self.thread_updates_count = 0
                 elif self.current_view_state == 'authors':
-                    await cursor.execute("DELETE FROM follower_thread_notifications WHERE follower_id = %s", (self.user_id,))
+                    await unread.mark_all_authors_read(cursor, self.user_id)
                     self.author_updates_count = 0
                 else:
                     await interaction.followup.send("未知视图状态，操作已取消。", ephemeral=True)
                     return
                 await conn.commit()
+            self.bot.db_reads.wrote(self.user_id)
 
             self.current_view_state = 'initial'
             self.current_page = 0
@@ -644,7 +690,7 @@ class UserPanel(ui.View):
         await interaction.response.defer(ephemeral=True)
         total_items_count = 0
         try:
-            async with bot.db_pool.acquire() as conn:
+            async with bot.db_reads.for_read(user.id).acquire() as conn:
                 async with conn.cursor() as cursor:
                     if item_type == 'thread':
                         sql ="""
@@ -657,6 +703,7 @@ class UserPanel(ui.View):
                     else: # author
                         await cursor.execute("SELECT COUNT(follow_id) FROM author_follows WHERE follower_id = %s", (user.id,))
                         total_items_count = (await cursor.fetchone())[0]
+                await conn.commit()
         except Exception as err:
             await interaction.followup.send(f"❌ 数据获取失败: {err}", ephemeral=True)
             return
@@ -685,32 +732,8 @@ class UserPanel(ui.View):
         await interaction.response.defer(ephemeral=True)
 
         try:
-            async with bot.db_pool.acquire() as conn, conn.cursor() as cursor:
-                thread_count_sql = """
-                SELECT COUNT(t.thread_id)
-                FROM thread_subscriptions ts JOIN managed_threads t ON ts.thread_id = t.thread_id
-                WHERE ts.user_id = %s AND ts.has_new_update = TRUE AND (
-                    (ts.subscribe_release = TRUE AND t.last_update_type = 'release') OR
-                    (ts.subscribe_test = TRUE AND t.last_update_type = 'test')
-                )
-            """
-                await cursor.execute(thread_count_sql, (user.id,))
-                thread_updates_count = (await cursor.fetchone())[0]
-            # 查询作者动态的总数 (排除已在订阅更新中显示的部分)
-                author_count_sql = """
-                SELECT COUNT(ftn.thread_id)
-                FROM follower_thread_notifications ftn
-                WHERE ftn.follower_id = %s AND ftn.thread_id NOT IN (
-                    SELECT ts.thread_id
-                    FROM thread_subscriptions ts JOIN managed_threads t ON ts.thread_id = t.thread_id
-                    WHERE ts.user_id = %s AND ts.has_new_update = TRUE AND (
-                        (ts.subscribe_release = TRUE AND t.last_update_type = 'release') OR
-                        (ts.subscribe_test = TRUE AND t.last_update_type = 'test')
-                    )
-                )
-            """
-                await cursor.execute(author_count_sql, (user.id, user.id))
-                author_updates_count = (await cursor.fetchone())[0]
+            # 订阅更新数与作者动态数 (作者动态排除已在订阅更新中显示的部分)
+            thread_updates_count, author_updates_count = await unread.load_counts(bot.db_reads, user.id)
 
         except Exception as err:
             print(f"数据库错误于 view_updates: {err}")
@@ -724,45 +747,49 @@ class UserPanel(ui.View):
         await interaction.followup.send(embed=embed, view=paginator, ephemeral=True)
 
     async def _get_update_counts(self, bot, user_id):
-        async with bot.db_pool.acquire() as conn, conn.cursor() as cursor:
-            thread_sql = """
-                SELECT COUNT(DISTINCT t.thread_id) FROM thread_subscriptions ts JOIN managed_threads t ON ts.thread_id = t.thread_id
-                WHERE ts.user_id = %s AND ts.has_new_update = TRUE AND (
-                    (ts.subscribe_release = TRUE AND t.last_update_type = 'release') OR
-                    (ts.subscribe_test = TRUE AND t.last_update_type = 'test')
-                )
-            """
-            await cursor.execute(thread_sql, (user_id,))
-            thread_count = (await cursor.fetchone())[0]
-
-            author_sql = """
-                SELECT COUNT(*) FROM follower_thread_notifications
-                WHERE follower_id = %s AND thread_id NOT IN (
-                    SELECT ts.thread_id FROM thread_subscriptions ts JOIN managed_threads t ON ts.thread_id = t.thread_id
-                    WHERE ts.user_id = %s AND ts.has_new_update = TRUE AND (
-                        (ts.subscribe_release = TRUE AND t.last_update_type = 'release') OR
-                        (ts.subscribe_test = TRUE AND t.last_update_type = 'test')
-                    )
-                )
-            """
-            await cursor.execute(author_sql, (user_id, user_id))
-            author_count = (await cursor.fetchone())[0]
-            return thread_count, author_count
+        return await unread.load_counts(bot.db_reads, user_id)
 
     @ui.button(label="刷新", style=discord.ButtonStyle.success, emoji="🔄", row=1)
     async def refresh_panel(self, interaction: discord.Interaction, button: ui.Button):
         bot: "MyBot" = interaction.client
         try:
             thread_count, author_count = await self._get_update_counts(bot, interaction.user.id)
-            desc = bot.DM_PANEL_TEXT.replace("{{user}}", interaction.user.mention)\
-                                    .replace("{{thread_update_number}}", str(thread_count))\
-                                    .replace("{{author_update_number}}", str(author_count))
+            desc = bot.DM_PANEL_TEXT.render(user=interaction.user.mention, thread_update_number=thread_count,
+                                            author_update_number=author_count)
             embed = discord.Embed(title=bot.DM_PANEL_TITLE, description=desc, color=discord.Color.blurple())\
                            .set_footer(text=f"将在5分钟后消失... |At {get_utc8_now_str()}")
             await interaction.response.edit_message(embed=embed, view=self)
         except Exception as err:
             await interaction.response.send_message(f"❌ SQL_Error:{err}\n刷新失败，无法连接到数据库。", ephemeral=True, delete_after=10)
 
+    @ui.button(label="摘要模式", style=discord.ButtonStyle.secondary, emoji="🗞️", row=1)
+    async def toggle_digest(self, interaction: discord.Interaction, button: ui.Button):
+        bot: "MyBot" = interaction.client
+        user_id = interaction.user.id
+        try:
+            async with bot.db_pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    sql = """
+                        INSERT INTO users (user_id, digest_mode)
+                        VALUES (%s, TRUE)
+                        ON DUPLICATE KEY UPDATE digest_mode = NOT digest_mode;
+                    """
+                    await cursor.execute(sql, (user_id,))
+                    await cursor.execute(*digest_change_statement(user_id))
+                    await cursor.execute("SELECT digest_mode FROM users WHERE user_id = %s", (user_id,))
+                    digest_mode = (await cursor.fetchone())[0]
+                await conn.commit()
+        except Exception as err:
+            print(f"数据库错误于 toggle_digest: {err}")
+            await interaction.response.send_message(f"❌ SQL_Error:{err}\n切换失败，请稍后重试。", ephemeral=True, delete_after=10)
+            return
+
+        if digest_mode:
+            text = f"🗞️ 已开启摘要模式：订阅与关注的更新将每 {bot.DIGEST_WINDOW_MINUTES} 分钟合并为一次提醒。"
+        else:
+            text = "🔔 已关闭摘要模式：每次更新都会立即提醒你。"
+        await interaction.response.send_message(text, ephemeral=True)
+
 # --- 追踪新帖子的UI ---
 class TrackNewThreadView(ui.View):
     def __init__(self):
@@ -792,21 +819,18 @@ class TrackNewThreadView(ui.View):
         await interaction.response.edit_message(embed=original_embed, view=None)
 
         try:
-            async with bot.db_pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    #先进行查询managed_thread表中是否含有，有的话则表示该帖子不是第一次创建更新推流
-                    await cursor.execute("SELECT EXISTS(SELECT 1 FROM managed_threads WHERE thread_id = %s) AS select_result;",(thread_id))
-                    result = await cursor.fetchone()
-                    select_result = result['select_result']
-                    if select_result == 0: #第一次创建更新推流
+            #先查帖子缓存，已开启推流的话则表示该帖子不是第一次创建更新推流
+            if await get_thread(bot.db_pool, thread_id) is None: #第一次创建更新推流
+                async with bot.db_pool.acquire() as conn:
+                    async with conn.cursor() as cursor:
                         await cursor.execute("INSERT IGNORE INTO managed_threads (thread_id, guild_id, author_id) VALUES (%s, %s, %s)",(thread_id, guild_id, thread_owner_id))
-                        #开始遍历所有关注了该作者的用户，并且在新follower_thread_notifications表中插入，表示这是需要通知的新帖子
-                        insert_notification_sql = """
-                        INSERT INTO follower_thread_notifications (follower_id, thread_id)
-                        SELECT follower_id, %s FROM author_follows WHERE author_id = %s
-                    """
-                        await cursor.execute(insert_notification_sql,(thread_id,thread_owner_id))
-                await conn.commit()
+                        created = cursor.rowcount == 1
+                        if created: #分配一个更新序号，关注了该作者的用户据此看到这是需要通知的新帖子
+                            await unread.publish_new_thread(cursor, thread_id)
+                    await conn.commit()
+                if created:
+                    thread_cache.put(thread_id, ThreadInfo(thread_owner_id, False, ()))
+                bot.db_reads.wrote(thread_owner_id)
         except Exception as e:
             print(f"数据库错误在track_thread_choice_yes :{e}")
 
@@ -881,38 +905,32 @@ class AddPermissionModal(discord.ui.Modal, title="添加权限用户"):
         if target_id == self.parent_view.author_id or target_id in current_permissions:
             await interaction.followup.send("❌ 该用户已经是帖主或已在权限组中。", ephemeral=True)
             return
+        if len(current_permissions) >= PERMISSION_MEMBER_LIMIT:
+            await interaction.followup.send(f"❌ 权限组已满({PERMISSION_MEMBER_LIMIT}/{PERMISSION_MEMBER_LIMIT}),无法添加新成员。", ephemeral=True)
+            return
 
         try:
-            first_empty_slot = current_permissions.index(None)
-            slot_to_update = f"thread_permission_group_{first_empty_slot + 1}"
-
-            async with self.parent_view.bot.db_pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute(
-                        f"UPDATE managed_threads SET {slot_to_update} = %s WHERE thread_id = %s",
-                        (target_id, self.parent_view.thread_id)
-                    )
-                await conn.commit()
+            await add_member(self.parent_view.bot.db_pool, self.parent_view.thread_id, target_id)
 
             await interaction.followup.send(f"✅ 成功将 `{target_id}` 添加到权限组。", ephemeral=True)
             await self.parent_view.update_view(interaction, use_followup=True)
 
-        except ValueError:
-            await interaction.followup.send("❌ 权限组已满(4/4),无法添加新成员。", ephemeral=True)
         except Exception as e:
             print(f"在 AddPermissionModal 中发生数据库错误: {e}")
             await interaction.followup.send("❌ 添加失败，发生内部错误。", ephemeral=True)
 
 # --- 帖子的权限组管理UI ---
+PERMISSION_MEMBER_LIMIT = 24 # 成员数不受表结构限制，但下拉菜单最多 25 个选项、embed 最多 25 个字段（帖主占一个）
+
 class PermissionManageView(discord.ui.View):
-    def __init__ (self,bot,thread_id:int,author_id:int,initial_permissions:list[int|None]):
+    def __init__ (self,bot,thread_id:int,author_id:int,initial_permissions:list[int]):
         super().__init__(timeout=None)
 
         self.bot = bot
         self.thread_id = thread_id
         self.author_id = author_id  
         self.current_permissions = initial_permissions
-        self.selected_slot_to_remove = None
+        self.selected_member_to_remove = None
         self.remove_button = self.create_remove_button()
         self.select_menu = self.create_select_menu()
         self.add_item(self.create_add_button())
@@ -923,30 +941,21 @@ class PermissionManageView(discord.ui.View):
         self.current_permissions = await self.fetch_permissions()
         self.select_menu.options = self._create_select_options()
         self.select_menu.disabled = not any(self.current_permissions)
-        self.remove_button.disabled = self.selected_slot_to_remove is None
-        if self.selected_slot_to_remove is None:
+        self.remove_button.disabled = self.selected_member_to_remove is None
+        if self.selected_member_to_remove is None:
             self.select_menu.placeholder = "选择一个要移除的目标..."
         else:
-            display_uid = int(self.selected_slot_to_remove) + 1
-            self.select_menu.placeholder = f"已选中【UID：{display_uid}】"
+            self.select_menu.placeholder = f"已选中【{self.selected_member_to_remove}】"
         embed = self.create_embed()
         if use_followup:
             await interaction.followup.edit_message(message_id=interaction.message.id, embed=embed, view=self)
         else:
             await interaction.response.edit_message(embed=embed, view=self)
 
-        # 用于获取最新的权限组成员，并且转换为列表
-    async def fetch_permissions(self) -> list[int | None]:
-            async with self.bot.db_pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute(
-                        """SELECT thread_permission_group_1, thread_permission_group_2, 
-                                thread_permission_group_3, thread_permission_group_4 
-                        FROM managed_threads WHERE thread_id = %s""",
-                        (self.thread_id,)
-                    )
-                    result = await cursor.fetchone()
-                    return list(result) if result else [None, None, None, None]
+        # 用于获取最新的权限组成员，并且转换为列表（来自帖子缓存，修改后已写穿）
+    async def fetch_permissions(self) -> list[int]:
+            info = await get_thread(self.bot.db_pool, self.thread_id)
+            return list(info.members) if info else []
         
     def create_embed(self) -> discord.Embed:
             embed = discord.Embed(
@@ -956,14 +965,11 @@ class PermissionManageView(discord.ui.View):
             )
             #添加帖主以及其他的权限组成员
             embed.add_field(name="UID 1 (帖主)", value=f"<@{self.author_id}>", inline=False)
-            slot_index = 2
-            for user_id in self.current_permissions:
-                if user_id:
-                    embed.add_field(name=f"UID {slot_index}", value=f"<@{user_id}>", inline=False)
-                    slot_index += 1
-            empty_slots = self.current_permissions.count(None)
-            if empty_slots > 0:
-                embed.add_field(name=f"UID {slot_index} - {slot_index + empty_slots - 1}", value="*空闲*", inline=False)
+            for slot_index, user_id in enumerate(self.current_permissions, start=2):
+                embed.add_field(name=f"UID {slot_index}", value=f"<@{user_id}>", inline=False)
+            first_empty = len(self.current_permissions) + 2
+            if first_empty <= PERMISSION_MEMBER_LIMIT + 1:
+                embed.add_field(name=f"UID {first_empty} - {PERMISSION_MEMBER_LIMIT + 1}", value="*空闲*", inline=False)
                 
             embed.set_footer(text=f"帖子ID: {self.thread_id}")
             return embed
@@ -971,14 +977,13 @@ class PermissionManageView(discord.ui.View):
     def _create_select_options(self) -> list[discord.SelectOption]:
             options = []
             for i, user_id in enumerate(self.current_permissions):
-                if user_id:
-                    options.append(
-                        discord.SelectOption(
-                            label=f"UID {i + 2}: {user_id}",
-                            description="选择以移除此用户",
-                            value=str(i + 1)  # value 存储的是 group_1, group_2... 的数字
-                        )
+                options.append(
+                    discord.SelectOption(
+                        label=f"UID {i + 2}: {user_id}",
+                        description="选择以移除此用户",
+                        value=str(user_id)
                     )
+                )
             if not options:
                 options.append(discord.SelectOption(
                 label="目前权限组为空",
@@ -1003,7 +1008,7 @@ class PermissionManageView(discord.ui.View):
                 if selected_value == "placeholder_empty":
                     await interaction.response.defer()
                     return
-                self.selected_slot_to_remove = selected_value
+                self.selected_member_to_remove = selected_value
                 await self.update_view(interaction, use_followup=False)
             select = discord.ui.Select(
                 placeholder="选择一个要移除的目标...",
@@ -1015,32 +1020,17 @@ class PermissionManageView(discord.ui.View):
 
     def create_remove_button(self) -> discord.ui.Button:
             async def remove_callback(interaction: discord.Interaction):
-                if not self.selected_slot_to_remove:
+                if not self.selected_member_to_remove:
                     await interaction.response.send_message("❌ 你没有选择任何目标。", ephemeral=True)
                     return
 
                 await interaction.response.defer()
 
-                slot_to_remove_index = int(self.selected_slot_to_remove) - 1
-                new_permissions = [p for i, p in enumerate(self.current_permissions) if i != slot_to_remove_index and p is not None]
-                while len(new_permissions) < 4:
-                    new_permissions.append(None)
                 try:
-                    async with self.bot.db_pool.acquire() as conn:
-                        async with conn.cursor() as cursor:
-                            await cursor.execute(
-                                """UPDATE managed_threads SET 
-                                thread_permission_group_1 = %s,
-                                thread_permission_group_2 = %s,
-                                thread_permission_group_3 = %s,
-                                thread_permission_group_4 = %s
-                                WHERE thread_id = %s""",
-                                (*new_permissions, self.thread_id)
-                            )
-                        await conn.commit()
+                    await remove_member(self.bot.db_pool, self.thread_id, int(self.selected_member_to_remove))
                     
                     # 重置选择状态
-                    self.selected_slot_to_remove = None
+                    self.selected_member_to_remove = None
                     await self.update_view(interaction,use_followup=True)
 
                 except Exception as e:
@@ -0,0 +1,311 @@
+"""未读状态：基于更新序号与已读水位线在读取时计算。
+
+每次发布更新（以及帖子开启更新推流）都从 update_sequence 取一个单调递增的序号，写入 managed_threads 的
+last_update_seq / last_release_seq / last_test_seq。订阅与关注各自保存 last_seen_seq，用户另有两条
+“全部已读”水位线，作者动态的单帖已读记在 author_thread_reads。因此发布更新只写固定的几行，
+标记全部已读也只是把一条水位线抬到当前序号。
+
+控制面板上的两个数字来自 unread_counters：首次打开时统计一次，之后只按差值增量维护，读取时不再统计。
+发布更新在同一事务中由 count_publish 给该帖子的订阅者与作者的关注者中已有计数器的用户加减差值；
+标记已读、订阅/关注变化同样按修改前后的差值计入。reconcile_counters 在后台重新统计并修正偏差。
+"""
+from contextlib import asynccontextmanager
+import aiomysql
+from src.pagination import Seek
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from src.replicas import ReadRouter
+
+# 订阅的帖子有未读更新（需要 ts、t、u 三个别名）
+THREAD_UNREAD_CONDITION = """(
+    (ts.subscribe_release = TRUE AND t.last_release_seq > GREATEST(ts.last_seen_seq, u.subscriptions_seen_seq)) OR
+    (ts.subscribe_test = TRUE AND t.last_test_seq > GREATEST(ts.last_seen_seq, u.subscriptions_seen_seq))
+)"""
+
+# 关注的作者有新帖子或新更新，且不在订阅更新中重复显示（需要 af、u、t、r 四个别名）
+AUTHOR_UNREAD_CONDITION = f"""(
+    t.last_update_seq > GREATEST(af.last_seen_seq, u.authors_seen_seq, COALESCE(r.seen_seq, 0))
+    AND NOT EXISTS (
+        SELECT 1 FROM thread_subscriptions ts
+        WHERE ts.user_id = af.follower_id AND ts.thread_id = t.thread_id AND {THREAD_UNREAD_CONDITION}
+    )
+)"""
+
+_THREAD_UNREAD_TABLES = """
+    FROM thread_subscriptions ts
+    JOIN managed_threads t ON ts.thread_id = t.thread_id
+    JOIN users u ON u.user_id = ts.user_id
+"""
+
+_AUTHOR_UNREAD_TABLES = """
+    FROM author_follows af
+    JOIN users u ON u.user_id = af.follower_id
+    JOIN managed_threads t ON t.author_id = af.author_id
+    LEFT JOIN author_thread_reads r ON r.follower_id = af.follower_id AND r.thread_id = t.thread_id
+"""
+
+_THREAD_UNREAD_FROM = f"{_THREAD_UNREAD_TABLES} WHERE ts.user_id = %s AND {THREAD_UNREAD_CONDITION}"
+_AUTHOR_UNREAD_FROM = f"{_AUTHOR_UNREAD_TABLES} WHERE af.follower_id = %s AND {AUTHOR_UNREAD_CONDITION}"
+
+# --- 序号 ---
+async def next_update_seq(cursor: aiomysql.Cursor, thread_id: int) -> int:
+    """为一次发布（或帖子开启推流）分配新的序号"""
+    await cursor.execute("INSERT INTO update_sequence (thread_id) VALUES (%s)", (thread_id,))
+    return cursor.lastrowid
+
+# --- 读取 ---
+async def count_unread(cursor: aiomysql.Cursor, user_id: int) -> tuple[int, int]:
+    """实时统计 (订阅的帖子更新数, 关注的作者动态数)；面板请使用 get_counts"""
+    await cursor.execute(f"SELECT COUNT(*) {_THREAD_UNREAD_FROM}", (user_id,))
+    thread_count = (await cursor.fetchone())[0]
+    await cursor.execute(f"SELECT COUNT(*) {_AUTHOR_UNREAD_FROM}", (user_id,))
+    author_count = (await cursor.fetchone())[0]
+    return thread_count, author_count
+
+# “查看更新”的两个视图：(页中的列, 本视图的 FROM, 另一视图的 FROM)
+_UPDATE_VIEWS = {
+    "threads": (
+        "t.thread_id, t.author_id, t.last_update_type, t.last_update_url, t.last_update_message, t.last_update_at, t.last_update_seq, "
+        "EXISTS (SELECT 1 FROM author_follows f WHERE f.follower_id = ts.user_id AND f.author_id = t.author_id) AS is_followed",
+        _THREAD_UNREAD_FROM, _AUTHOR_UNREAD_FROM,
+    ),
+    "authors": (
+        "t.thread_id, t.author_id, t.last_update_url, t.last_update_at, t.last_update_seq",
+        _AUTHOR_UNREAD_FROM, _THREAD_UNREAD_FROM,
+    ),
+}
+
+def _update_page_sql(view: str, seek: Seek) -> str:
+    """一条语句同时得到两个计数与一页数据：本视图的总数由窗口函数在同一次扫描中算出，另一视图的总数放在单行的派生表里，
+    以 LEFT JOIN 连接，页为空时也会返回一行计数。分页按 (last_update_seq, thread_id) 倒序，即最近一次发布的先后"""
+    page_columns, page_from, other_from = _UPDATE_VIEWS[view]
+    return f"""
+        SELECT other.total, page.*
+        FROM (SELECT COUNT(*) AS total {other_from}) other
+        LEFT JOIN (
+            SELECT * FROM (
+                SELECT {page_columns}, COUNT(*) OVER () AS view_total
+                {page_from}
+            ) x
+            WHERE TRUE {seek.where}
+            ORDER BY last_update_seq {seek.order}, thread_id {seek.order}
+            LIMIT %s
+        ) page ON TRUE
+        ORDER BY page.last_update_seq {seek.order}, page.thread_id {seek.order}
+    """
+
+async def fetch_update_page(cursor: aiomysql.Cursor, user_id: int, view: str, seek: Seek, limit: int):
+    """返回 (订阅更新数, 作者动态数, 本页的行)，三者来自同一快照。
+    threads 的行：(thread_id, author_id, last_update_type, last_update_url, last_update_message, last_update_at, last_update_seq, is_followed)
+    authors 的行：(thread_id, author_id, last_update_url, last_update_at, last_update_seq)
+    seek 越过末尾而页为空时，本视图的总数未知，返回 None"""
+    await cursor.execute(_update_page_sql(view, seek), (user_id, user_id, *seek.params, limit))
+    rows = await cursor.fetchall()
+    other_total, view_total = rows[0][0], rows[0][-1]
+    if view_total is None and not seek.params:
+        view_total = 0
+    items = [row[1:-1] for row in rows if row[-1] is not None]
+    if view == "threads":
+        return view_total, other_total, items
+    return other_total, view_total, items
+
+# --- 未读计数器 ---
+async def _create_counter(cursor: aiomysql.Cursor, user_id: int) -> tuple[int, int]:
+    """首次打开面板：实时统计一次并建立计数器。与并发的发布交错时可能有偏差，由 reconcile_counters 修正"""
+    thread_count, author_count = await count_unread(cursor, user_id)
+    await cursor.execute(
+        "INSERT IGNORE INTO unread_counters (user_id, thread_unread, author_unread) VALUES (%s, %s, %s)",
+        (user_id, thread_count, author_count)
+    )
+    return thread_count, author_count
+
+async def get_counts(cursor: aiomysql.Cursor, user_id: int) -> tuple[int, int]:
+    """面板使用的 (订阅的帖子更新数, 关注的作者动态数)；只有计数器还不存在时才统计并建立，调用方负责提交"""
+    await cursor.execute("SELECT thread_unread, author_unread FROM unread_counters WHERE user_id = %s", (user_id,))
+    row = await cursor.fetchone()
+    if row:
+        return row[0], row[1]
+    return await _create_counter(cursor, user_id)
+
+async def load_counts(reads: "ReadRouter", user_id: int) -> tuple[int, int]:
+    """get_counts 的读写分离版本：优先在只读副本上读计数器，副本上还没有计数器（建立需要写入）时在主库上 get_counts"""
+    pool = reads.for_read(user_id)
+    if pool is not reads.primary:
+        async with pool.acquire() as conn, conn.cursor() as cursor:
+            await cursor.execute("SELECT thread_unread, author_unread FROM unread_counters WHERE user_id = %s", (user_id,))
+            row = await cursor.fetchone()
+            await conn.commit()
+        if row:
+            return row[0], row[1]
+    async with reads.primary.acquire() as conn, conn.cursor() as cursor:
+        counts = await get_counts(cursor, user_id)
+        await conn.commit()
+    return counts
+
+async def _has_counter(cursor: aiomysql.Cursor, user_id: int) -> bool:
+    await cursor.execute("SELECT 1 FROM unread_counters WHERE user_id = %s", (user_id,))
+    return await cursor.fetchone() is not None
+
+def _scope(thread_ids=None, author_ids=None) -> tuple[str, tuple]:
+    """限定在给定帖子（或给定作者的帖子）范围内的条件"""
+    if thread_ids is not None:
+        return f"AND t.thread_id IN ({','.join(['%s'] * len(thread_ids))})", tuple(thread_ids)
+    return f"AND t.author_id IN ({','.join(['%s'] * len(author_ids))})", tuple(author_ids)
+
+def tracking_statements(user_id: int, *, thread_ids=None, author_ids=None) -> tuple[tuple[str, tuple], tuple[str, tuple]]:
+    """(修改前执行的语句, 修改后执行的语句)：前者把范围内的未读数记入会话变量，后者把差值计入计数器。
+    不依赖中间结果，可以与修改本身拼进同一批语句里发送"""
+    scope, scope_args = _scope(thread_ids, author_ids)
+    before = (
+        f"""SET @unread_threads_before = (SELECT COUNT(*) {_THREAD_UNREAD_FROM} {scope}),
+               @unread_authors_before = (SELECT COUNT(*) {_AUTHOR_UNREAD_FROM} {scope})""",
+        (user_id, *scope_args, user_id, *scope_args),
+    )
+    after = (
+        f"""UPDATE unread_counters SET
+                thread_unread = thread_unread + (SELECT COUNT(*) {_THREAD_UNREAD_FROM} {scope}) - @unread_threads_before,
+                author_unread = author_unread + (SELECT COUNT(*) {_AUTHOR_UNREAD_FROM} {scope}) - @unread_authors_before
+            WHERE user_id = %s""",
+        (user_id, *scope_args, user_id, *scope_args, user_id),
+    )
+    return before, after
+
+@asynccontextmanager
+async def tracking(cursor: aiomysql.Cursor, user_id: int, *, thread_ids=None, author_ids=None):
+    """包住单个用户的一次状态修改：修改前后各统计一次受影响范围内的未读数，把差值计入计数器。
+    用户还没有计数器时什么都不做，等首次打开面板时再统计"""
+    if not await _has_counter(cursor, user_id):
+        yield
+        return
+    before, after = tracking_statements(user_id, thread_ids=thread_ids, author_ids=author_ids)
+    await cursor.execute(*before)
+    yield
+    await cursor.execute(*after)
+
+async def correct_counts(cursor: aiomysql.Cursor, user_id: int, thread_count: int, author_count: int):
+    """用同一快照中实时统计的结果覆盖计数器"""
+    await cursor.execute(
+        "UPDATE unread_counters SET thread_unread = %s, author_unread = %s WHERE user_id = %s",
+        (thread_count, author_count, user_id)
+    )
+
+# 发布前该订阅者的这个帖子是否已有未读；没有订阅行（只关注作者）时为 FALSE
+_THREAD_UNREAD_BEFORE = f"COALESCE({THREAD_UNREAD_CONDITION}, FALSE)"
+
+async def count_publish(cursor: aiomysql.Cursor, thread_id: int, update_type: str | None = None):
+    """在发布的事务中、写入帖子的新序号之前调用，把这次发布带来的差值计入已有的计数器。
+    update_type 为 release/test；帖子刚开启推流时为 None（只有作者的关注者看到新帖子）。
+    新序号大于任何已读水位线，所以订阅了该类型的用户在发布后必然未读；作者动态在发布后未读，
+    除非同一个帖子在订阅更新中显示。两条语句各自只扫描该帖子的订阅者、该作者的关注者"""
+    if update_type is not None:
+        await cursor.execute(f"""
+            UPDATE unread_counters c
+            JOIN thread_subscriptions ts ON ts.user_id = c.user_id
+            JOIN managed_threads t ON t.thread_id = ts.thread_id
+            JOIN users u ON u.user_id = ts.user_id
+            SET c.thread_unread = c.thread_unread + 1
+            WHERE ts.thread_id = %s AND ts.subscribe_{update_type} = TRUE AND NOT {THREAD_UNREAD_CONDITION}
+        """, (thread_id,))
+    subscribed_after = f"COALESCE(ts.subscribe_{update_type}, FALSE)" if update_type is not None else "FALSE"
+    await cursor.execute(f"""
+        UPDATE unread_counters c
+        JOIN author_follows af ON af.follower_id = c.user_id
+        JOIN managed_threads t ON t.author_id = af.author_id
+        JOIN users u ON u.user_id = af.follower_id
+        LEFT JOIN author_thread_reads r ON r.follower_id = af.follower_id AND r.thread_id = t.thread_id
+        LEFT JOIN thread_subscriptions ts ON ts.user_id = af.follower_id AND ts.thread_id = t.thread_id
+        SET c.author_unread = c.author_unread
+            + (NOT ({subscribed_after} OR {_THREAD_UNREAD_BEFORE}))
+            - (t.last_update_seq > GREATEST(af.last_seen_seq, u.authors_seen_seq, COALESCE(r.seen_seq, 0)) AND NOT {_THREAD_UNREAD_BEFORE})
+        WHERE t.thread_id = %s
+    """, (thread_id,))
+
+async def publish_new_thread(cursor: aiomysql.Cursor, thread_id: int) -> int:
+    """帖子行刚由本事务插入（last_update_seq 仍为 0）后调用：分配序号并写入，关注者据此看到作者的新帖子。
+    只在插入确实新建了行时调用，已存在的帖子不会留下没有帖子使用的序号"""
+    seq = await next_update_seq(cursor, thread_id)
+    await count_publish(cursor, thread_id)
+    await cursor.execute(
+        "UPDATE managed_threads SET last_update_seq = %s, last_update_at = last_update_at WHERE thread_id = %s",
+        (seq, thread_id)
+    )
+    return seq
+
+async def reconcile_counters(pool: aiomysql.Pool, batch_size: int = 500) -> tuple[int, int, int]:
+    """按主键分批重新统计所有计数器并修正偏差，返回 (检查的用户数, 有偏差的用户数, 最大偏差)"""
+    checked = drifted = max_drift = 0
+    after_user_id = 0
+    while True:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT user_id, thread_unread, author_unread FROM unread_counters WHERE user_id > %s ORDER BY user_id LIMIT %s",
+                    (after_user_id, batch_size)
+                )
+                stored = {row[0]: (row[1], row[2]) for row in await cursor.fetchall()}
+                if not stored:
+                    break
+                placeholders = ','.join(['%s'] * len(stored))
+                await cursor.execute(f"""
+                    SELECT ts.user_id, COUNT(*) {_THREAD_UNREAD_TABLES}
+                    WHERE ts.user_id IN ({placeholders}) AND {THREAD_UNREAD_CONDITION}
+                    GROUP BY ts.user_id
+                """, tuple(stored))
+                thread_counts = dict(await cursor.fetchall())
+                await cursor.execute(f"""
+                    SELECT af.follower_id, COUNT(*) {_AUTHOR_UNREAD_TABLES}
+                    WHERE af.follower_id IN ({placeholders}) AND {AUTHOR_UNREAD_CONDITION}
+                    GROUP BY af.follower_id
+                """, tuple(stored))
+                author_counts = dict(await cursor.fetchall())
+
+                for user_id, (thread_stored, author_stored) in stored.items():
+                    actual = (thread_counts.get(user_id, 0), author_counts.get(user_id, 0))
+                    if actual != (thread_stored, author_stored):
+                        drifted += 1
+                        max_drift = max(max_drift, abs(actual[0] - thread_stored), abs(actual[1] - author_stored))
+                        await cursor.execute(
+                            "UPDATE unread_counters SET thread_unread = %s, author_unread = %s WHERE user_id = %s",
+                            (*actual, user_id)
+                        )
+            await conn.commit()
+        checked += len(stored)
+        after_user_id = max(stored)
+    return checked, drifted, max_drift
+
+# --- 标记已读 ---
+async def mark_threads_read(cursor: aiomysql.Cursor, user_id: int, thread_ids):
+    placeholders = ','.join(['%s'] * len(thread_ids))
+    async with tracking(cursor, user_id, thread_ids=thread_ids):
+        await cursor.execute(f"""
+            UPDATE thread_subscriptions ts JOIN managed_threads t ON ts.thread_id = t.thread_id
+            SET ts.last_seen_seq = t.last_update_seq
+            WHERE ts.user_id = %s AND ts.thread_id IN ({placeholders})
+        """, (user_id, *thread_ids))
+
+async def mark_author_threads_read(cursor: aiomysql.Cursor, user_id: int, thread_ids):
+    placeholders = ','.join(['%s'] * len(thread_ids))
+    async with tracking(cursor, user_id, thread_ids=thread_ids):
+        await cursor.execute(f"""
+            INSERT INTO author_thread_reads (follower_id, thread_id, seen_seq)
+            SELECT %s, t.thread_id, t.last_update_seq FROM managed_threads t WHERE t.thread_id IN ({placeholders})
+            ON DUPLICATE KEY UPDATE seen_seq = t.last_update_seq
+        """, (user_id, *thread_ids))
+
+async def mark_all_threads_read(cursor: aiomysql.Cursor, user_id: int):
+    await cursor.execute(
+        "UPDATE users SET subscriptions_seen_seq = (SELECT COALESCE(MAX(seq), 0) FROM update_sequence) WHERE user_id = %s",
+        (user_id,)
+    )
+    # 订阅更新清零后，原先被订阅更新遮住的作者动态会重新出现，只重新统计这一项
+    await cursor.execute(
+        f"UPDATE unread_counters SET thread_unread = 0, author_unread = (SELECT COUNT(*) {_AUTHOR_UNREAD_FROM}) WHERE user_id = %s",
+        (user_id, user_id)
+    )
+
+async def mark_all_authors_read(cursor: aiomysql.Cursor, user_id: int):
+    await cursor.execute(
+        "UPDATE users SET authors_seen_seq = (SELECT COALESCE(MAX(seq), 0) FROM update_sequence) WHERE user_id = %s",
+        (user_id,)
+    )
+    await cursor.execute("UPDATE unread_counters SET author_unread = 0 WHERE user_id = %s", (user_id,))
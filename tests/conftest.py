@@ -0,0 +1,11 @@
+"""src.config 在导入时读取 .env；这里补上必填项的占位值，让纯逻辑的测试不依赖 .env 与数据库"""
+import os
+
+for name, value in {
+    "TARGET_GUILD_ID": "1",
+    "ALLOWED_CHANNELS": "2",
+    "UPDATE_TEXT": "{{author}} {{text}} {{url}}",
+    "DM_PANEL_TEXT": "{{user}} {{thread_update_number}} {{author_update_number}}",
+    "TRACK_NEW_THREAD_EMBED_TEXT": "{{author}} {{thread_url}}",
+}.items():
+    os.environ.setdefault(name, value)
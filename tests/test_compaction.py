@@ -0,0 +1,78 @@
+import asyncio
+from src.compaction import _MAX_KEY, _TARGETS, compact, compact_table
+
+class _Table:
+    """按主键排序的行：(主键, 是否可删除)；主键可以重复（例如 author_thread_reads 按 follower_id 分块）"""
+    def __init__(self, rows):
+        self.rows = sorted(rows)
+        self.ranges = []
+        self.params = []
+        self.commits = 0
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    async def execute(self, sql, params):
+        if sql.startswith("SELECT"):
+            lower, offset = params
+            keys = [key for key, _ in self.rows if key > lower]
+            self._row = (keys[offset],) if offset < len(keys) else None
+        else:
+            lower, upper = params[:2]
+            self.ranges.append((lower, upper))
+            self.params.append(params[2:])
+            kept = [(key, dead) for key, dead in self.rows if not (lower < key <= upper and dead)]
+            self.rowcount = len(self.rows) - len(kept)
+            self.rows = kept
+
+    async def fetchone(self):
+        return self._row
+
+    async def commit(self):
+        self.commits += 1
+
+def _compact(table: _Table, chunk_size: int) -> int:
+    _, boundary_sql, delete_sql = _TARGETS[0]
+    return asyncio.run(compact_table(table, boundary_sql, delete_sql, (), chunk_size, 0))
+
+def test_chunks_cover_the_whole_key_space_without_gaps():
+    table = _Table([(key, key % 3 == 0) for key in range(1, 26)])
+    assert _compact(table, 10) == 8
+    assert table.ranges == [(0, 10), (10, 20), (20, _MAX_KEY)]
+    assert table.commits == 3 # 每块单独提交
+    assert all(key % 3 for key, _ in table.rows)
+
+def test_each_chunk_spans_at_most_chunk_size_rows():
+    keys = [1, 2, 5, 9, 14, 20, 27]
+    table = _Table([(key, True) for key in keys])
+    _compact(table, 3)
+    assert table.ranges == [(0, 5), (5, 20), (20, _MAX_KEY)]
+    assert table.rows == []
+
+def test_repeated_keys_stay_in_one_chunk():
+    table = _Table([(1, True), (1, False), (2, True), (2, True), (2, False), (3, True)])
+    assert _compact(table, 2) == 4
+    assert table.ranges == [(0, 1), (1, 2), (2, _MAX_KEY)]
+    assert table.rows == [(1, False), (2, False)]
+
+def test_empty_table_is_one_open_ended_chunk():
+    table = _Table([])
+    assert _compact(table, 100) == 0
+    assert table.ranges == [(0, _MAX_KEY)]
+
+def test_retention_is_passed_only_to_time_bounded_deletes():
+    table = _Table([])
+    reclaimed = asyncio.run(compact(table, retention_days=7, chunk_size=100, pause=0))
+    assert list(reclaimed) == [name for name, _, _ in _TARGETS]
+    by_table = dict(zip(reclaimed, table.params))
+    assert by_table["graph_changes"] == by_table["notification_jobs"] == by_table["update_sequence"] == (7,)
+    assert by_table["thread_subscriptions"] == by_table["author_thread_reads"] == ()
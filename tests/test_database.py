@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from src.database import commit_batch
+
+class _Cursor:
+    def __init__(self, fail: bool):
+        self.fail = fail
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def mogrify(self, query, args):
+        return query
+
+    async def execute(self, sql):
+        if self.fail:
+            raise RuntimeError("Duplicate entry")
+
+    async def fetchall(self):
+        return [(1,)]
+
+    async def nextset(self):
+        return None
+
+class _Connection:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    def cursor(self):
+        return _Cursor(self.fail)
+
+    async def commit(self):
+        self.calls.append("commit")
+
+    async def rollback(self):
+        self.calls.append("rollback")
+
+def test_batch_is_committed_after_success():
+    conn = _Connection()
+    assert asyncio.run(commit_batch(conn, [("SELECT 1", None)])) == [[(1,)]]
+    assert conn.calls == ["commit"]
+
+def test_batch_is_rolled_back_on_error():
+    conn = _Connection(fail=True)
+    with pytest.raises(RuntimeError):
+        asyncio.run(commit_batch(conn, [("SELECT 1", None)]))
+    assert conn.calls == ["rollback"]
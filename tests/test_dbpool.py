@@ -0,0 +1,71 @@
+import asyncio
+from src.dbpool import MonitoredPool
+
+class _Connection:
+    closed = False
+
+    async def ensure_closed(self):
+        self.closed = True
+
+class _Pool:
+    """aiomysql.Pool 的最小替身：连接按需创建，归还已关闭的连接时把它移出连接池"""
+    def __init__(self, free: int = 0):
+        self.free = [_Connection() for _ in range(free)]
+        self.used = []
+
+    @property
+    def size(self):
+        return len(self.free) + len(self.used)
+
+    @property
+    def freesize(self):
+        return len(self.free)
+
+    async def acquire(self):
+        conn = self.free.pop() if self.free else _Connection()
+        self.used.append(conn)
+        return conn
+
+    async def release(self, conn):
+        self.used.remove(conn)
+        if not conn.closed:
+            self.free.append(conn)
+
+def test_slow_waits_grow_the_limit():
+    pool = MonitoredPool(_Pool(), 4, min_size=2, max_size=10, target_wait_ms=20)
+    pool.acquires = 10
+    pool.recent_waits.extend([0.1] * 10)
+    assert asyncio.run(pool.adjust()) == 5
+    assert pool.resizes == 1
+
+def test_idle_pool_shrinks_and_closes_extra_connections():
+    raw = _Pool(free=4)
+    pool = MonitoredPool(raw, 4, min_size=2, max_size=10)
+    pool.acquires = 10
+    pool.recent_waits.extend([0.0] * 10)
+    assert asyncio.run(pool.adjust()) == 3
+    assert raw.size == 3
+    assert pool.in_use == 0 and pool.acquires == 10 # 关闭空闲连接不计入借出统计
+
+def test_closing_idle_connections_never_exceeds_the_limit():
+    raw = _Pool(free=4)
+    pool = MonitoredPool(raw, 3, min_size=2, max_size=10)
+    pool.in_use = pool.peak_in_use = 3 # 名额已满，关闭空闲连接要等到下一次调整
+    assert asyncio.run(pool.adjust()) is None
+    assert raw.size == 4 and pool.in_use == 3
+    pool.in_use = 0
+    assert asyncio.run(pool.adjust()) is None
+    assert raw.size == 3
+
+def test_sites_are_recorded_without_opt_in():
+    pool = MonitoredPool(_Pool(), 2)
+
+    async def load_panel():
+        async with pool.acquire():
+            pass
+        async with pool.acquire(site="digest"):
+            pass
+
+    asyncio.run(load_panel())
+    labels = {site for site, *_ in pool.busiest_sites()}
+    assert labels == {"digest", "test_dbpool.test_sites_are_recorded_without_opt_in.<locals>.load_panel"}
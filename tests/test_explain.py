@@ -0,0 +1,24 @@
+import asyncio
+import os
+from pathlib import Path
+import pytest
+from benchmarks.explain_check import bind_parameters, explain_all, extract_statements
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def test_every_statement_is_extracted():
+    statements, skipped = extract_statements(ROOT)
+    assert skipped == []
+    assert statements
+
+def test_seek_statements_bind_real_keys():
+    statements = dict(extract_statements(ROOT)[0])
+    next_page = next(sql for location, sql in statements.items() if location.startswith("src/ui.py") and location.endswith(" next") and "follow_id <" in sql)
+    _, params = bind_parameters(next_page, {"follower_id": 11, "follow_id": 22, "default": 33})
+    assert params == (11, 22, 5)
+
+@pytest.mark.skipif(not os.getenv("BENCH_MYSQL_HOST"), reason="需要 BENCH_MYSQL_HOST 指定的单独 MySQL（会清空其中的表）")
+def test_no_full_table_scans():
+    checked, problems = asyncio.run(explain_all())
+    assert checked > 0
+    assert problems == []
@@ -0,0 +1,197 @@
+import asyncio
+import discord
+import pytest
+from benchmarks.fake_discord import FakeDiscordHTTP, FakeThread, run_virtual
+from src import fanout
+
+class _Response:
+    status = 503
+    reason = "Service Unavailable"
+
+class _FakeBot:
+    UPDATE_TITLE = "【更新】"
+    UPDATE_MENTION_MAX_NUMBER = 0
+    PROGRESS_UPDATE_INTERVAL = 5
+    PROGRESS_UPDATE_PERCENT_STEP = 10
+    db_pool = None
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.mention_pacer = fanout.MentionPacer()
+
+    def get_channel(self, channel_id):
+        return self.thread
+
+    async def wait_until_ready(self):
+        pass
+
+@pytest.fixture
+def jobs(monkeypatch):
+    """用内存中的 notification_jobs 代替数据库"""
+    table = {}
+    statuses = []
+
+    async def fetch_job(pool, job_id):
+        return dict(table[job_id]) if job_id in table else None
+
+    async def set_job_status(pool, job_id, status, error=None):
+        table[job_id]["status"] = status
+        statuses.append((job_id, status))
+
+    async def ack_batch(pool, job_id, last_user_id, processed_users):
+        table[job_id].update(last_user_id=last_user_id, processed_users=processed_users)
+
+    monkeypatch.setattr(fanout, "_fetch_job", fetch_job)
+    monkeypatch.setattr(fanout, "_set_job_status", set_job_status)
+    monkeypatch.setattr(fanout, "_ack_batch", ack_batch)
+    return table, statuses
+
+def _job(job_id, recipients, last_user_id=0, processed_users=0):
+    return {"job_id": job_id, "thread_id": 1, "author_id": 2, "update_type": "release", "audience": "instant",
+            "status": "running", "update_text": "x", "response_channel_id": None, "response_message_id": None,
+            "total_users": len(recipients), "processed_users": processed_users, "last_user_id": last_user_id}
+
+def test_job_resumes_after_the_acknowledged_cursor(jobs, monkeypatch):
+    table, statuses = jobs
+    recipients = [10**17 + i for i in range(200)]
+    table[1] = _job(1, recipients, last_user_id=recipients[99], processed_users=100)
+    requested = []
+
+    async def stream(pool, thread_id, author_id, update_type, after_user_id=0, audience="all"):
+        requested.append(after_user_id)
+        for uid in recipients:
+            if uid > after_user_id:
+                yield uid
+
+    monkeypatch.setattr(fanout, "stream_recipients", stream)
+    thread = FakeThread(FakeDiscordHTTP(latency=0.01), 1)
+    run_virtual(fanout.run_notification_job(_FakeBot(thread), 1))
+    assert requested == [recipients[99]]
+    mentioned = [int(token[2:-1]) for message in thread.sent for token in message.split()]
+    assert mentioned == recipients[100:]
+    assert table[1]["last_user_id"] == recipients[-1]
+    assert table[1]["processed_users"] == 200
+    assert statuses[-1] == (1, "done")
+
+def _scheduler(bot, **retry):
+    scheduler = fanout.FanoutScheduler(bot, 0, max_active_jobs=4, **retry)
+    scheduler.start()
+    return scheduler
+
+async def _drain(scheduler):
+    while scheduler.active_jobs or scheduler.pending_jobs or scheduler.retrying_jobs:
+        await asyncio.sleep(0.5)
+
+def test_failed_job_is_retried_with_backoff(jobs, monkeypatch):
+    table, statuses = jobs
+    table[1] = _job(1, [])
+    attempts = []
+
+    async def run(bot, job_id, scheduler):
+        attempts.append(asyncio.get_running_loop().time())
+        if len(attempts) < 3:
+            raise discord.HTTPException(_Response(), "upstream error")
+        table[job_id]["status"] = "done"
+
+    monkeypatch.setattr(fanout, "run_notification_job", run)
+
+    async def scenario():
+        scheduler = _scheduler(_FakeBot(FakeThread(FakeDiscordHTTP(), 1)), max_attempts=5, retry_base=10, retry_max=15)
+        scheduler.submit(1)
+        await _drain(scheduler)
+        return scheduler
+
+    scheduler, _ = run_virtual(scenario())
+    assert len(attempts) == 3
+    gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+    assert gaps[0] == pytest.approx(10, abs=0.5)
+    assert gaps[1] == pytest.approx(15, abs=0.5) # 20 秒被 retry_max 截断
+    assert statuses == [(1, "retrying"), (1, "retrying")]
+    assert (scheduler.retries, scheduler.failed) == (2, 0)
+
+def test_job_is_marked_failed_after_max_attempts(jobs, monkeypatch):
+    table, statuses = jobs
+    table[1] = _job(1, [])
+    calls = []
+
+    async def run(bot, job_id, scheduler):
+        calls.append(job_id)
+        raise discord.HTTPException(_Response(), "upstream error")
+
+    monkeypatch.setattr(fanout, "run_notification_job", run)
+
+    async def scenario():
+        scheduler = _scheduler(_FakeBot(FakeThread(FakeDiscordHTTP(), 1)), max_attempts=3, retry_base=1, retry_max=1)
+        scheduler.submit(1)
+        await _drain(scheduler)
+        return scheduler
+
+    scheduler, _ = run_virtual(scenario())
+    assert len(calls) == 3
+    assert statuses == [(1, "retrying"), (1, "retrying"), (1, "failed")]
+    assert scheduler.failed == 1
+    assert scheduler.failures[-1][1] == 1
+    assert "upstream error" in scheduler.failures[-1][2]
+
+def _turn_taking_jobs(monkeypatch, batches: dict[int, int]) -> list[tuple[int, float]]:
+    """每个任务领取 batches[job_id] 次发送名额，记录 (job_id, 领取时间)"""
+    turns = []
+
+    async def run(bot, job_id, scheduler):
+        for _ in range(batches[job_id]):
+            await scheduler.acquire_turn()
+            turns.append((job_id, asyncio.get_running_loop().time()))
+
+    monkeypatch.setattr(fanout, "run_notification_job", run)
+    return turns
+
+def test_turns_alternate_between_active_jobs(jobs, monkeypatch):
+    turns = _turn_taking_jobs(monkeypatch, {1: 20, 2: 3})
+
+    async def scenario():
+        scheduler = fanout.FanoutScheduler(_FakeBot(None), 1.0, max_active_jobs=4)
+        scheduler.start()
+        scheduler.submit(1)
+        scheduler.submit(2)
+        await _drain(scheduler)
+        return scheduler
+
+    scheduler, elapsed = run_virtual(scenario())
+    order = [job_id for job_id, _ in turns]
+    assert order[:6] == [1, 2, 1, 2, 1, 2] # 小任务不必等大任务发完
+    last_small = max(at for job_id, at in turns if job_id == 2)
+    assert last_small < 7
+    assert scheduler.sent_batches == 23
+    assert elapsed == pytest.approx(22, abs=1) # 全局 1 批/秒，第一批不等待
+
+def test_global_rate_is_shared_by_all_jobs(jobs, monkeypatch):
+    turns = _turn_taking_jobs(monkeypatch, {1: 5, 2: 5, 3: 5})
+
+    async def scenario():
+        scheduler = fanout.FanoutScheduler(_FakeBot(None), 5.0, max_active_jobs=4)
+        scheduler.start()
+        for job_id in (1, 2, 3):
+            scheduler.submit(job_id)
+        await _drain(scheduler)
+
+    run_virtual(scenario())
+    times = sorted(at for _, at in turns)
+    for start in range(len(times) - 5):
+        assert times[start + 5] - times[start] >= 1 - 1e-6 # 任意 6 批之间至少隔 1 秒：5 批/秒
+
+def test_jobs_beyond_the_active_limit_wait_for_a_slot(jobs, monkeypatch):
+    turns = _turn_taking_jobs(monkeypatch, {1: 3, 2: 3, 3: 3})
+
+    async def scenario():
+        scheduler = fanout.FanoutScheduler(_FakeBot(None), 0, max_active_jobs=2)
+        scheduler.start()
+        for job_id in (1, 2, 3):
+            scheduler.submit(job_id)
+        assert (scheduler.active_jobs, scheduler.pending_jobs) == (2, 1)
+        await _drain(scheduler)
+
+    run_virtual(scenario())
+    order = [job_id for job_id, _ in turns]
+    first_finished = min(len(order) - 1 - order[::-1].index(job_id) for job_id in (1, 2))
+    assert order.index(3) > first_finished # 任务 3 在前两个任务之一结束后才启动
+    assert order.count(3) == 3
@@ -0,0 +1,60 @@
+import asyncio
+from src.followers import FollowerIndex, after
+
+class _Cursor:
+    """只回答 FollowerIndex.get 的那一条查询"""
+    def __init__(self, follows: dict[int, list[int]]):
+        self.follows = follows
+        self.queries = 0
+        self._rows = []
+
+    async def execute(self, sql, args):
+        self.queries += 1
+        self._rows = [(follower,) for follower in sorted(self.follows.get(args[0], []))]
+
+    async def fetchall(self):
+        return self._rows
+
+def _get(index, cursor, author_id):
+    return list(asyncio.run(index.get(cursor, author_id)))
+
+def test_add_and_discard_keep_followers_sorted():
+    index, cursor = FollowerIndex(100), _Cursor({1: [30, 10, 20]})
+    assert _get(index, cursor, 1) == [10, 20, 30]
+    index.add(1, 25)
+    index.add(1, 5)
+    index.add(1, 40)
+    index.add(1, 20) # 已存在
+    assert _get(index, cursor, 1) == [5, 10, 20, 25, 30, 40]
+    index.discard(1, 10)
+    index.discard(1, 11) # 不存在
+    assert _get(index, cursor, 1) == [5, 20, 25, 30, 40]
+    assert index.size == 5
+    assert cursor.queries == 1
+
+def test_writes_to_unloaded_author_are_ignored():
+    index, cursor = FollowerIndex(100), _Cursor({1: [1, 2]})
+    index.add(1, 3)
+    assert index.size == 0
+    assert _get(index, cursor, 1) == [1, 2] # 下次用到时从数据库加载
+
+def test_least_recently_used_author_is_evicted():
+    index, cursor = FollowerIndex(4), _Cursor({1: [1, 2], 2: [3, 4], 3: [5, 6]})
+    _get(index, cursor, 1)
+    _get(index, cursor, 2)
+    _get(index, cursor, 1) # 作者 1 变为最近使用
+    _get(index, cursor, 3)
+    assert index.evictions == 1
+    assert index.size == 4
+    queries = cursor.queries
+    _get(index, cursor, 1)
+    assert cursor.queries == queries
+    _get(index, cursor, 2)
+    assert cursor.queries == queries + 1
+
+def test_after_returns_followers_past_the_cursor():
+    index, cursor = FollowerIndex(100), _Cursor({1: [10, 20, 30]})
+    followers = asyncio.run(index.get(cursor, 1))
+    assert list(after(followers, 0)) == [10, 20, 30]
+    assert list(after(followers, 20)) == [30]
+    assert list(after(followers, 30)) == []
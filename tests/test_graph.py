@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from src.graph import DIGEST, FOLLOW, KINDS, RELEASE, TEST, CSRBuilder, SubscriptionGraph, map_snapshot, unmap_snapshot, write_snapshot
+
+EDGES = {
+    RELEASE: [(10, 1), (10, 3), (10, 5), (20, 2)],
+    TEST: [(10, 2), (10, 3)],
+    FOLLOW: [(7, 3), (7, 4), (8, 1)],
+    DIGEST: [(0, 4), (0, 5)],
+}
+
+def _graph() -> SubscriptionGraph:
+    graph = SubscriptionGraph()
+    base = []
+    for kind in KINDS:
+        builder = CSRBuilder()
+        for source, user_id in EDGES[kind]:
+            builder.add(source, user_id)
+        base.append(builder.finish())
+    graph._base = base
+    return graph
+
+def test_members_without_overrides_is_a_slice_after_the_cursor():
+    graph = _graph()
+    assert list(graph.members(RELEASE, 10)) == [1, 3, 5]
+    assert list(graph.members(RELEASE, 10, after_user_id=3)) == [5]
+    assert list(graph.members(RELEASE, 99)) == []
+
+def test_members_merge_overrides_in_order():
+    graph = _graph()
+    graph.apply(RELEASE, 10, 4, True)
+    graph.apply(RELEASE, 10, 3, False)
+    graph.apply(RELEASE, 10, 9, True)
+    assert list(graph.members(RELEASE, 10)) == [1, 4, 5, 9]
+    assert list(graph.members(RELEASE, 10, after_user_id=4)) == [5, 9]
+    assert graph.count(RELEASE) == 5
+
+def test_recipients_are_sorted_and_deduplicated():
+    graph = _graph()
+    assert list(graph.recipients(10, 7, (RELEASE, TEST))) == [1, 2, 3, 4, 5]
+    assert list(graph.recipients(10, 7, (TEST,), after_user_id=2)) == [3, 4]
+    graph.apply(FOLLOW, 7, 3, False)
+    graph.apply(FOLLOW, 7, 6, True)
+    assert list(graph.recipients(10, 7, (TEST,))) == [2, 3, 4, 6]
+
+def test_digest_users_follow_overrides():
+    graph = _graph()
+    assert graph.is_digest(4) and not graph.is_digest(1)
+    graph.apply(DIGEST, 0, 4, False)
+    graph.apply(DIGEST, 0, 1, True)
+    assert not graph.is_digest(4) and graph.is_digest(1)
+
+def test_snapshot_round_trip_keeps_merged_overrides(tmp_path):
+    graph = _graph()
+    graph.apply(TEST, 30, 8, True)
+    graph.apply(DIGEST, 0, 5, False)
+    path = str(tmp_path / "graph.bin")
+    write_snapshot(path, graph._merged(), 42, 1000)
+    base, watermark, created_at, mapped = map_snapshot(path)
+    try:
+        assert (watermark, created_at) == (42, 1000)
+        loaded = SubscriptionGraph()
+        loaded._base = base
+        assert list(loaded.members(TEST, 30)) == [8]
+        assert list(loaded.members(DIGEST, 0)) == [4]
+        assert list(loaded.members(FOLLOW, 7)) == [3, 4]
+    finally:
+        unmap_snapshot(base, mapped)
+
+def test_truncated_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "graph.bin"
+    write_snapshot(str(path), _graph()._base, 0, 0)
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(ValueError):
+        map_snapshot(str(path))
+
+class _Cursor:
+    def __init__(self, rows=(), counts=()):
+        self.rows = list(rows)
+        self.counts = list(counts)
+        self.executed = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    async def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    async def fetchone(self):
+        return (self.counts.pop(0),)
+
+class _Pool:
+    def __init__(self, cursor: _Cursor):
+        self._cursor = cursor
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self._cursor
+
+    async def commit(self):
+        pass
+
+def test_catch_up_applies_every_kind_and_stops_the_watermark_at_unsettled_rows():
+    graph = _graph()
+    cursor = _Cursor(rows=[
+        (1, "thread", 10, 7, 0b10, 1),
+        (2, "author", 8, 2, 1, 1),
+        (3, "digest", 0, 2, 1, 0), # 尚未稳定：应用，但水位线停在它之前
+        (4, "thread", 10, 1, 0, 1),
+    ])
+    assert asyncio.run(graph.catch_up(cursor)) == 4
+    assert graph.watermark == 2
+    assert list(graph.members(TEST, 10)) == [2, 3, 7]
+    assert list(graph.members(RELEASE, 10)) == [3, 5]
+    assert list(graph.members(FOLLOW, 8)) == [1, 2]
+    assert graph.is_digest(2)
+
+def test_verify_reports_kinds_with_missing_change_rows():
+    graph = _graph()
+    counts = [len(EDGES[kind]) for kind in KINDS]
+    assert asyncio.run(graph.verify(_Pool(_Cursor(counts=counts)))) == []
+    counts[FOLLOW] -= 1 # 级联删除了一条关注，没有写入 graph_changes
+    cursor = _Cursor(counts=counts)
+    assert asyncio.run(graph.verify(_Pool(cursor))) == [FOLLOW]
+    assert cursor.executed[0] == "START TRANSACTION WITH CONSISTENT SNAPSHOT"
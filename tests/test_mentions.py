@@ -0,0 +1,106 @@
+import asyncio
+from types import SimpleNamespace
+from benchmarks.fake_discord import run_virtual
+from src.fanout import MESSAGE_CHAR_LIMIT, MentionPacer, MentionPacker, pack_mentions
+
+_SEND = "https://discord.com/api/v10/channels/7/messages"
+_DELETE = "https://discord.com/api/v10/channels/7/messages/99"
+
+def _message(batch):
+    return " ".join(f"<@{uid}>" for uid in batch)
+
+def test_batches_fill_up_to_the_char_limit():
+    user_ids = [10**17 + i for i in range(1000)] # 18 位 id，每个提及 21 个字符
+    batches = list(pack_mentions(user_ids))
+    assert [uid for batch in batches for uid in batch] == user_ids
+    for batch in batches:
+        assert len(_message(batch)) <= MESSAGE_CHAR_LIMIT
+    for batch, following in zip(batches, batches[1:]):
+        assert len(_message(batch + following[:1])) > MESSAGE_CHAR_LIMIT # 下一个放不下才换一条
+
+def test_exact_fit_stays_in_one_message():
+    user_ids = [10**17 + i for i in range(10)]
+    limit = len(_message(user_ids))
+    assert list(pack_mentions(user_ids, char_limit=limit)) == [user_ids]
+    assert list(pack_mentions(user_ids, char_limit=limit - 1)) == [user_ids[:9], user_ids[9:]]
+
+def test_max_count_caps_each_message():
+    batches = list(pack_mentions(range(1, 121), max_count=50))
+    assert [len(batch) for batch in batches] == [50, 50, 20]
+
+def test_packer_returns_full_batch_before_next_id():
+    packer = MentionPacker(char_limit=len("<@1> <@2>"))
+    assert packer.add(1) is None
+    assert packer.add(2) is None
+    assert packer.add(3) == [1, 2]
+    assert packer.flush() == [3]
+    assert packer.flush() is None
+
+def test_no_ids_no_messages():
+    assert list(pack_mentions([])) == []
+
+def _paced(pacer, before=None):
+    """先执行 before(pacer)，再在虚拟时钟下依次调用两次 pacer.wait(7)，返回两次各自等待的秒数"""
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        waits = []
+        for i in range(2):
+            start = loop.time()
+            await pacer.wait(7)
+            waits.append(round(loop.time() - start, 3))
+            if i == 0 and before is not None:
+                before(pacer)
+        return waits
+    return run_virtual(scenario())[0]
+
+def test_fixed_interval_before_any_headers():
+    assert _paced(MentionPacer(1.5)) == [0.0, 1.5]
+
+def test_fixed_interval_when_not_adaptive():
+    def observe(pacer):
+        pacer.observe("POST", _SEND, 200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "4"})
+    assert _paced(MentionPacer(1.5, adaptive=False), observe) == [0.0, 1.5]
+
+def test_headers_with_remaining_requests_do_not_wait():
+    def observe(pacer):
+        pacer.observe("POST", _SEND, 200, {"X-RateLimit-Remaining": "3", "X-RateLimit-Reset-After": "4"})
+        pacer.observe("DELETE", _DELETE, 200, {"X-RateLimit-Remaining": "2", "X-RateLimit-Reset-After": "1"})
+    assert _paced(MentionPacer(1.5), observe) == [0.0, 0.0]
+
+def test_exhausted_bucket_waits_until_reset():
+    def observe(pacer):
+        pacer.observe("POST", _SEND, 200, {"X-RateLimit-Remaining": "2", "X-RateLimit-Reset-After": "4"})
+        pacer.observe("DELETE", _DELETE, 200, {"x-ratelimit-remaining": "0", "x-ratelimit-reset-after": "2.5"})
+    assert _paced(MentionPacer(1.5), observe) == [0.0, 2.5]
+
+def test_route_429_waits_retry_after():
+    def observe(pacer):
+        pacer.observe("POST", _SEND, 429, {"Retry-After": "3"})
+    pacer = MentionPacer(1.5)
+    assert _paced(pacer, observe) == [0.0, 3.0]
+    assert pacer.rate_limited == 1
+
+def test_global_429_applies_to_every_channel():
+    async def scenario():
+        pacer = MentionPacer()
+        pacer.observe("POST", "https://discord.com/api/v10/channels/8/messages", 429,
+                      {"Retry-After": "2", "X-RateLimit-Global": "true"})
+        return pacer.delay_for(7), pacer.delay_for(8)
+    assert run_virtual(scenario())[0] == (2.0, 2.0)
+
+def test_other_routes_are_ignored():
+    def observe(pacer):
+        pacer.observe("PATCH", _DELETE, 200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "5"})
+        pacer.observe("GET", "https://discord.com/api/v10/guilds/1", 200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "5"})
+    assert _paced(MentionPacer(1.5), observe) == [0.0, 1.5] # 仍按固定间隔
+
+def test_trace_config_feeds_responses_to_observe():
+    pacer = MentionPacer()
+    params = SimpleNamespace(method="POST", url=_SEND, response=SimpleNamespace(
+        status=200, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "2"}))
+
+    async def scenario():
+        for callback in pacer.trace_config().on_request_end:
+            await callback(None, None, params)
+        return pacer.delay_for(7)
+    assert run_virtual(scenario())[0] == 2.0
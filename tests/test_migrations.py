@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from src.migrations import MIGRATIONS, Migration, MigrationError, _apply, _missing
+
+class _Cursor:
+    """记录执行过的语句；探测语句返回 probe_result"""
+    def __init__(self, probe_result):
+        self.probe_result = probe_result
+        self.executed = []
+
+    async def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    async def fetchone(self):
+        return (self.probe_result,)
+
+class _Connection:
+    commits = 0
+
+    async def commit(self):
+        self.commits += 1
+
+def _applied(migrations):
+    return {m.version: m.checksum for m in migrations}
+
+def test_versions_are_unique_and_increasing():
+    versions = [m.version for m in MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+def test_fresh_database_needs_every_migration():
+    assert _missing({}) == MIGRATIONS
+
+def test_up_to_date_database_needs_nothing():
+    assert _missing(_applied(MIGRATIONS)) == []
+
+def test_only_unapplied_migrations_are_returned():
+    assert _missing(_applied(MIGRATIONS[:3])) == MIGRATIONS[3:]
+
+def test_edited_migration_is_rejected():
+    applied = _applied(MIGRATIONS)
+    applied[MIGRATIONS[0].version] = "0" * 64
+    with pytest.raises(MigrationError, match="校验和"):
+        _missing(applied)
+
+def test_newer_schema_is_rejected():
+    applied = _applied(MIGRATIONS)
+    applied[MIGRATIONS[-1].version + 1] = "0" * 64
+    with pytest.raises(MigrationError, match="升级"):
+        _missing(applied)
+
+def test_checksum_ignores_surrounding_whitespace_only():
+    base = Migration(1, "x", ("CREATE TABLE a (id INT)",))
+    assert Migration(1, "x", ("\n    CREATE TABLE a (id INT)\n",)).checksum == base.checksum
+    assert Migration(1, "x", ("CREATE TABLE a (id BIGINT)",)).checksum != base.checksum
+
+def _run_apply(migration, probe_result):
+    conn, cursor = _Connection(), _Cursor(probe_result)
+    asyncio.run(_apply(conn, cursor, migration))
+    return conn, cursor
+
+def test_probe_hit_only_records_version():
+    migration = next(m for m in MIGRATIONS if m.name == "drop_legacy_unread_flags")
+    conn, cursor = _run_apply(migration, 1)
+    assert cursor.executed[0] == migration.applied_probe
+    assert not any(statement in cursor.executed for statement in migration.statements)
+    assert "INSERT INTO schema_version" in cursor.executed[-1]
+    assert conn.commits == 1
+
+def test_probe_miss_runs_every_statement():
+    migration = next(m for m in MIGRATIONS if m.name == "drop_legacy_unread_flags")
+    conn, cursor = _run_apply(migration, 0)
+    assert cursor.executed[1:-1] == list(migration.statements)
+
+def test_legacy_flags_are_dropped_after_the_backfill():
+    drops = [m.version for m in MIGRATIONS for statement in m.statements
+             if "DROP COLUMN has_new_update" in statement or "DROP TABLE IF EXISTS follower_thread_notifications" in statement]
+    backfill = next(m.version for m in MIGRATIONS if m.name == "update_watermarks")
+    assert drops and all(version > backfill for version in drops)
+    assert not any(statement.lstrip().startswith("DROP") for m in MIGRATIONS if m.version == backfill for statement in m.statements)
@@ -0,0 +1,43 @@
+from src.pagination import KeysetPager
+
+def _key(row):
+    return row[0], row[1]
+
+def test_first_page_has_no_condition():
+    seek = KeysetPager("a", "b").seek("next") # 还没有翻过页时 next 等同于 first
+    assert (seek.where, seek.params, seek.order) == ("", (), "DESC")
+
+def test_next_seeks_below_last_row():
+    pager = KeysetPager("a", "b")
+    rows = pager.land(pager.seek("first"), [(9, 3), (9, 1), (7, 5)], _key)
+    assert rows == [(9, 3), (9, 1), (7, 5)]
+    seek = pager.seek("next")
+    assert seek.where == "AND ((a < %s) OR (a = %s AND b < %s))"
+    assert seek.params == (7, 7, 5)
+    assert seek.order == "DESC"
+
+def test_prev_reads_ascending_and_lands_in_display_order():
+    pager = KeysetPager("a", "b")
+    pager.land(pager.seek("first"), [(5, 2), (4, 8)], _key)
+    seek = pager.seek("prev")
+    assert seek.where == "AND ((a > %s) OR (a = %s AND b > %s))"
+    assert seek.params == (5, 5, 2)
+    assert seek.order == "ASC"
+    assert pager.land(seek, [(6, 1), (7, 0)], _key) == [(7, 0), (6, 1)]
+    assert (pager.first_key, pager.last_key) == ((7, 0), (6, 1))
+
+def test_stay_includes_the_current_first_row():
+    pager = KeysetPager("id")
+    pager.land(pager.seek("first"), [(3, None), (2, None)], lambda row: (row[0],))
+    seek = pager.seek("stay")
+    assert (seek.where, seek.params, seek.order) == ("AND ((id <= %s))", (3,), "DESC")
+
+def test_last_page_reads_from_the_other_end():
+    seek = KeysetPager("a").seek("last")
+    assert (seek.where, seek.order) == ("", "ASC")
+
+def test_empty_page_keeps_previous_keys():
+    pager = KeysetPager("a", "b")
+    pager.land(pager.seek("first"), [(5, 2), (4, 8)], _key)
+    assert pager.land(pager.seek("next"), [], _key) == []
+    assert (pager.first_key, pager.last_key) == ((5, 2), (4, 8))
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from src import replicas
+from src.replicas import ReadRouter
+
+PRIMARY, REPLICA_A, REPLICA_B = "primary", "replica-a", "replica-b"
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(replicas.time, "monotonic", lambda: now[0])
+    return now
+
+def _router(sticky_seconds: int = 5) -> ReadRouter:
+    router = ReadRouter(PRIMARY, {"a": REPLICA_A, "b": REPLICA_B}, max_lag=10, sticky_seconds=sticky_seconds)
+    router.lag = {"a": 0, "b": 0}
+    return router
+
+def test_reads_rotate_between_healthy_replicas(clock):
+    router = _router()
+    assert {router.for_read(1), router.for_read(1)} == {REPLICA_A, REPLICA_B}
+    router.lag["b"] = 30
+    assert [router.for_read(1) for _ in range(3)] == [REPLICA_A] * 3
+    router.lag["a"] = None
+    assert router.for_read(1) == PRIMARY
+    assert (router.replica_reads, router.primary_reads) == (5, 1)
+
+def test_writer_reads_the_primary_until_the_sticky_window_ends(clock):
+    router = _router(sticky_seconds=5)
+    router.wrote(1)
+    assert router.for_read(1) == PRIMARY
+    assert router.for_read(2) != PRIMARY # 只影响写入的用户
+    clock[0] += 4.9
+    assert router.for_read(1) == PRIMARY
+    clock[0] += 0.2
+    assert router.for_read(1) != PRIMARY
+
+def test_a_new_write_extends_the_window_and_expired_writers_are_forgotten(clock):
+    router = _router(sticky_seconds=5)
+    router.wrote(1)
+    router.wrote(2)
+    clock[0] += 3
+    router.wrote(1)
+    clock[0] += 3
+    router.wrote(3) # 用户 2 的窗口已过，记录被清除
+    assert list(router._recent_writes) == [1, 3]
+    assert router.for_read(1) == PRIMARY
+    assert router.for_read(2) != PRIMARY
+
+def test_writes_are_not_tracked_without_replicas(clock):
+    router = ReadRouter(PRIMARY, {}, max_lag=10, sticky_seconds=5)
+    router.wrote(1)
+    assert router._recent_writes == {}
+    assert router.for_read(1) == PRIMARY
+
+class _Replica:
+    def __init__(self, status):
+        self.status = status
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def cursor(self, cursor_class=None):
+        return self
+
+    async def execute(self, sql):
+        if isinstance(self.status, Exception):
+            raise self.status
+
+    async def fetchone(self):
+        return self.status
+
+def test_check_lag_pauses_lagging_and_broken_replicas():
+    router = ReadRouter(PRIMARY, {
+        "a": _Replica({"Seconds_Behind_Source": 2}),
+        "b": _Replica({"Seconds_Behind_Source": None}), # 复制未运行
+        "c": _Replica(RuntimeError("lost connection")),
+    }, max_lag=10, sticky_seconds=5)
+    asyncio.run(router.check_lag())
+    assert router.lag == {"a": 2, "b": None, "c": None}
+    assert router.healthy() == ["a"]
@@ -0,0 +1,36 @@
+import pytest
+from src.templates import Template, escape_user_text
+
+def _update_text(source):
+    return Template("UPDATE_TEXT", source, ("author", "text", "url"), escaped={"text": escape_user_text})
+
+def test_macros_are_replaced_in_order():
+    assert _update_text("{{author}}: {{text}} ({{url}})").render(author="<@1>", text="新章节", url="https://x") == "<@1>: 新章节 (https://x)"
+
+def test_escaped_field_cannot_mention():
+    rendered = _update_text("{{text}}").render(author="", text="@everyone <@123456789012345678> <@&123456789012345678>", url="")
+    assert "@everyone" not in rendered
+    assert "<@123456789012345678>" not in rendered
+    assert "<@&123456789012345678>" not in rendered
+
+def test_macros_in_values_are_not_expanded():
+    rendered = _update_text("{{text}} {{url}}").render(author="a", text="{{url}}", url="https://x")
+    assert rendered == "{{url}} https://x"
+
+def test_macro_can_repeat_or_be_absent():
+    assert _update_text("{{url}}|{{url}}").render(author="a", text="b", url="u") == "u|u"
+
+def test_unknown_macro_fails_at_compile_time():
+    with pytest.raises(ValueError, match=r"\{\{link\}\}"):
+        _update_text("{{link}}")
+
+def test_missing_template_fails_at_compile_time():
+    with pytest.raises(ValueError, match="UPDATE_TEXT"):
+        _update_text(None)
+
+def test_render_requires_exactly_the_declared_fields():
+    template = _update_text("{{text}}")
+    with pytest.raises(TypeError):
+        template.render(text="b", url="u")
+    with pytest.raises(TypeError):
+        template.render(author="a", text="b", url="u", extra="x")
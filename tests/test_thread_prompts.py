@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+import discord
+from benchmarks.fake_discord import run_virtual
+from src import config
+from src.thread_prompts import THREAD_NOT_READY, ThreadPromptQueue
+
+class _ForbiddenResponse:
+    status = 403
+    reason = "Forbidden"
+
+class _Thread:
+    """前 not_ready 次发送返回 code 对应的错误，记录每次尝试的虚拟时间"""
+    def __init__(self, thread_id: int, not_ready: int, code: int = THREAD_NOT_READY):
+        self.id = self.owner_id = thread_id
+        self.name = f"thread-{thread_id}"
+        self.guild = SimpleNamespace(id=1)
+        self.not_ready = not_ready
+        self.code = code
+        self.attempts = []
+
+    async def send(self, **fields):
+        self.attempts.append(asyncio.get_running_loop().time())
+        if len(self.attempts) <= self.not_ready:
+            raise discord.Forbidden(_ForbiddenResponse(), {"code": self.code, "message": "Thread not ready"})
+
+class _Bot:
+    TRACK_NEW_THREAD_EMBED_TITLE = config.TRACK_NEW_THREAD_EMBED_TITLE
+    TRACK_NEW_THREAD_EMBED_TEXT = config.TRACK_NEW_THREAD_EMBED_TEXT
+
+    async def wait_until_ready(self):
+        pass
+
+def _run(threads: list[_Thread], workers: int = 2, max_attempts: int = 5) -> ThreadPromptQueue:
+    async def scenario():
+        queue = ThreadPromptQueue(_Bot(), workers, max_attempts, retry_base=1.0, retry_max=3.0)
+        queue.start()
+        start = asyncio.get_running_loop().time()
+        for thread in threads:
+            queue.submit(thread)
+        while queue.depth:
+            await asyncio.sleep(0.1)
+        for thread in threads:
+            thread.attempts = [round(at - start, 3) for at in thread.attempts]
+        return queue
+
+    return run_virtual(scenario())[0]
+
+def test_not_ready_thread_backs_off_exponentially_up_to_the_cap():
+    thread = _Thread(1, not_ready=3)
+    queue = _run([thread])
+    assert thread.attempts == [0.0, 1.0, 3.0, 6.0] # 退避 1、2、3（封顶）秒
+    assert (queue.sent, queue.retries, queue.dead) == (1, 3, 0)
+    assert [round(latency, 3) for latency in queue.recent_latencies] == [6.0]
+
+def test_thread_is_dead_lettered_after_max_attempts():
+    thread = _Thread(1, not_ready=10)
+    queue = _run([thread], max_attempts=3)
+    assert len(thread.attempts) == 3
+    assert (queue.sent, queue.dead) == (0, 1)
+    [(_, thread_id, reason)] = queue.dead_letters
+    assert thread_id == 1 and "3 次尝试" in reason
+
+def test_other_permission_errors_are_not_retried():
+    thread = _Thread(1, not_ready=1, code=50001)
+    queue = _run([thread])
+    assert thread.attempts == [0.0]
+    assert (queue.retries, queue.dead) == (0, 1)
+
+def test_waiting_thread_does_not_hold_a_worker():
+    waiting, ready = _Thread(1, not_ready=2), _Thread(2, not_ready=0)
+    queue = _run([waiting, ready], workers=1)
+    assert ready.attempts == [0.0]
+    assert waiting.attempts == [0.0, 1.0, 3.0]
+    assert queue.sent == 2
@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from src import threads
+from src.threads import MISS, ThreadCache, ThreadInfo
+
+INFO = ThreadInfo(1, False, ())
+
+def test_load_is_cached_when_nothing_was_written():
+    cache = ThreadCache(10)
+    token = cache.begin_load(5)
+    cache.finish_load(5, token, INFO)
+    assert cache.get(5) == INFO
+
+def test_write_to_another_thread_does_not_discard_the_load():
+    cache = ThreadCache(10)
+    token = cache.begin_load(5)
+    cache.update(6, digest_mode=True)
+    cache.put(7, None)
+    cache.finish_load(5, token, INFO)
+    assert cache.get(5) == INFO
+
+def test_write_to_the_loading_thread_discards_the_load():
+    cache = ThreadCache(10)
+    token = cache.begin_load(5)
+    cache.update_members(5, added=2)
+    cache.finish_load(5, token, INFO)
+    assert cache.get(5) is MISS
+
+def test_overlapping_loads_of_one_thread():
+    cache = ThreadCache(10)
+    first = cache.begin_load(5)
+    cache.update(5, digest_mode=True)
+    second = cache.begin_load(5) # 写入之后开始的加载读到的是新数据
+    cache.finish_load(5, first, INFO)
+    assert cache.get(5) is MISS
+    cache.finish_load(5, second, INFO)
+    assert cache.get(5) == INFO
+    assert cache._loads == {}
+
+def test_clear_discards_loads_in_flight():
+    cache = ThreadCache(10)
+    token = cache.begin_load(5)
+    cache.clear()
+    cache.finish_load(5, token, INFO)
+    assert cache.get(5) is MISS
+
+class _Pool:
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    async def commit(self):
+        pass
+
+def test_failed_load_is_not_cached(monkeypatch):
+    async def failing_load(cursor, thread_id):
+        raise RuntimeError("lost connection")
+
+    monkeypatch.setattr(threads, "thread_cache", ThreadCache(10))
+    monkeypatch.setattr(threads, "load_thread", failing_load)
+    with pytest.raises(RuntimeError):
+        asyncio.run(threads.get_thread(_Pool(), 5))
+    assert threads.thread_cache.get(5) is MISS
+    assert threads.thread_cache._loads == {}
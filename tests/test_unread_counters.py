@@ -0,0 +1,94 @@
+import asyncio
+import os
+import pytest
+from src import unread
+
+class _Cursor:
+    """按顺序返回预设的 fetchone 结果，记录执行过的语句"""
+    def __init__(self, *rows):
+        self.rows = list(rows)
+        self.executed = []
+
+    async def execute(self, sql, params=None):
+        self.executed.append((" ".join(sql.split()), params))
+
+    async def fetchone(self):
+        return self.rows.pop(0)
+
+def test_existing_counter_is_read_without_counting():
+    cursor = _Cursor((3, 4))
+    assert asyncio.run(unread.get_counts(cursor, 1)) == (3, 4)
+    assert len(cursor.executed) == 1
+
+def test_missing_counter_is_counted_once_and_created():
+    cursor = _Cursor(None, (5,), (6,))
+    assert asyncio.run(unread.get_counts(cursor, 1)) == (5, 6)
+    sql, params = cursor.executed[-1]
+    assert sql.startswith("INSERT IGNORE INTO unread_counters")
+    assert params == (1, 5, 6)
+
+def test_publish_updates_subscribers_then_followers():
+    cursor = _Cursor()
+    asyncio.run(unread.count_publish(cursor, 42, "test"))
+    (thread_sql, thread_params), (author_sql, author_params) = cursor.executed
+    assert "SET c.thread_unread = c.thread_unread + 1" in thread_sql and "ts.subscribe_test = TRUE" in thread_sql
+    assert "SET c.author_unread" in author_sql and "ts.subscribe_test" in author_sql
+    assert thread_params == author_params == (42,)
+
+def test_new_thread_only_updates_followers():
+    cursor = _Cursor()
+    asyncio.run(unread.count_publish(cursor, 42))
+    [(sql, params)] = cursor.executed
+    assert "SET c.author_unread" in sql and "COALESCE(ts.subscribe_" not in sql
+    assert params == (42,)
+
+@pytest.mark.skipif(not os.getenv("BENCH_MYSQL_HOST"), reason="需要 BENCH_MYSQL_HOST 指定的单独 MySQL（会清空其中的表）")
+def test_counters_follow_publishes_and_reads():
+    """在种子数据上发布更新、标记已读，每一步之后计数器都与实时统计一致"""
+    from benchmarks.db import create_bench_pool, truncate_tables
+    from benchmarks.graph import generate_graph, seed_database
+    from src import database
+
+    async def publish(cursor, thread_id, update_type):
+        seq = await unread.next_update_seq(cursor, thread_id)
+        await unread.count_publish(cursor, thread_id, update_type)
+        await cursor.execute(
+            f"UPDATE managed_threads SET last_update_type = %s, last_update_seq = %s, last_{update_type}_seq = %s WHERE thread_id = %s",
+            (update_type, seq, seq, thread_id)
+        )
+
+    async def scenario():
+        graph = generate_graph(3000, seed=1)
+        hot = graph.hottest_thread()
+        subscriber = next(user_id for user_id, thread_id, *_ in graph.subscriptions if thread_id == hot)
+        follower = next(user_id for user_id, author_id in graph.follows if author_id == graph.threads[hot])
+        users = [subscriber, follower] + sorted({user_id for user_id, *_ in graph.subscriptions} - {subscriber, follower})[:200]
+        pool = await create_bench_pool(maxsize=2)
+        try:
+            await database.setup_database(pool)
+            await truncate_tables(pool)
+            await seed_database(pool, graph)
+            async with pool.acquire() as conn, conn.cursor() as cursor:
+                for user_id in users:
+                    await unread.get_counts(cursor, user_id)
+                steps = [
+                    lambda: publish(cursor, hot, "release"),
+                    lambda: publish(cursor, hot, "test"),
+                    lambda: unread.mark_all_threads_read(cursor, subscriber),
+                    lambda: publish(cursor, hot, "release"),
+                    lambda: unread.mark_threads_read(cursor, subscriber, [hot]),
+                    lambda: unread.mark_author_threads_read(cursor, follower, [hot]),
+                    lambda: unread.mark_all_authors_read(cursor, follower),
+                    lambda: publish(cursor, hot, "test"),
+                ]
+                for step in steps:
+                    await step()
+                    for user_id in users:
+                        await cursor.execute("SELECT thread_unread, author_unread FROM unread_counters WHERE user_id = %s", (user_id,))
+                        assert await cursor.fetchone() == await unread.count_unread(cursor, user_id), user_id
+                await conn.rollback()
+        finally:
+            pool.close()
+            await pool.wait_closed()
+
+    asyncio.run(scenario())